@@ -1,36 +1,55 @@
 
-from app.services.llm import call_gemini
-from app.rag.retriever import retrieve
+from app.services.llm import call_gemini, acall_gemini, astream_gemini, FALLBACK_ANSWER
+from app.services.streaming import OrderedSpeech, split_sentences
+from app.services.admission import SingleFlight
+from app.services.semantic_cache import semantic_cache, context_fingerprint
+from app.rag.retriever import (
+    retrieve_passages,
+    aretrieve_passages,
+    aretrieve_passages_batch,
+    get_query_vector,
+    aget_query_vector,
+)
+from app.rag.context import Passage, build_context
+from app.rag.vectorstore import Scope
 from app.agents.curious_agent import curious_prompt
 from app.agents.explainer_agent import explainer_prompt, explainer_wrap_up_prompt
+from app.config import ASK_BATCH_CONCURRENCY, EPISODE_HISTORY_TURNS, SINGLE_FLIGHT_ENABLED
+import asyncio
 import logging
-from typing import List, Tuple
+from typing import AsyncIterator, Awaitable, Callable, Hashable, List, Optional, Tuple
 
+# Identical requests in flight at the same time share one computation
+inflight = SingleFlight()
 
-def run_podcast_turn(topic: str = "overview") -> dict:
+
+def _build_context(passages: List[Passage]) -> str:
+    if not passages:
+        return "No relevant context found."
+    # Overlapping chunks merged, near-duplicates dropped, packed to CONTEXT_MAX_TOKENS
+    return build_context(passages)
+
+
+def run_podcast_turn(topic: str = "overview", scope: Optional[Scope] = None) -> dict:
     """
     Auto-generated podcast turn between Curious and Explainer.
     User can interject via run_user_question().
+    `scope` limits retrieval to one tenant and/or document.
     """
     if not topic:
         logging.warning("Topic cannot be empty.")
         return {"error": "Topic cannot be empty."}
 
     # Retrieve context with scores
-    contexts_with_scores: List[Tuple[str, float]] = retrieve(topic, top_k=5)
+    passages: List[Passage] = retrieve_passages(topic, top_k=5, scope=scope)
 
-    if not contexts_with_scores:
-        context = "No relevant context found."
-    else:
-        # Select contexts based on scores (e.g., take top 3)
-        selected_contexts = [text for text, score in contexts_with_scores[:3]]
-        context = "\n\n".join(selected_contexts)
+    context = _build_context(passages)
 
     # Curious asks
-    question = call_gemini(curious_prompt(context))
+    question = call_gemini(curious_prompt(context), "llm_curious")
 
     # Explainer answers with wrap-up
-    answer = call_gemini(explainer_prompt(context, question, should_wrap_up=True))
+    answer = call_gemini(explainer_prompt(context, question, should_wrap_up=True), "llm_explainer")
 
     return {
         "curious": question,
@@ -39,7 +58,7 @@ def run_podcast_turn(topic: str = "overview") -> dict:
     }
 
 
-def run_user_question(user_input: str) -> dict:
+def run_user_question(user_input: str, scope: Optional[Scope] = None) -> dict:
     """
     User (third party) interjects with their own question.
     Explainer answers and wraps up.
@@ -48,18 +67,30 @@ def run_user_question(user_input: str) -> dict:
         logging.warning("User input cannot be empty.")
         return {"error": "User input cannot be empty."}
 
+    scope = scope or Scope()
+
     # Retrieve context with scores
-    contexts_with_scores: List[Tuple[str, float]] = retrieve(user_input, top_k=5)
+    passages: List[Passage] = retrieve_passages(user_input, top_k=5, scope=scope)
+
+    context = _build_context(passages)
 
-    if not contexts_with_scores:
-        context = "No relevant context found."
-    else:
-        # Select contexts based on scores (e.g., take top 3)
-        selected_contexts = [text for text, score in contexts_with_scores[:3]]
-        context = "\n\n".join(selected_contexts)
+    # Near-identical question over the same context: reuse the cached answer
+    context_key = context_fingerprint(context)
+    if semantic_cache.enabled:
+        question_vector = get_query_vector(user_input)
+        cached = semantic_cache.lookup(scope.key, context_key, question_vector)
+        if cached is not None:
+            return {
+                "user_question": user_input,
+                "explainer": cached,
+                "answer": cached,
+            }
 
     # Explainer answers user's question with wrap-up
-    answer = call_gemini(explainer_prompt(context, user_input, should_wrap_up=True))
+    answer = call_gemini(explainer_prompt(context, user_input, should_wrap_up=True), "llm_explainer")
+
+    if semantic_cache.enabled and answer != FALLBACK_ANSWER:
+        semantic_cache.store(scope.key, context_key, question_vector, answer)
 
     return {
         "user_question": user_input,
@@ -68,38 +99,195 @@ def run_user_question(user_input: str) -> dict:
     }
 
 
-def _generate_podcast_turn(topic: str, is_last: bool) -> dict:
+def _generate_podcast_turn(context: str, is_last: bool, history: List[Tuple[str, str]]) -> dict:
     """
-    Generates a single turn of the podcast.
+    Generates a single turn of the podcast, aware of the turns before it.
     """
-    # Retrieve context with scores
-    contexts_with_scores: List[Tuple[str, float]] = retrieve(topic, top_k=5)
-
-    if not contexts_with_scores:
-        context = "No relevant context found."
-    else:
-        # Select contexts based on scores (e.g., take top 3)
-        selected_contexts = [text for text, score in contexts_with_scores[:3]]
-        context = "\n\n".join(selected_contexts)
-
-    question = call_gemini(curious_prompt(context))
-    answer = call_gemini(explainer_prompt(context, question, should_wrap_up=is_last))
+    recent = history[-EPISODE_HISTORY_TURNS:] if EPISODE_HISTORY_TURNS else []
+    question = call_gemini(curious_prompt(context, [q for q, _ in recent]), "llm_curious")
+    answer = call_gemini(explainer_prompt(context, question, should_wrap_up=is_last, history=recent), "llm_explainer")
+    history.append((question, answer))
     return {
         "curious": question,
         "explainer": answer,
     }
 
 
-def run_multi_turn_podcast(topic: str = "overview", num_turns: int = 3) -> list:
+def run_multi_turn_podcast(topic: str = "overview", num_turns: int = 3, scope: Optional[Scope] = None) -> list:
     """
     Generate multiple podcast turns for a longer episode.
+    Context is retrieved once for the whole episode.
     """
+    context = _build_context(retrieve_passages(topic, top_k=5, scope=scope))
+    history: List[Tuple[str, str]] = []
     turns = []
     for i in range(num_turns):
         is_last = (i == num_turns - 1)
-        turn = _generate_podcast_turn(topic, is_last)
+        turn = _generate_podcast_turn(context, is_last, history)
         turns.append({
             "turn": i + 1,
             **turn,
         })
-    return turns
\ No newline at end of file
+    return turns
+
+
+# ======================
+# Async variants
+# ======================
+async def _coalesced(key: Hashable, factory: Callable[[], Awaitable]):
+    if not SINGLE_FLIGHT_ENABLED:
+        return await factory()
+    return await inflight.do(key, factory)
+
+
+async def arun_podcast_turn(topic: str = "overview", scope: Optional[Scope] = None) -> dict:
+    """
+    Async variant of run_podcast_turn().
+    Concurrent calls for the same topic and scope share one turn.
+    """
+    return await _coalesced(("turn", topic, scope or Scope()), lambda: _arun_podcast_turn(topic, scope))
+
+
+async def _arun_podcast_turn(topic: str, scope: Optional[Scope]) -> dict:
+    if not topic:
+        logging.warning("Topic cannot be empty.")
+        return {"error": "Topic cannot be empty."}
+
+    passages = await aretrieve_passages(topic, top_k=5, scope=scope)
+    context = _build_context(passages)
+
+    question = await acall_gemini(curious_prompt(context), "llm_curious")
+    answer = await acall_gemini(explainer_prompt(context, question, should_wrap_up=True), "llm_explainer")
+
+    return {
+        "curious": question,
+        "explainer": answer,
+        "answer": answer,
+    }
+
+
+async def arun_user_question(user_input: str, scope: Optional[Scope] = None) -> dict:
+    """
+    Async variant of run_user_question().
+    Concurrent calls with the same question and scope share one answer.
+    """
+    scope = scope or Scope()
+    return await _coalesced(("ask", user_input, scope), lambda: _arun_user_question(user_input, scope))
+
+
+async def _arun_user_question(user_input: str, scope: Scope) -> dict:
+    if not user_input:
+        logging.warning("User input cannot be empty.")
+        return {"error": "User input cannot be empty."}
+
+    passages = await aretrieve_passages(user_input, top_k=5, scope=scope)
+    return await _aanswer_question(user_input, scope, passages)
+
+
+async def _aanswer_question(user_input: str, scope: Scope, passages: List[Passage]) -> dict:
+    context = _build_context(passages)
+
+    context_key = context_fingerprint(context)
+    if semantic_cache.enabled:
+        question_vector = await aget_query_vector(user_input)
+        cached = semantic_cache.lookup(scope.key, context_key, question_vector)
+        if cached is not None:
+            return {
+                "user_question": user_input,
+                "explainer": cached,
+                "answer": cached,
+            }
+
+    answer = await acall_gemini(explainer_prompt(context, user_input, should_wrap_up=True), "llm_explainer")
+
+    if semantic_cache.enabled and answer != FALLBACK_ANSWER:
+        semantic_cache.store(scope.key, context_key, question_vector, answer)
+
+    return {
+        "user_question": user_input,
+        "explainer": answer,
+        "answer": answer,
+    }
+
+
+async def arun_user_questions(
+    questions: List[str], scope: Optional[Scope] = None, max_concurrency: int = ASK_BATCH_CONCURRENCY
+) -> List[dict]:
+    """
+    Answer many questions about the same scope at once.
+    All questions are embedded in one forward pass and searched in one
+    multi-search request; the LLM calls then run at most `max_concurrency`
+    at a time. Results follow the input order; a question that fails gets
+    an "error" entry instead of failing the batch.
+    """
+    scope = scope or Scope()
+    asked = [q for q in questions if q]
+    retrieved = dict(zip(asked, await aretrieve_passages_batch(asked, top_k=5, scope=scope)))
+    slots = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def answer(question: str) -> dict:
+        if not question:
+            return {"user_question": question, "error": "User input cannot be empty."}
+        try:
+            async with slots:
+                return await _aanswer_question(question, scope, retrieved[question])
+        except Exception as e:
+            logging.error(f"Error answering batched question: {e}")
+            return {"user_question": question, "error": str(e)}
+
+    return list(await asyncio.gather(*(answer(q) for q in questions)))
+
+
+async def arun_multi_turn_podcast(topic: str = "overview", num_turns: int = 3, scope: Optional[Scope] = None) -> list:
+    """
+    Async variant of run_multi_turn_podcast(), run on the episode engine without audio.
+    Concurrent calls for the same episode share one run.
+    """
+    from app.agents.episode import EpisodeEngine
+
+    async def run() -> list:
+        episode = await EpisodeEngine(topic, num_turns, scope).run()
+        return episode["turns"]
+
+    return await _coalesced(("episode", topic, num_turns, scope or Scope()), run)
+
+
+async def astream_podcast_turn(topic: str = "overview", scope: Optional[Scope] = None) -> AsyncIterator[bytes]:
+    """
+    Stream a podcast turn as MP3 while it is being written.
+
+    Both hosts' answers are streamed from the LLM, cut into sentences as they
+    arrive, and each sentence is sent to TTS while generation continues. Audio
+    is yielded in speaking order: the curious question, then the explanation.
+    """
+    passages = await aretrieve_passages(topic or "overview", top_k=5, scope=scope)
+    context = _build_context(passages)
+    speech = OrderedSpeech()
+
+    async def speak(prompt: str, voice: str) -> str:
+        text = []
+
+        async def tokens():
+            async for chunk in astream_gemini(prompt, f"llm_{voice}"):
+                text.append(chunk)
+                yield chunk
+
+        async for sentence in split_sentences(tokens()):
+            speech.add(sentence, voice)
+        return "".join(text)
+
+    async def produce():
+        try:
+            question = await speak(curious_prompt(context), "curious")
+            await speak(explainer_prompt(context, question, should_wrap_up=True), "explainer")
+        finally:
+            speech.close()
+
+    producer = asyncio.create_task(produce())
+    try:
+        async for chunk in speech.audio():
+            yield chunk
+        await producer
+    finally:
+        producer.cancel()
+        await speech.aclose()
@@ -1,5 +1,16 @@
 
-def curious_prompt(context: str) -> str:
+from typing import Sequence
+
+
+def curious_prompt(context: str, asked: Sequence[str] = ()) -> str:
+    """`asked`: questions from earlier turns of the episode, which must not be repeated."""
+    earlier = ""
+    if asked:
+        listed = "\n".join(f"- {q}" for q in asked)
+        earlier = f"""
+Questions already asked this episode (do not repeat them, build on them):
+{listed}
+"""
     return f"""You are the CURIOUS HOST of an educational podcast.
 Your job is to ask engaging, thought-provoking questions about the topic.
 
@@ -9,5 +20,5 @@ Instructions:
 - The question should intrigue a general audience.
 - The question should lead to an educational answer.
 
-Context:\n{context}\n
+Context:\n{context}\n{earlier}
 Your question: """
\ No newline at end of file
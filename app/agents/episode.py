@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from app.config import EPISODE_HISTORY_TURNS, TTS_MAX_WORKERS
+from app.services.llm import acall_gemini
+from app.services.tts import asynthesize_to_cache, atext_to_speech
+from app.services.audio_cache import audio_cache
+from app.rag.retriever import aretrieve_passages
+from app.rag.vectorstore import Scope
+from app.agents.controller import _build_context
+from app.agents.curious_agent import curious_prompt
+from app.agents.explainer_agent import explainer_prompt
+
+AUDIO_MODES = (None, "base64", "url")
+
+
+class EpisodeEngine:
+    """
+    Generates a multi-turn episode as a pipeline.
+
+    Context is retrieved once per distinct sub-topic, all up front and
+    concurrently. Turns are written one after another, each seeing the
+    questions and answers before it (last `history_turns`), and every line
+    is handed to TTS as soon as it exists: the curious question is being
+    synthesized while the explainer's answer is written, and turn N's audio
+    while turn N+1's text is. Every stage is recorded as a span relative to
+    the episode start, so the overlap is visible in `timings()`.
+    """
+
+    def __init__(
+        self,
+        topic: str = "overview",
+        num_turns: int = 3,
+        scope: Optional[Scope] = None,
+        subtopics: Optional[Sequence[str]] = None,
+        audio: Optional[str] = None,
+        history_turns: int = EPISODE_HISTORY_TURNS,
+        tts_concurrency: int = TTS_MAX_WORKERS,
+    ):
+        if audio not in AUDIO_MODES:
+            raise ValueError(f"Unknown audio mode: {audio}")
+        if audio == "url" and not audio_cache.enabled:
+            raise ValueError("audio mode 'url' requires the audio cache")
+        self.topic = topic or "overview"
+        self.num_turns = max(1, num_turns)
+        self.scope = scope
+        self.subtopics = list(subtopics or []) or [self.topic]
+        self.audio = audio
+        self.history_turns = max(0, history_turns)
+        self.tts_concurrency = max(1, tts_concurrency)
+        self.spans: List[dict] = []
+        self._started = 0.0
+
+    def _topic_for(self, turn: int) -> str:
+        """Sub-topics are spread evenly over the turns, in order."""
+        return self.subtopics[(turn - 1) * len(self.subtopics) // self.num_turns]
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._started
+
+    async def _timed(self, turn: Optional[int], stage: str, awaitable):
+        start = self._now()
+        try:
+            return await awaitable
+        finally:
+            self.spans.append({"turn": turn, "stage": stage, "start": start, "end": self._now()})
+
+    async def _contexts(self) -> Dict[str, str]:
+        topics = list(dict.fromkeys(self.subtopics))
+        results = await self._timed(None, "retrieve", asyncio.gather(
+            *(aretrieve_passages(topic, top_k=5, scope=self.scope) for topic in topics)
+        ))
+        return {topic: _build_context(passages) for topic, passages in zip(topics, results)}
+
+    async def _speak(self, turn: int, role: str, text: str, slots: asyncio.Semaphore) -> dict:
+        event = {"type": "audio", "turn": turn, "role": role}
+        try:
+            async with slots:
+                if self.audio == "url":
+                    key = await self._timed(turn, f"tts_{role}", asynthesize_to_cache(text, role))
+                    event["url"] = f"/audio/{key}"
+                else:
+                    event["audio"] = await self._timed(turn, f"tts_{role}", atext_to_speech(text, role))
+        except Exception as e:
+            logging.error(f"TTS failed for turn {turn} ({role}): {e}")
+            event["error"] = str(e)
+        return event
+
+    async def events(self) -> AsyncIterator[dict]:
+        """
+        Yield {"type": "turn", ...} as each turn's text is ready and
+        {"type": "audio", ...} as each clip is (in completion order), then one
+        {"type": "done", "timings": ...}. Closing the generator early cancels
+        any synthesis still running.
+        """
+        self._started = time.perf_counter()
+        self.spans = []
+        slots = asyncio.Semaphore(self.tts_concurrency)
+        speaking: List[asyncio.Task] = []
+        finished: asyncio.Queue = asyncio.Queue()
+        delivered = 0
+
+        def speak(turn: int, role: str, text: str):
+            if self.audio:
+                task = asyncio.create_task(self._speak(turn, role, text, slots))
+                task.add_done_callback(lambda t: t.cancelled() or finished.put_nowait(t.result()))
+                speaking.append(task)
+
+        try:
+            contexts = await self._contexts()
+            history: List[tuple] = []
+            for turn in range(1, self.num_turns + 1):
+                context = contexts[self._topic_for(turn)]
+                recent = history[-self.history_turns:] if self.history_turns else []
+                is_last = turn == self.num_turns
+
+                question = await self._timed(turn, "curious", acall_gemini(
+                    curious_prompt(context, [q for q, _ in recent]), "llm_curious"
+                ))
+                speak(turn, "curious", question)
+                answer = await self._timed(turn, "explainer", acall_gemini(
+                    explainer_prompt(context, question, should_wrap_up=is_last, history=recent), "llm_explainer"
+                ))
+                speak(turn, "explainer", answer)
+                history.append((question, answer))
+
+                yield {"type": "turn", "turn": turn, "topic": self._topic_for(turn),
+                       "curious": question, "explainer": answer}
+                while not finished.empty():
+                    delivered += 1
+                    yield finished.get_nowait()
+
+            for _ in range(len(speaking) - delivered):
+                yield await finished.get()
+            yield {"type": "done", "timings": self.timings()}
+        finally:
+            for task in speaking:
+                task.cancel()
+
+    async def run(self) -> dict:
+        """Generate the whole episode: {"turns": [...], "timings": {...}}."""
+        turns: Dict[int, dict] = {}
+        timings = {}
+        async for event in self.events():
+            if event["type"] == "turn":
+                turns[event["turn"]] = {key: event[key] for key in ("turn", "topic", "curious", "explainer")}
+            elif event["type"] == "audio":
+                if "url" in event:
+                    turns[event["turn"]][f"{event['role']}_audio_url"] = event["url"]
+                elif "audio" in event:
+                    turns[event["turn"]][f"{event['role']}_audio"] = event["audio"]
+            else:
+                timings = event["timings"]
+        for number, turn in turns.items():
+            turn["timings"] = timings["turns"].get(number, {})
+        return {"turns": [turns[n] for n in sorted(turns)], "timings": timings}
+
+    def timings(self) -> dict:
+        """
+        `stages`: total seconds per stage; `wall`: episode duration; `overlap`:
+        how much stage time ran concurrently with other stages. Per turn, each
+        stage's [start, end] offset in seconds from the episode start.
+        """
+        wall = self._now()
+        stages: Dict[str, float] = {}
+        turns: Dict[int, dict] = {}
+        for span in self.spans:
+            stage = span["stage"]
+            stages[stage] = stages.get(stage, 0.0) + span["end"] - span["start"]
+            if span["turn"] is not None:
+                turns.setdefault(span["turn"], {})[stage] = [round(span["start"], 4), round(span["end"], 4)]
+        return {
+            "wall": wall,
+            "stages": stages,
+            "overlap": max(0.0, sum(stages.values()) - wall),
+            "turns": turns,
+        }
+
@@ -1,5 +1,17 @@
 
-def explainer_prompt(context: str, question: str, should_wrap_up: bool = False) -> str:
+from typing import Sequence, Tuple
+
+
+def explainer_prompt(context: str, question: str, should_wrap_up: bool = False,
+                     history: Sequence[Tuple[str, str]] = ()) -> str:
+    """`history`: earlier (question, answer) pairs of the episode, so answers build on each other."""
+    earlier = ""
+    if history:
+        exchanges = "\n".join(f"Q: {q}\nA: {_clip(a)}" for q, a in history)
+        earlier = f"""
+Earlier in this episode (don't repeat it):
+{exchanges}
+"""
     wrap_up_instruction = """
 
 After your answer, provide a brief wrap-up that:
@@ -18,12 +30,16 @@ Instructions:
 - Limit your response to 2-3 paragraphs max.
 {wrap_up_instruction}
 
-Context:\n{context}\n
+Context:\n{context}\n{earlier}
 Question from co-host:\n{question}
 
 Your response:"""
 
 
+def _clip(text: str, limit: int = 300) -> str:
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " ..."
+
+
 def explainer_wrap_up_prompt(question: str, answer: str) -> str:
     """Standalone wrap-up when needed separately."""
     return f"""You are the EXPERT HOST of an educational podcast.
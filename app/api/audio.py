@@ -0,0 +1,71 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from app.services.audio_cache import audio_cache, is_valid_key, iter_handle
+
+router = APIRouter()
+
+
+def parse_range(header: str, size: int):
+    """
+    Parse a single `bytes=` range against a file of `size` bytes.
+    Returns an inclusive (start, end) pair, or None if unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+@router.get("/{key}")
+def get_audio(key: str, request: Request):
+    """Serve a cached MP3 by content key, honouring HTTP Range requests."""
+    if not is_valid_key(key):
+        raise HTTPException(status_code=404, detail="audio not found")
+    # One handle for the size and every byte served: an eviction after this
+    # point unlinks the name, not the data we are reading
+    f = audio_cache.open(key)
+    if f is None:
+        raise HTTPException(status_code=404, detail="audio not found")
+
+    size = os.fstat(f.fileno()).st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{key}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+
+    range_header = request.headers.get("range")
+    if not range_header:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_handle(f), media_type="audio/mpeg", headers=headers)
+
+    byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        f.close()
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_handle(f, start, end),
+        status_code=206,
+        media_type="audio/mpeg",
+        headers=headers,
+    )
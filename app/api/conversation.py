@@ -1,62 +1,206 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Literal
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from app.agents.controller import run_podcast_turn, run_user_question, run_multi_turn_podcast
+from app.agents.controller import (
+    arun_podcast_turn,
+    arun_user_question,
+    arun_user_questions,
+    arun_multi_turn_podcast,
+    astream_podcast_turn,
+)
+from app.agents.episode import EpisodeEngine
 from fastapi.responses import StreamingResponse
-from app.services.tts import generate_podcast_audio,generate_combined_podcast,text_to_speech_stream
+from app.services.tts import (
+    agenerate_podcast_audio,
+    agenerate_combined_podcast,
+    atext_to_speech_stream,
+    asynthesize_segments_to_cache,
+    astream_segments,
+)
+from app.services.streaming import sse_stream
+from app.services.admission import Overloaded
+from app.services.audio_cache import audio_cache
+from app.rag.vectorstore import Scope
+from app.config import ASK_BATCH_MAX_QUESTIONS
 
 router = APIRouter()
 
-class QuestionRequest(BaseModel):
+class ScopedRequest(BaseModel):
+    # Restrict retrieval to one tenant's documents and/or a single document
+    tenant_id: str | None = None
+    doc_id: str | None = None
+
+    @property
+    def scope(self) -> Scope:
+        return Scope(tenant_id=self.tenant_id, doc_id=self.doc_id)
+
+class QuestionRequest(ScopedRequest):
     question: str | None = None
     topic: str = "overview"
     num_turns: int = 1
+    incremental: bool = False
+    # base64: audio inlined in JSON; url: JSON with /audio/{key} references;
+    # binary: raw audio/mpeg stream (combined route only)
+    audio_format: Literal["base64", "url", "binary"] = "base64"
+    # Episodes: optional sub-topics, spread evenly over the turns
+    subtopics: list[str] | None = None
+
+class BatchQuestionRequest(ScopedRequest):
+    questions: list[str]
+
+async def _audio_urls(conversation: dict) -> dict:
+    """Synthesize each host into the audio cache and return /audio/{key} references."""
+    if not audio_cache.enabled:
+        raise HTTPException(status_code=400, detail="audio_format=url requires the audio cache")
+    keys = await asynthesize_segments_to_cache(conversation)
+    return {f"{role}_audio_url": f"/audio/{key}" for role, key in keys.items()}
 
 @router.post("/")
-def converse(req: QuestionRequest):
+async def converse(req: QuestionRequest):
     """User asks a question (third party interjection)."""
     if req.question:
-        return run_user_question(req.question)
-    return run_podcast_turn(req.topic)
+        return await arun_user_question(req.question, req.scope)
+    return await arun_podcast_turn(req.topic, req.scope)
 
 @router.post("/podcast")
-def podcast_turn(req: QuestionRequest):
+async def podcast_turn(req: QuestionRequest):
     """Generate AI-to-AI podcast turn."""
     if req.num_turns > 1:
-        return {"turns": run_multi_turn_podcast(req.topic, req.num_turns)}
-    return run_podcast_turn(req.topic)
+        return {"turns": await arun_multi_turn_podcast(req.topic, req.num_turns, req.scope)}
+    return await arun_podcast_turn(req.topic, req.scope)
+
+def _episode_engine(req: QuestionRequest) -> EpisodeEngine:
+    if req.audio_format == "binary":
+        raise ValueError("audio_format=binary is not supported for episodes")
+    return EpisodeEngine(req.topic, req.num_turns, req.scope, req.subtopics, audio=req.audio_format)
+
+@router.post("/episode")
+async def episode(req: QuestionRequest):
+    """
+    Multi-turn episode with audio for every line. TTS of each turn overlaps
+    the writing of the next; per-turn and per-stage timings are included.
+    """
+    try:
+        engine = _episode_engine(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await engine.run()
+
+@router.post("/episode/stream")
+async def episode_stream(req: QuestionRequest):
+    """
+    Live episode as Server-Sent Events: a `turn` event as soon as each turn's
+    text is written, an `audio` event per line as its audio is ready, then
+    `done` with timings. Disconnecting stops any pending LLM and TTS work.
+    """
+    try:
+        engine = _episode_engine(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        sse_stream(engine.events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/episode/ws")
+async def episode_socket(websocket: WebSocket):
+    """
+    Live episode over a WebSocket. The client sends one QuestionRequest as
+    JSON and receives the same events as /episode/stream. Any later message
+    from the client (e.g. {"type": "cancel"}) or a disconnect stops the episode.
+    """
+    await websocket.accept()
+    try:
+        engine = _episode_engine(QuestionRequest(**await websocket.receive_json()))
+    except WebSocketDisconnect:
+        return
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+
+    async def send():
+        # send_json waits for the transport, so a slow client paces the episode.
+        events = engine.events()
+        try:
+            async for event in events:
+                await websocket.send_json(event)
+        except Overloaded as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+        finally:
+            await events.aclose()
+
+    sending = asyncio.create_task(send())
+    listening = asyncio.create_task(websocket.receive())
+    await asyncio.wait({sending, listening}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (sending, listening):
+        task.cancel()
+    await asyncio.gather(sending, listening, return_exceptions=True)
+    if sending.done() and not sending.cancelled() and sending.exception() is None:
+        await websocket.close()
 
 @router.post("/ask")
-def user_asks(req: QuestionRequest):
+async def user_asks(req: QuestionRequest):
     """Explicit endpoint for user questions."""
     if not req.question:
         return {"error": "question is required"}
-    return run_user_question(req.question)
+    return await arun_user_question(req.question, req.scope)
+
+@router.post("/ask/batch")
+async def user_asks_batch(req: BatchQuestionRequest):
+    """
+    Many questions about the same documents in one call. Answers come back in
+    input order; a failed question carries an "error" instead of an answer.
+    """
+    if len(req.questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"at most {ASK_BATCH_MAX_QUESTIONS} questions per batch")
+    return {"answers": await arun_user_questions(req.questions, req.scope)}
 
 @router.post("/podcast/audio")
-def podcast_with_audio(req: QuestionRequest):
+async def podcast_with_audio(req: QuestionRequest):
     """Returns podcast with separate audio for each host."""
-    conversation = run_podcast_turn(req.topic)
-    audio = generate_podcast_audio(conversation)
+    conversation = await arun_podcast_turn(req.topic, req.scope)
+    if req.audio_format == "url":
+        return {**conversation, **await _audio_urls(conversation)}
+    audio = await agenerate_podcast_audio(conversation)
     return {**conversation, **audio}
 
 @router.post("/podcast/audio/combined")
-def podcast_combined_audio(req: QuestionRequest):
+async def podcast_combined_audio(req: QuestionRequest):
     """Returns podcast with single combined audio file."""
-    conversation = run_podcast_turn(req.topic)
-    combined = generate_combined_podcast(conversation)
+    conversation = await arun_podcast_turn(req.topic, req.scope)
+    if req.audio_format == "binary":
+        return StreamingResponse(
+            astream_segments(conversation),
+            media_type="audio/mpeg",
+            headers={"Content-Disposition": "inline; filename=podcast.mp3"}
+        )
+    if req.audio_format == "url":
+        return {**conversation, "combined_audio_urls": list((await _audio_urls(conversation)).values())}
+    combined = await agenerate_combined_podcast(conversation)
     return {**conversation, "combined_audio": combined}
 
 @router.post("/podcast/stream")
-def podcast_stream(req: QuestionRequest):
-    """Stream the explainer's response audio in real-time."""
-    conversation = run_podcast_turn(req.topic)
-    
-    def audio_stream():
-        for chunk in text_to_speech_stream(conversation["explainer"], "explainer"):
+async def podcast_stream(req: QuestionRequest):
+    """
+    Stream the explainer's response audio in real-time.
+    With `incremental`, both hosts are streamed sentence by sentence while the
+    LLM is still generating, so audio starts after roughly one sentence.
+    """
+    headers = {"Content-Disposition": "inline; filename=podcast.mp3"}
+    if req.incremental:
+        return StreamingResponse(astream_podcast_turn(req.topic, req.scope), media_type="audio/mpeg", headers=headers)
+
+    conversation = await arun_podcast_turn(req.topic, req.scope)
+
+    async def audio_stream():
+        async for chunk in atext_to_speech_stream(conversation["explainer"], "explainer"):
             yield chunk
-    
+
     return StreamingResponse(
         audio_stream(),
         media_type="audio/mpeg",
-        headers={"Content-Disposition": "inline; filename=podcast.mp3"}
-    )
\ No newline at end of file
+        headers=headers
+    )
@@ -1,17 +1,54 @@
-from fastapi import APIRouter, UploadFile, File
-from app.rag.ingest import ingest_pdf
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from app.rag.jobs import job_manager
+import asyncio
+import os
+import tempfile
 import traceback
 
 router = APIRouter()
 
-@router.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+@router.post("/upload", status_code=202)
+async def upload_pdf(
+    file: UploadFile = File(...),
+    tenant_id: Optional[str] = Form(None),
+    doc_id: Optional[str] = Form(None),
+):
+    """
+    Queue a PDF for background ingestion and return its job id at once.
+    Poll GET /upload/jobs/{job_id} for progress; the finished job carries the
+    `doc_id` to scope conversations to this document.
+    Every upload is a new document unless `doc_id` names one to replace.
+    """
     try:
-        data = await file.read()
-        ingest_pdf(data)
-        return {"status": "pdf indexed"}
+        # Worker processes need a path, so copy the upload to disk in chunks;
+        # every blocking file call runs in a worker thread, not on the event loop
+        tmp = await asyncio.to_thread(tempfile.NamedTemporaryFile, suffix=".pdf", delete=False)
+        try:
+            try:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(tmp.write, chunk)
+            finally:
+                await asyncio.to_thread(tmp.close)
+            job = job_manager.submit(tmp.name, file.filename or "upload.pdf", tenant_id, doc_id)
+        except BaseException:
+            await asyncio.to_thread(os.unlink, tmp.name)
+            raise
+        return job.as_dict()
     except Exception as e:
         print("UPLOAD ERROR:")
         traceback.print_exc()
         raise e
 
+@router.get("/jobs")
+def list_jobs():
+    return {"jobs": [job.as_dict() for job in job_manager.list()]}
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job.as_dict()
@@ -2,4 +2,102 @@ import os
 
 PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 LOCATION = os.getenv("GCP_LOCATION", "us-central1")
-#QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+
+# Observability
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # stage spans + /metrics
+METRICS_LOG_SPANS = os.getenv("METRICS_LOG_SPANS", "false").lower() == "true"  # one log line per span
+
+# Startup
+# Load the embedding model, ping the vector store and build the LLM/TTS clients
+# in the background at startup; /ready reports 503 until that has succeeded.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+# Vector store
+VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant")  # "qdrant" or "local"
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".cache/index")
+COLLECTION_PROFILE = os.getenv("COLLECTION_PROFILE", "default")  # see app/rag/profiles.py
+# Tenants listed here get a dedicated collection; all others share one, filtered by tenant_id
+TENANT_COLLECTIONS = {t.strip() for t in os.getenv("TENANT_COLLECTIONS", "").split(",") if t.strip()}
+
+# Embeddings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+# "torch" (reference), "torch-int8" (dynamic int8 quantization of the Linear layers),
+# "onnx" or "onnx-int8" (ONNX Runtime; needs sentence-transformers[onnx])
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# ONNX file inside the model repo; defaults per backend (see app/rag/embeddings.py)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE") or None
+# Compare a non-reference backend with "torch" when it loads; refuse it below the tolerance
+EMBEDDING_PARITY_CHECK = os.getenv("EMBEDDING_PARITY_CHECK", "true").lower() == "true"
+EMBEDDING_PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.98"))
+
+# Retrieval caches
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv("QUERY_VECTOR_CACHE_SIZE", "1024"))
+QUERY_VECTOR_CACHE_TTL = float(os.getenv("QUERY_VECTOR_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "300"))
+
+# LLM gateway
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-flash-latest")
+VERTEX_MODEL = os.getenv("VERTEX_MODEL", "gemini-1.5-pro")
+VERTEX_PROJECT = os.getenv("VERTEX_PROJECT")  # unset: the project of the default credentials
+VERTEX_LOCATION = os.getenv("VERTEX_LOCATION", "us-central1")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))  # callers waiting for a slot before Overloaded
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+
+# Semantic LLM response cache (opt-in)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+# Incremental (sentence-level) streaming
+STREAM_MIN_SENTENCE_CHARS = int(os.getenv("STREAM_MIN_SENTENCE_CHARS", "40"))
+TTS_STREAM_CONCURRENCY = int(os.getenv("TTS_STREAM_CONCURRENCY", "3"))
+
+# Context assembly (merge overlapping chunks, MMR selection, token budget)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "600"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1.0: relevance only
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))  # cosine above which chunks are duplicates
+
+# Batch questions (/conversation/ask/batch)
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", "64"))
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "4"))  # LLM calls in flight per batch
+
+# Request coalescing
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+# Episodes
+EPISODE_HISTORY_TURNS = int(os.getenv("EPISODE_HISTORY_TURNS", "3"))  # earlier turns shown to each prompt
+EPISODE_HEARTBEAT_SECONDS = float(os.getenv("EPISODE_HEARTBEAT_SECONDS", "10"))  # idle keep-alive on live streams
+
+# Text-to-speech
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+TTS_MAX_QUEUE = int(os.getenv("TTS_MAX_QUEUE", "32"))
+TTS_QUEUE_TIMEOUT = float(os.getenv("TTS_QUEUE_TIMEOUT", "10"))
+TTS_STREAM_BUFFER = int(os.getenv("TTS_STREAM_BUFFER", "64"))  # chunks read ahead of a slow client per clip
+AUDIO_CACHE_ENABLED = os.getenv("AUDIO_CACHE_ENABLED", "true").lower() == "true"
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", ".cache/audio")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "2"))
+INGEST_PROCESS_WORKERS = int(os.getenv("INGEST_PROCESS_WORKERS", "2"))
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "16"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "100"))
+
+# Chunking
+CHUNKER = os.getenv("CHUNKER", "sentence")  # "sentence" or "chars" (legacy 500/100 slices)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_OVERLAP_SENTENCES = int(os.getenv("CHUNK_OVERLAP_SENTENCES", "1"))
+CHUNK_MAX_SENTENCE_CHARS = int(os.getenv("CHUNK_MAX_SENTENCE_CHARS", "4000"))  # forced break without punctuation
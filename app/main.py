@@ -1,22 +1,76 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from app.api.upload import router as upload_router
 from app.api.conversation import router as conversation_router
+from app.api.audio import router as audio_router
+from app.config import WARMUP_ON_STARTUP, WARMUP_RETRY_SECONDS
+from app.rag.embeddings import get_engine
+from app.rag.vectorstore import get_store
+from app.rag.cache import cache_stats
+from app.services.semantic_cache import semantic_cache
+from app.services.audio_cache import audio_cache
+from app.rag.jobs import job_manager
+from app.services.admission import Overloaded, admission_stats
+from app.agents.controller import inflight
+from app.services import metrics, tts
+from app.services.llm import get_gateway
+import asyncio
 import logging
 import os
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+
+
+# Heavy resources (embedding model, vector store client, Gemini and ElevenLabs
+# clients) are built lazily by their accessors on first use, so importing the
+# app and starting the process stay fast. warm_up() builds them ahead of
+# traffic when WARMUP_ON_STARTUP is set.
+def warm_up():
+    """One dummy encode, one vector store ping, and the LLM and TTS clients."""
+    get_engine().warm_up()
+    get_store().ping()
+    get_gateway()
+    if os.getenv("ELEVENLABS_API_KEY"):
+        tts.get_client()
+        tts.get_async_client()
+
+
+async def _warm_up(app: FastAPI):
+    while True:
+        started = asyncio.get_running_loop().time()
+        try:
+            await asyncio.to_thread(warm_up)
+        except Exception as e:
+            app.state.warmup_error = str(e)
+            logging.error(f"Warm-up failed, retrying in {WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            continue
+        app.state.warmup_error = None
+        app.state.warmed_up = True
+        logging.info(f"Warm-up done in {asyncio.get_running_loop().time() - started:.2f}s")
+        return
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     logging.info("Starting up the application")
-    print("\nRegistered Routes:")
     for route in app.routes:
-        print(f"{route.path} - {route.methods}")
+        logging.debug(f"Route {getattr(route, 'path', route)} - {getattr(route, 'methods', None)}")
+    app.state.warmed_up = not WARMUP_ON_STARTUP
+    app.state.warmup_error = None
+    # In the background: the process accepts liveness probes right away
+    warming = asyncio.create_task(_warm_up(app)) if WARMUP_ON_STARTUP else None
     yield
     # Shutdown logic (if needed):app
     logging.info("Shutting down the application")
+    if warming is not None:
+        warming.cancel()
+        with suppress(asyncio.CancelledError):
+            await warming
+    job_manager.shutdown()
 
 
 app = FastAPI(title="Voice RAG Podcast", lifespan=lifespan)
@@ -45,8 +99,99 @@ app.add_middleware(
 
 app.include_router(upload_router, prefix="/upload", tags=["upload"])
 app.include_router(conversation_router, prefix="/conversation", tags=["conversation"])
+app.include_router(audio_router, prefix="/audio", tags=["audio"])
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # Shed load quickly; clients should back off and retry
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+class CorrelationMiddleware:
+    """
+    Tags every span recorded while handling a request with its ID and reports
+    the spans done by the time headers go out as Server-Timing. Plain ASGI, so
+    the request stays in scope until the last body chunk is sent and streamed
+    (SSE, audio) responses pass through unbuffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        incoming = Headers(scope=scope).get("x-request-id")
+        with metrics.request(incoming) as (request_id, spans):
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers["X-Request-ID"] = request_id
+                    if spans:
+                        headers["Server-Timing"] = metrics.server_timing(spans)
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+
+app.add_middleware(CorrelationMiddleware)
+
+
+def _cache_counts() -> dict:
+    caches = {**cache_stats(), "semantic": semantic_cache.stats(), "audio": audio_cache.stats()}
+    counts = {}
+    for name, stats in caches.items():
+        counts[(name, "hit")] = stats["hits"]
+        counts[(name, "miss")] = stats["misses"]
+    return counts
+
+
+metrics.register_collector("caches", _cache_counts)
 
 
 @app.get("/")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/live")
+def live():
+    """Liveness: the process is up and serving. Never touches a dependency."""
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness: warm-up (if enabled) has finished and the vector store answers."""
+    if not getattr(request.app.state, "warmed_up", True):
+        detail = {"status": "warming_up"}
+        if request.app.state.warmup_error:
+            detail["error"] = request.app.state.warmup_error
+        return JSONResponse(status_code=503, content=detail)
+    try:
+        await asyncio.to_thread(lambda: get_store().ping())
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": str(e)})
+    return {"status": "ready", "embedding_model_loaded": get_engine().loaded}
+
+
+@app.get("/stats")
+def stats():
+    return {
+        "embeddings": get_engine().stats(),
+        "cache": cache_stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "audio_cache": audio_cache.stats(),
+        "admission": admission_stats(),
+        "single_flight": inflight.stats(),
+    }
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition of stage latencies, LLM/TTS volume, cache hits and ingestion rate."""
+    if not metrics.enabled:
+        return Response(status_code=404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.config import (
+    QUERY_VECTOR_CACHE_SIZE,
+    QUERY_VECTOR_CACHE_TTL,
+    RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_CACHE_TTL,
+)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches `predicate`. Returns the count dropped."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# ======================
+# Retrieval caches
+# ======================
+# query text -> embedding vector
+query_vector_cache = TTLCache(QUERY_VECTOR_CACHE_SIZE, QUERY_VECTOR_CACHE_TTL)
+# (query, top_k, collection, generation) -> [(text, score), ...]
+retrieval_cache = TTLCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+_generations: dict = {}
+_generations_lock = threading.Lock()
+
+
+def collection_generation(collection: str) -> int:
+    """
+    Monotonic counter bumped whenever `collection` changes. Retrieval results
+    are keyed on it so a search that started before an ingest can never be
+    served after it.
+    """
+    with _generations_lock:
+        return _generations.get(collection, 0)
+
+
+def invalidate_collection(collection: str) -> int:
+    with _generations_lock:
+        _generations[collection] = _generations.get(collection, 0) + 1
+    return retrieval_cache.invalidate(lambda key: key[2] == collection)
+
+
+def cache_stats() -> dict:
+    return {
+        "query_vectors": query_vector_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+    }
@@ -1,3 +1,12 @@
+import bisect
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import CHUNKER, CHUNK_MAX_SENTENCE_CHARS, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_SENTENCES
+
+
 def chunk_text(text: str, chunk_size=500, overlap=100):
     chunks = []
     start = 0
@@ -8,3 +17,254 @@ def chunk_text(text: str, chunk_size=500, overlap=100):
         start = end - overlap
 
     return chunks
+
+
+def _chunk_spans(texts: Iterable[str], page_starts: List[int], chunk_size=500, overlap=100,
+                 separator="\n") -> Iterator[Tuple[int, str]]:
+    # Incremental chunk_text() over a stream of texts (e.g. PDF pages) joined by
+    # `separator`: yields (offset, chunk) and records where each text starts in
+    # `page_starts`. Only the unfinished tail is buffered, so memory stays at
+    # about one page plus one chunk. Unlike chunk_text(), no trailing chunk made
+    # only of overlap is emitted.
+    step = chunk_size - overlap
+    buffer = ""
+    buffer_start = 0
+    emitted = False
+    for i, text in enumerate(texts):
+        page_starts.append(buffer_start + len(buffer) + (len(separator) if i else 0))
+        buffer += text if i == 0 else separator + text
+        while len(buffer) >= chunk_size:
+            yield buffer_start, buffer[:chunk_size]
+            emitted = True
+            buffer = buffer[step:]
+            buffer_start += step
+    if buffer and not (emitted and len(buffer) <= overlap):
+        yield buffer_start, buffer
+
+
+# ======================
+# Sentence-aware chunking
+# ======================
+# A sentence ends at terminal punctuation (plus closing quotes/brackets) followed
+# by whitespace, or at a paragraph break.
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*\n")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_WORD = re.compile(r"\S+")
+_WHITESPACE = re.compile(r"\s+")
+_BOUNDARY_CHARS = ".!?\"')]"
+
+
+def _boundary_tail(text: str) -> int:
+    # Start of the trailing run a boundary could still grow out of once more text arrives
+    i = len(text)
+    while i and (text[i - 1].isspace() or text[i - 1] in _BOUNDARY_CHARS):
+        i -= 1
+    return i
+
+
+@dataclass
+class Chunk:
+    text: str
+    page: int       # 1-based page the chunk starts on
+    page_end: int   # 1-based page the chunk ends on
+    start: int      # character offsets into the pages joined by "\n"
+    end: int
+    tokens: int
+
+    def payload(self) -> dict:
+        return {
+            "text": self.text,
+            "page": self.page,
+            "page_end": self.page_end,
+            "start": self.start,
+            "end": self.end,
+        }
+
+
+@dataclass
+class _Sentence:
+    text: str
+    start: int
+    end: int
+    tokens: int = 0
+    paragraph_end: bool = False
+
+
+class SentenceChunker:
+    """
+    Packs whole sentences into chunks of at most `max_tokens` tokens, as
+    measured by `count_tokens` (normally the embedding model's tokenizer).
+
+    Pages are consumed as a stream in one linear pass: each page's sentences
+    are tokenized in one batch, a sentence running over a page break is carried
+    into the next page, and only the current chunk window is kept in memory.
+    Consecutive chunks share the last `overlap_sentences` sentences. A chunk is
+    also closed, without overlap, at a paragraph break once it is at least half
+    full. Sentences longer than the budget are split on word boundaries.
+
+    Text running `max_sentence_chars` without a boundary (tables, extraction
+    noise) is cut at the last whitespace before the limit, so the carried
+    buffer stays bounded and each character is scanned once.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[List[str]], List[int]],
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+        separator: str = "\n",
+        max_sentence_chars: int = CHUNK_MAX_SENTENCE_CHARS,
+    ):
+        self.count_tokens = count_tokens
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_sentences = max(0, overlap_sentences)
+        self.max_sentence_chars = max(1, max_sentence_chars)
+        self.separator = separator
+
+    def _sentence(self, raw: str, start: int, paragraph_end: bool = False) -> Optional[_Sentence]:
+        text = _WHITESPACE.sub(" ", raw).strip()
+        if not text:
+            return None
+        lead = len(raw) - len(raw.lstrip())
+        return _Sentence(text, start + lead, start + len(raw.rstrip()), paragraph_end=paragraph_end)
+
+    def _split_long(self, sentence: _Sentence, raw: str) -> List[_Sentence]:
+        words = [(m.start(), m.end()) for m in _WORD.finditer(raw)]
+        pieces = math.ceil(sentence.tokens / self.max_tokens)
+        size = max(1, math.ceil(len(words) / pieces))
+        base = sentence.start - (len(raw) - len(raw.lstrip()))
+        parts = []
+        for i in range(0, len(words), size):
+            first, last = words[i][0], words[min(i + size, len(words)) - 1][1]
+            part = self._sentence(raw[first:last], base + first)
+            if part:
+                parts.append(part)
+        for part, tokens in zip(parts, self.count_tokens([p.text for p in parts])):
+            part.tokens = tokens
+        if parts:
+            parts[-1].paragraph_end = sentence.paragraph_end
+        return parts
+
+    def _force_breaks(self, buffer: str, position: int, limit: int, buffer_start: int,
+                      found: List[Tuple[_Sentence, str]]) -> int:
+        # Break text running past max_sentence_chars before `limit` at the last
+        # whitespace of each window; returns the new position
+        while limit - position > self.max_sentence_chars:
+            window = buffer[position:position + self.max_sentence_chars]
+            cut = max(window.rfind(" "), window.rfind("\n"), window.rfind("\t"))
+            raw = window[:cut] if cut > 0 else window
+            sentence = self._sentence(raw, buffer_start + position)
+            if sentence:
+                found.append((sentence, raw))
+            position += len(raw)
+        return position
+
+    def _sentences(self, pages: Iterable[str], page_starts: List[int]) -> Iterator[_Sentence]:
+        buffer = ""
+        buffer_start = 0
+        scan = 0  # no boundary can start before this index of the buffer
+        offset = 0
+        for page_no, text in enumerate(pages):
+            piece = text if page_no == 0 else self.separator + text
+            page_starts.append(offset + (0 if page_no == 0 else len(self.separator)))
+            buffer += piece
+            offset += len(piece)
+
+            found: List[Tuple[_Sentence, str]] = []
+            position = 0
+            for match in _BOUNDARY.finditer(buffer, scan):
+                if match.end() == len(buffer):
+                    # The boundary may continue on the next page (e.g. into a paragraph break)
+                    break
+                position = self._force_breaks(buffer, position, match.start(), buffer_start, found)
+                raw = buffer[position:match.end()]
+                sentence = self._sentence(raw, buffer_start + position,
+                                          bool(_PARAGRAPH.search(match.group())))
+                if sentence:
+                    found.append((sentence, raw))
+                position = match.end()
+            # Only text before a boundary still in the making can be broken now
+            position = self._force_breaks(buffer, position, max(position, _boundary_tail(buffer)),
+                                          buffer_start, found)
+            buffer = buffer[position:]
+            buffer_start += position
+            scan = _boundary_tail(buffer)
+
+            yield from self._counted(found)
+
+        found = []
+        position = self._force_breaks(buffer, 0, len(buffer), buffer_start, found)
+        tail = self._sentence(buffer[position:], buffer_start + position, True)
+        if tail:
+            found.append((tail, buffer[position:]))
+        yield from self._counted(found)
+
+    def _counted(self, found: List[Tuple[_Sentence, str]]) -> Iterator[_Sentence]:
+        for (sentence, _), tokens in zip(found, self.count_tokens([s.text for s, _ in found])):
+            sentence.tokens = tokens
+        for sentence, raw in found:
+            if sentence.tokens > self.max_tokens:
+                yield from self._split_long(sentence, raw)
+            else:
+                yield sentence
+
+    def chunks(self, pages: Iterable[str]) -> Iterator[Chunk]:
+        page_starts: List[int] = []
+
+        def page_of(position: int) -> int:
+            return bisect.bisect_right(page_starts, position)
+
+        def make(window: List[_Sentence]) -> Chunk:
+            return Chunk(
+                text=" ".join(s.text for s in window),
+                page=page_of(window[0].start),
+                page_end=page_of(max(window[-1].end - 1, window[-1].start)),
+                start=window[0].start,
+                end=window[-1].end,
+                tokens=sum(s.tokens for s in window),
+            )
+
+        window: List[_Sentence] = []
+        tokens = 0
+        fresh = 0  # sentences in the window not yet emitted in any chunk
+        for sentence in self._sentences(pages, page_starts):
+            if window and tokens + sentence.tokens > self.max_tokens:
+                yield make(window)
+                window = window[-self.overlap_sentences:] if self.overlap_sentences else []
+                while window and sum(s.tokens for s in window) + sentence.tokens > self.max_tokens:
+                    window.pop(0)
+                tokens = sum(s.tokens for s in window)
+                fresh = 0
+            window.append(sentence)
+            tokens += sentence.tokens
+            fresh += 1
+            if sentence.paragraph_end and tokens >= self.max_tokens // 2:
+                # No overlap across a paragraph break
+                yield make(window)
+                window, tokens, fresh = [], 0, 0
+        if fresh:
+            yield make(window)
+
+
+def chunk_pages(
+    pages: Iterable[str],
+    count_tokens: Callable[[List[str]], List[int]],
+    mode: str = CHUNKER,
+) -> Iterator[Chunk]:
+    """Chunk a page stream with the configured strategy ("sentence" or "chars")."""
+    if mode == "sentence":
+        yield from SentenceChunker(count_tokens).chunks(pages)
+        return
+    if mode != "chars":
+        raise ValueError(f"Unknown chunker: {mode}")
+    page_starts: List[int] = []
+    for start, text in _chunk_spans(pages, page_starts):
+        end = start + len(text)
+        yield Chunk(
+            text=text,
+            page=bisect.bisect_right(page_starts, start),
+            page_end=bisect.bisect_right(page_starts, end - 1),
+            start=start,
+            end=end,
+            tokens=0,
+        )
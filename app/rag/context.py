@@ -0,0 +1,181 @@
+"""
+Context assembly: turns retrieved chunks into the text handed to the prompts.
+
+Neighbouring chunks of one document share text (sentence overlap, or the
+100-character overlap of legacy chunks), and several hits often say nearly
+the same thing. Joining them as-is spends prompt tokens on repetition, so the
+hits are compacted in three steps:
+
+1. merge: chunks of the same document that overlap or touch are stitched
+   into one passage, with the shared text kept once;
+2. select: maximal marginal relevance over the hit vectors picks passages
+   that are relevant but not redundant with those already picked;
+3. pack: passages are added in that order while they fit the token budget.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import CONTEXT_DEDUP_THRESHOLD, CONTEXT_MAX_TOKENS, CONTEXT_MMR_LAMBDA
+
+# Shortest shared text treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+
+
+@dataclass
+class Passage:
+    text: str
+    score: float
+    payload: dict = field(default_factory=dict)
+    vector: Optional[np.ndarray] = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Word-piece estimate, close enough for budgeting without loading a tokenizer."""
+    return int(len(text.split()) * 1.3) + 1
+
+
+def _overlap(a: str, b: str, min_chars: int = MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b` (0 if under `min_chars`)."""
+    if len(a) < min_chars or len(b) < min_chars:
+        return 0
+    head = b[:min_chars]
+    position = a.find(head, max(0, len(a) - len(b)))
+    while position != -1:
+        if b.startswith(a[position:]):
+            return len(a) - position
+        position = a.find(head, position + 1)
+    return 0
+
+
+def _join(a: Passage, b: Passage) -> Passage:
+    """Stitch `b` onto the end of `a`, keeping shared text once."""
+    if b.text in a.text:
+        text = a.text
+    else:
+        shared = _overlap(a.text, b.text)
+        text = a.text + b.text[shared:] if shared else f"{a.text} {b.text}"
+    payload = dict(a.payload)
+    for key in ("end", "page_end"):
+        if key in b.payload:
+            payload[key] = max(a.payload.get(key, b.payload[key]), b.payload[key])
+    vector = a.vector
+    if a.vector is not None and b.vector is not None:
+        vector = np.asarray(a.vector, dtype=np.float32) + np.asarray(b.vector, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+    return Passage(text, max(a.score, b.score), payload, vector)
+
+
+def merge_overlapping(passages: Sequence[Passage]) -> List[Passage]:
+    """
+    Merge chunks of the same document that overlap or are adjacent.
+    Chunks with character offsets are merged by offset; chunks without them
+    only when their text visibly overlaps. Result is ordered by score.
+    """
+    by_doc = {}
+    for passage in passages:
+        by_doc.setdefault(passage.payload.get("doc_id"), []).append(passage)
+
+    merged: List[Passage] = []
+    for group in by_doc.values():
+        located = sorted(
+            (p for p in group if "start" in p.payload and "end" in p.payload),
+            key=lambda p: p.payload["start"],
+        )
+        current: Optional[Passage] = None
+        for passage in located:
+            # +1: chunks split on the page separator or a space are adjacent too
+            if current is not None and passage.payload["start"] <= current.payload["end"] + 1:
+                current = _join(current, passage)
+            else:
+                if current is not None:
+                    merged.append(current)
+                current = passage
+        if current is not None:
+            merged.append(current)
+
+        loose: List[Passage] = []
+        for passage in (p for p in group if "start" not in p.payload or "end" not in p.payload):
+            for i, other in enumerate(loose):
+                if passage.text in other.text or _overlap(other.text, passage.text):
+                    loose[i] = _join(other, passage)
+                    break
+                if other.text in passage.text or _overlap(passage.text, other.text):
+                    loose[i] = _join(passage, other)
+                    break
+            else:
+                loose.append(passage)
+        merged.extend(loose)
+    return sorted(merged, key=lambda p: p.score, reverse=True)
+
+
+def mmr(relevance: np.ndarray, vectors: np.ndarray, k: int, diversity: float = CONTEXT_MMR_LAMBDA,
+        duplicate: float = CONTEXT_DEDUP_THRESHOLD) -> List[int]:
+    """
+    Indices of up to `k` rows chosen by maximal marginal relevance:
+    each pick maximizes `diversity * relevance - (1 - diversity) * max
+    similarity to the rows already picked`. Rows at least `duplicate`
+    similar to a picked row are never picked. One similarity matrix is
+    computed up front; each step is a vector update.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+    unit = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    unit = unit / np.where(norms == 0, 1.0, norms)
+    similarity = unit @ unit.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    redundancy = similarity[first].copy()
+    available = redundancy < duplicate
+    available[first] = False
+    while len(selected) < k and available.any():
+        gains = diversity * relevance - (1 - diversity) * redundancy
+        gains[~available] = -np.inf
+        best = int(np.argmax(gains))
+        selected.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+        available &= redundancy < duplicate
+    return selected
+
+
+def pack(passages: Sequence[Passage], max_tokens: int,
+         count_tokens: Callable[[str], int] = estimate_tokens) -> List[Passage]:
+    """
+    Keep passages, in order, while they fit in `max_tokens`; ones that don't
+    fit are skipped in favour of shorter ones further down. The first passage
+    is always kept so the prompt is never left without context.
+    """
+    packed: List[Passage] = []
+    used = 0
+    for passage in passages:
+        tokens = count_tokens(passage.text)
+        if packed and used + tokens > max_tokens:
+            continue
+        packed.append(passage)
+        used += tokens
+    return packed
+
+
+def compact(passages: Sequence[Passage], max_tokens: int = CONTEXT_MAX_TOKENS,
+            diversity: float = CONTEXT_MMR_LAMBDA,
+            count_tokens: Callable[[str], int] = estimate_tokens) -> List[Passage]:
+    """Merge, select and pack retrieved passages (see module docstring)."""
+    merged = merge_overlapping(passages)
+    if len(merged) > 1 and all(p.vector is not None for p in merged):
+        order = mmr(
+            np.array([p.score for p in merged]),
+            np.stack([np.asarray(p.vector, dtype=np.float32) for p in merged]),
+            len(merged),
+            diversity,
+        )
+        merged = [merged[i] for i in order]
+    return pack(merged, max_tokens, count_tokens)
+
+
+def build_context(passages: Sequence[Passage], max_tokens: int = CONTEXT_MAX_TOKENS) -> str:
+    return "\n\n".join(passage.text for passage in compact(passages, max_tokens))
@@ -1,6 +1,340 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import (
+    EMBEDDING_MODEL,
+    EMBED_MAX_BATCH_SIZE,
+    EMBED_MAX_WAIT_MS,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_PARITY_CHECK,
+    EMBEDDING_PARITY_MIN_COSINE,
+)
+
+
+# ======================
+# Backends
+# ======================
+# Every backend returns a SentenceTransformer, so encode(), the tokenizer and
+# the pooling/normalization steps are the same whichever one is selected.
+REFERENCE_BACKEND = "torch"
+
+# ONNX files shipped in the sentence-transformers model repos (all-MiniLM-L6-v2
+# among them). quint8_avx2 runs on any x86-64 node of the last decade; set
+# EMBEDDING_ONNX_FILE to e.g. onnx/model_qint8_avx512_vnni.onnx on newer CPUs.
+ONNX_FILES = {
+    "onnx": "onnx/model.onnx",
+    "onnx-int8": "onnx/model_quint8_avx2.onnx",
+}
+
+
+def _torch_model(model_name: str):
+    # Imported here: sentence_transformers pulls in torch, which alone takes
+    # seconds and is not needed until the first encode
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+def _torch_int8_model(model_name: str):
+    """Dynamic quantization: Linear weights stored as int8, activations quantized per batch (CPU only)."""
+    import torch
+
+    model = _torch_model(model_name).to("cpu")
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _onnx_model(model_name: str, file_name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+BACKENDS: Dict[str, Callable[[str], object]] = {
+    "torch": _torch_model,
+    "torch-int8": _torch_int8_model,
+    "onnx": lambda name: _onnx_model(name, EMBEDDING_ONNX_FILE or ONNX_FILES["onnx"]),
+    "onnx-int8": lambda name: _onnx_model(name, EMBEDDING_ONNX_FILE or ONNX_FILES["onnx-int8"]),
+}
+
+
+def load_model(model_name: str = EMBEDDING_MODEL, backend: str = REFERENCE_BACKEND):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return BACKENDS[backend](model_name)
+
+
+# ======================
+# Parity
+# ======================
+# Short and long, plain and technical text: where quantization error shows first
+PARITY_TEXTS = [
+    "What is this document about?",
+    "Summarize the main argument in two sentences.",
+    "How does the reactor cooling loop handle a loss of pressure?",
+    "Explain gradient descent to a high-school student.",
+    "The quarterly revenue grew 12% year over year, driven mostly by subscriptions.",
+    "Mitochondria generate most of the chemical energy needed to power the cell's biochemical reactions.",
+    "Section 4.2 defines the retry policy: three attempts with exponential backoff and full jitter.",
+    "Who?",
+    "The court held that the contract was void because one party lacked the capacity to consent, "
+    "and it ordered restitution of every payment made under it.",
+    "In 1969, the Apollo 11 mission landed the first humans on the Moon.",
+    "Protein folding determines function; misfolded proteins can aggregate and cause disease.",
+    "Compare the memory footprint of scalar and product quantization for a million 384-dimensional vectors.",
+]
+
+
+class EmbeddingParityError(Exception):
+    """Raised when a backend's vectors drift too far from the reference model's."""
+
+
+def parity(candidate, reference, texts: Sequence[str] = PARITY_TEXTS) -> dict:
+    """Row-wise cosine similarity between two models' embeddings of `texts`."""
+    texts = list(texts)
+    a = np.asarray(candidate.encode(texts, batch_size=len(texts), convert_to_numpy=True), dtype=np.float32)
+    b = np.asarray(reference.encode(texts, batch_size=len(texts), convert_to_numpy=True), dtype=np.float32)
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    cosine = (a * b).sum(axis=1) / np.where(norms == 0, 1.0, norms)
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean()), "texts": len(texts)}
+
+
+def check_parity(candidate, reference, min_cosine: float = EMBEDDING_PARITY_MIN_COSINE,
+                 texts: Sequence[str] = PARITY_TEXTS) -> dict:
+    """parity(), raising EmbeddingParityError if any text falls below `min_cosine`."""
+    result = parity(candidate, reference, texts)
+    if result["min_cosine"] < min_cosine:
+        raise EmbeddingParityError(
+            f"min cosine {result['min_cosine']:.4f} to the reference model is below {min_cosine}"
+        )
+    return result
+
+
+# ======================
+# Engine
+# ======================
+class EmbeddingEngine:
+    """
+    Process-wide embedding model shared by ingestion and retrieval.
+
+    Bulk encodes (ingestion) go straight to the model. Single-query encodes
+    (retrieval) are queued and a background thread coalesces the requests
+    that arrive within `max_wait_ms` of each other, up to `max_batch_size`,
+    into one forward pass.
+
+    The model is loaded through BACKENDS[backend]. A backend other than the
+    reference one is checked against it on load (EMBEDDING_PARITY_CHECK), so
+    vectors already in the index stay comparable with new query vectors.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+        model=None,
+        backend: str = EMBEDDING_BACKEND,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.parity: Optional[dict] = None
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._queue: Queue = Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        logging.info(f"Loading embedding model {self.model_name} ({self.backend} backend)")
+        model = load_model(self.model_name, self.backend)
+        if self.backend != REFERENCE_BACKEND and EMBEDDING_PARITY_CHECK:
+            self.parity = check_parity(model, load_model(self.model_name, REFERENCE_BACKEND))
+            logging.info(f"Embedding backend {self.backend} parity: {self.parity}")
+        return model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self):
+        """Load the model and run one encode, so the first request pays neither."""
+        self.model.encode(["warm-up"], batch_size=1, convert_to_numpy=True)
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token counts under the model's own tokenizer (no special tokens)."""
+        if not texts:
+            return []
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            # Rough word-piece estimate for models without a HF tokenizer
+            return [int(len(text.split()) * 1.3) + 1 for text in texts]
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+    def embed_texts(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """Encode a list of texts directly (used for ingestion)."""
+        if not texts:
+            return []
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True).tolist()
+
+    def embed_query(self, text: str, timeout: Optional[float] = None) -> List[float]:
+        """Encode a single query, sharing a forward pass with concurrent callers."""
+        return self.submit(text).result(timeout=timeout)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async variant of embed_query; awaits the shared batch without blocking the loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Encode a known batch of queries in a single forward pass."""
+        if not texts:
+            return []
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(texts)
+            self._max_batch = max(self._max_batch, len(texts))
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True).tolist()
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_queries, texts)
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "parity": self.parity,
+                "loaded": self._model is not None,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "requests": self._requests,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size_seen": self._max_batch,
+                "avg_queue_wait_ms": self._wait_total / self._requests * 1000.0 if self._requests else 0.0,
+                "max_queue_wait_ms": self._wait_max * 1000.0,
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Callers that gave up (cancelled awaits) are dropped before encoding;
+            # a running future can no longer be cancelled under us
+            batch = [item for item in self._collect_batch() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            self._record(batch, started)
+            texts = [text for text, _, _ in batch]
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+            except Exception as e:
+                logging.error(f"Error during batched embedding: {e}")
+                vectors = None
+                error = e
+            for i, (_, future, _) in enumerate(batch):
+                try:
+                    if vectors is None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(vectors[i].tolist())
+                except Exception as e:
+                    # Never let one future take the batcher thread down with it
+                    logging.error(f"Error delivering embedding result: {e}")
+
+    def _record(self, batch: list, started: float):
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+
+_engine: Optional[EmbeddingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> EmbeddingEngine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def embed_texts(texts: list[str]) -> list[list[float]]:
-    return model.encode(texts, convert_to_numpy=True).tolist()
+    return get_engine().embed_texts(texts)
+
+
+def embed_query(text: str) -> list[float]:
+    return get_engine().embed_query(text)
+
+
+async def aembed_query(text: str) -> list[float]:
+    return await get_engine().aembed_query(text)
+
+
+def embed_queries(texts: list[str]) -> list[list[float]]:
+    return get_engine().embed_queries(texts)
+
+
+async def aembed_queries(texts: list[str]) -> list[list[float]]:
+    return await get_engine().aembed_queries(texts)
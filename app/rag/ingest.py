@@ -42,46 +42,281 @@ def ingest_and_index(pdf_path: str | Path) -> int:
 
 
 
+import hashlib
+import itertools
+import time
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Union
 from pypdf import PdfReader
-from app.rag.chunking import chunk_text
-from app.rag.qdrant_client import client
-from sentence_transformers import SentenceTransformer
-from qdrant_client.models import PointStruct, VectorParams, Distance
-import uuid
-
-COLLECTION = "docs"
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-def ingest_pdf(pdf_path: str):
-    # Extract text
-    reader = PdfReader(pdf_path)
-    text = "\n".join(page.extract_text() or "" for page in reader.pages)
-    
-    # Chunk
-    chunks = chunk_text(text)
-    
-    # Create collection if not exists
-    collections = [c.name for c in client.get_collections().collections]
-    if COLLECTION not in collections:
-        client.create_collection(
-            collection_name=COLLECTION,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE)
-        )
-    
-    # Embed and upsert
-    embeddings = model.encode(chunks).tolist()
-    points = [
-        PointStruct(
-            id=str(uuid.uuid4()),
-            vector=emb,
-            payload={"text": chunk}
-        )
-        for chunk, emb in zip(chunks, embeddings)
-    ]
-    
-    client.upsert(collection_name=COLLECTION, points=points)
-    return len(chunks)
+from app.config import INGEST_BATCH_SIZE
+from app.rag.chunking import Chunk, chunk_pages
+from app.rag.embeddings import get_engine
+from app.rag.cache import invalidate_collection
+from app.rag.vectorstore import COLLECTION, chunk_hash, collection_for, get_store, point_id
+from app.services import metrics
+
+
+@dataclass
+class IngestStats:
+    """Progress counters and cumulative per-stage timings (seconds)."""
+    doc_id: Optional[str] = None
+    tenant_id: Optional[str] = None
+    unchanged: bool = False
+    pages: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    reused: int = 0
+    deleted: int = 0
+    batches: int = 0
+    timings: dict = field(default_factory=lambda: {
+        "hash": 0.0, "extract": 0.0, "chunk": 0.0, "embed": 0.0, "upsert": 0.0, "total": 0.0,
+    })
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def iter_pages(reader: PdfReader, stats: IngestStats) -> Iterator[str]:
+    """Extract page text one page at a time."""
+    for page in reader.pages:
+        started = time.perf_counter()
+        text = page.extract_text() or ""
+        stats.timings["extract"] += time.perf_counter() - started
+        stats.pages += 1
+        yield text
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _timed_chunks(pages: Iterable[str], count_tokens, stats: IngestStats) -> Iterator[Chunk]:
+    # The chunker pulls pages lazily; time spent waiting on the page source is
+    # subtracted so "chunk" measures chunking alone.
+    waited = 0.0
+
+    def pulled():
+        nonlocal waited
+        iterator = iter(pages)
+        while True:
+            started = time.perf_counter()
+            page = next(iterator, None)
+            waited += time.perf_counter() - started
+            if page is None:
+                return
+            yield page
+
+    chunks = chunk_pages(pulled(), count_tokens)
+    while True:
+        started = time.perf_counter()
+        waited_before = waited
+        chunk = next(chunks, None)
+        stats.timings["chunk"] += time.perf_counter() - started - (waited - waited_before)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _write_batch(collection: str, ids: List[str], vectors: List[List[float]], payloads: List[dict],
+                 reused: Dict[str, dict], stats: IngestStats):
+    started = time.perf_counter()
+    store = get_store()
+    store.upsert(collection, ids, vectors, payloads)
+    if reused:
+        # Chunks carried over from a previous version keep their vector, but the
+        # same text may sit on another page or offset now: rewrite the whole payload.
+        store.overwrite_payloads(collection, reused)
+    invalidate_collection(collection)
+    stats.timings["upsert"] += time.perf_counter() - started
+
+
+def is_indexed(doc_id: str, doc_version: str, collection: str = COLLECTION) -> bool:
+    """True if this exact version of the document was fully ingested and nothing else of it remains."""
+    store = get_store()
+    try:
+        complete = store.count(collection, {"doc_id": doc_id, "doc_version": doc_version, "doc_complete": True})
+        if not complete:
+            return False
+        return store.count(collection, {"doc_id": doc_id}, exclude={"doc_version": doc_version}) == 0
+    except Exception:
+        # Collection missing or unreachable: fall through to a full ingest.
+        return False
+
+
+def _finalize(collection: str, doc_id: str, doc_version: str, stats: IngestStats):
+    """Drop points left over from older versions and mark this one complete."""
+    started = time.perf_counter()
+    store = get_store()
+    stale = {"match": {"doc_id": doc_id}, "exclude": {"doc_version": doc_version}}
+    stats.deleted = store.count(collection, **stale)
+    if stats.deleted:
+        store.delete(collection, **stale)
+    store.set_payload(collection, {"doc_complete": True}, match={"doc_id": doc_id, "doc_version": doc_version})
+    invalidate_collection(collection)
+    stats.timings["upsert"] += time.perf_counter() - started
+
+
+def index_pages(
+    pages: Iterable[str],
+    doc_id: str,
+    doc_version: str,
+    batch_size: int = INGEST_BATCH_SIZE,
+    on_progress: Optional[Callable[[IngestStats], None]] = None,
+    stats: Optional[IngestStats] = None,
+    tenant_id: Optional[str] = None,
+) -> IngestStats:
+    """
+    Chunk, embed and upsert a stream of page texts for one document.
+
+    Point IDs are derived from (doc_id, chunk hash), so chunks that are already
+    in the collection are looked up in bulk and only retagged, never re-embedded.
+    New chunks are embedded in fixed-size batches; each batch is written on a
+    background thread while the next one is embedding, with at most one write
+    in flight. Once every page is in, points from older versions of the
+    document are deleted. `stats.pages` is counted by whoever produces `pages`.
+
+    Points are tagged with `tenant_id` when given and written to that tenant's
+    collection (see collection_for()).
+    """
+    stats = stats or IngestStats()
+    started = time.perf_counter()
+    engine = get_engine()
+    store = get_store()
+    collection = collection_for(tenant_id)
+    store.ensure_collection(collection, engine.dimension)
+    scope = {"tenant_id": tenant_id} if tenant_id else {}
+
+    chunks = _timed_chunks(pages, engine.count_tokens, stats)
+
+    pending: Optional[Future] = None
+    seen = set()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-upsert") as upserter:
+        for batch in batched(chunks, batch_size):
+            # Identical chunks within a document share one point.
+            keyed = {}
+            for chunk in batch:
+                text_hash = chunk_hash(chunk.text)
+                pid = point_id(doc_id, text_hash)
+                if pid not in seen:
+                    seen.add(pid)
+                    keyed[pid] = (chunk, text_hash)
+
+            existing = store.existing_ids(collection, list(keyed))
+            fresh = [pid for pid in keyed if pid not in existing]
+
+            embed_started = time.perf_counter()
+            embeddings = engine.embed_texts([keyed[pid][0].text for pid in fresh], batch_size=batch_size)
+            stats.timings["embed"] += time.perf_counter() - embed_started
+
+            payloads = {
+                pid: {
+                    **chunk.payload(),
+                    "chunk_hash": text_hash,
+                    "doc_id": doc_id,
+                    **scope,
+                    "doc_version": doc_version,
+                    "doc_complete": False,
+                }
+                for pid, (chunk, text_hash) in keyed.items()
+            }
+
+            if pending is not None:
+                pending.result()
+            pending = upserter.submit(
+                _write_batch, collection, fresh, embeddings, [payloads[pid] for pid in fresh],
+                {pid: payloads[pid] for pid in existing}, stats,
+            )
+
+            stats.chunks += len(batch)
+            stats.embedded += len(fresh)
+            stats.reused += len(existing)
+            stats.batches += 1
+            if on_progress:
+                on_progress(stats)
+        if pending is not None:
+            pending.result()
+
+    _finalize(collection, doc_id, doc_version, stats)
+    elapsed = time.perf_counter() - started
+    stats.timings["total"] += elapsed
+    metrics.record_ingest(stats.chunks, elapsed, stats.timings)
+    return stats
+
+
+def content_hash(source: Union[str, BinaryIO], block_size: int = 1024 * 1024) -> str:
+    """sha256 of a file path or binary stream; streams are rewound afterwards."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            while block := f.read(block_size):
+                digest.update(block)
+    else:
+        source.seek(0)
+        while block := source.read(block_size):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def document_id(doc_version: str, doc_id: Optional[str] = None, tenant_id: Optional[str] = None) -> str:
+    """
+    Identity of a document across versions. By default it is the content hash,
+    so two different files never share (or replace) points, whatever they are
+    called. Only an explicit `doc_id` from the client makes an upload a new
+    version of an existing document, replacing its points. Within a tenant,
+    identities are namespaced by the tenant, so two tenants never share points.
+    """
+    if tenant_id:
+        material = f"{tenant_id}/{doc_id or doc_version}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+    return doc_id or doc_version[:32]
+
+
+def identify_document(source: Union[str, BinaryIO], doc_id: Optional[str], stats: IngestStats,
+                      tenant_id: Optional[str] = None) -> str:
+    """
+    Hash the document, fill in `stats.doc_id` and return its version. Sets
+    `stats.unchanged` when this exact version is already fully indexed, in
+    which case nothing else needs to run.
+    """
+    started = time.perf_counter()
+    doc_version = content_hash(source)
+    stats.tenant_id = tenant_id
+    stats.doc_id = document_id(doc_version, doc_id, tenant_id)
+    stats.unchanged = is_indexed(stats.doc_id, doc_version, collection_for(tenant_id))
+    stats.timings["hash"] = time.perf_counter() - started
+    return doc_version
+
+
+def index_pdf(
+    source: Union[str, BinaryIO],
+    doc_id: Optional[str] = None,
+    batch_size: int = INGEST_BATCH_SIZE,
+    on_progress: Optional[Callable[[IngestStats], None]] = None,
+    tenant_id: Optional[str] = None,
+) -> IngestStats:
+    """
+    Stream a PDF (path or binary file object) into the vector store page by page.
+    Pass `doc_id` to replace an earlier version of the same document.
+    """
+    stats = IngestStats()
+    doc_version = identify_document(source, doc_id, stats, tenant_id)
+    if stats.unchanged:
+        return stats
+    reader = PdfReader(source)
+    return index_pages(
+        iter_pages(reader, stats), stats.doc_id, doc_version, batch_size, on_progress, stats, tenant_id
+    )
+
+
+def ingest_pdf(pdf_path: Union[str, BinaryIO]) -> int:
+    return index_pdf(pdf_path).chunks
 
 if __name__ == "__main__":
-    count = ingest_pdf("sample.pdf")
-    print(f"Ingested {count} chunks")
\ No newline at end of file
+    stats = index_pdf("sample.pdf")
+    print(f"Ingested {stats.chunks} chunks from {stats.pages} pages")
+    print(stats.timings)
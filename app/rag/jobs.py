@@ -0,0 +1,183 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from app.config import (
+    INGEST_MAX_JOBS,
+    INGEST_PROCESS_WORKERS,
+    INGEST_PAGES_PER_TASK,
+    INGEST_JOB_HISTORY,
+)
+from app.rag.ingest import IngestStats, identify_document, index_pages
+from app.rag.pdf_extract import count_pages, extract_page_range
+
+
+@dataclass
+class IngestJob:
+    id: str
+    filename: str
+    tenant_id: Optional[str] = None
+    doc_id: Optional[str] = None  # explicit identity: replaces that document's points
+    state: str = "queued"  # queued -> running -> done | failed
+    total_pages: Optional[int] = None
+    stats: IngestStats = field(default_factory=IngestStats)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        timings = dict(self.stats.timings)
+        if self.started_at:
+            timings["queued"] = self.started_at - self.created_at
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "state": self.state,
+            "pages_processed": self.stats.pages,
+            "total_pages": self.total_pages,
+            "chunks_indexed": self.stats.chunks,
+            "doc_id": self.stats.doc_id,
+            "tenant_id": self.tenant_id,
+            "unchanged": self.stats.unchanged,
+            "chunks_embedded": self.stats.embedded,
+            "chunks_reused": self.stats.reused,
+            "stale_points_deleted": self.stats.deleted,
+            "timings": timings,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs PDF ingestion in the background.
+
+    Each job runs on a small thread pool (at most INGEST_MAX_JOBS at once).
+    Page text extraction is fanned out to a process pool in ranges of
+    INGEST_PAGES_PER_TASK pages, so pypdf's CPU work runs outside the GIL.
+    The job thread embeds and upserts pages in order as ranges complete.
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = INGEST_MAX_JOBS,
+        process_workers: int = INGEST_PROCESS_WORKERS,
+        pages_per_task: int = INGEST_PAGES_PER_TASK,
+        history: int = INGEST_JOB_HISTORY,
+    ):
+        self.max_jobs = max_jobs
+        self.process_workers = process_workers
+        self.pages_per_task = pages_per_task
+        self.history = history
+        self._jobs: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+
+    def _pools(self):
+        with self._lock:
+            if self._closed:
+                # A job still running after shutdown() must not start fresh pools
+                raise RuntimeError("job manager is shut down")
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="ingest-job")
+            if self._processes is None:
+                # spawn, not fork: the parent has model and client threads running
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._threads, self._processes
+
+    def submit(self, path: str, filename: str, tenant_id: Optional[str] = None,
+               doc_id: Optional[str] = None) -> IngestJob:
+        """Queue `path` for ingestion. The file is deleted when the job ends."""
+        job = IngestJob(id=uuid.uuid4().hex, filename=filename, tenant_id=tenant_id, doc_id=doc_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("job manager is shut down")
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.state in ("queued", "running"):
+                    break
+                self._jobs.popitem(last=False)
+        threads, _ = self._pools()
+        threads.submit(self._run, job, path)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        return list(self._jobs.values())
+
+    def _iter_pages(self, job: IngestJob, path: str) -> Iterator[str]:
+        _, processes = self._pools()
+        total = job.total_pages = processes.submit(count_pages, path).result()
+        ranges = iter(range(0, total, self.pages_per_task))
+        window: deque = deque()
+
+        def schedule():
+            start = next(ranges, None)
+            if start is not None:
+                window.append(processes.submit(extract_page_range, path, start, start + self.pages_per_task))
+
+        # Keep every worker busy plus one range of read-ahead, but no more.
+        for _ in range(self.process_workers + 1):
+            schedule()
+        while window:
+            texts, elapsed = window.popleft().result()
+            schedule()
+            job.stats.timings["extract"] += elapsed
+            for text in texts:
+                job.stats.pages += 1
+                yield text
+
+    def _run(self, job: IngestJob, path: str):
+        job.state = "running"
+        job.started_at = time.time()
+        try:
+            doc_version = identify_document(path, job.doc_id, job.stats, job.tenant_id)
+            if not job.stats.unchanged:
+                index_pages(
+                    self._iter_pages(job, path), job.stats.doc_id, doc_version,
+                    stats=job.stats, tenant_id=job.tenant_id,
+                )
+            job.state = "done"
+        except Exception as e:
+            logging.error(f"Ingestion job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def shutdown(self, wait: bool = False):
+        """
+        Refuse new jobs, cancel queued ones and release the pools; `wait` also
+        joins running jobs and worker processes. A closed manager stays closed.
+        """
+        with self._lock:
+            self._closed = True
+            threads, processes = self._threads, self._processes
+            self._threads = self._processes = None
+        # Outside the lock: a running job may still be waiting on _pools()
+        if threads is not None:
+            threads.shutdown(wait=wait, cancel_futures=True)
+        if processes is not None:
+            processes.shutdown(wait=wait, cancel_futures=True)
+
+
+job_manager = JobManager()
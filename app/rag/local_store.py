@@ -0,0 +1,411 @@
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from app.config import LOCAL_INDEX_DIR
+from app.rag.profiles import PROFILES, CollectionProfile, get_profile
+from app.rag.vectorstore import PAYLOAD_INDEXES, Hit, VectorStore
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+_MIN_CAPACITY = 1024
+_BLOCK = 16384  # rows scored per matmul, bounds the float32 temporaries of int8 codes
+_SCALE = 127.0  # int8 code = round(unit vector component * _SCALE)
+
+
+def _quantize(vectors: np.ndarray) -> np.ndarray:
+    return np.rint(vectors * _SCALE).astype(np.int8)
+
+
+def _dot(matrix: np.ndarray, index, query: np.ndarray) -> np.ndarray:
+    """matrix[index] @ query, in blocks so int8 rows are widened a block at a time."""
+    if isinstance(index, slice):
+        stop = index.stop
+        return np.concatenate([
+            matrix[start:min(start + _BLOCK, stop)].astype(np.float32, copy=False) @ query
+            for start in range(0, stop, _BLOCK)
+        ]) if stop else np.zeros(0, dtype=np.float32)
+    return np.concatenate([
+        matrix[index[start:start + _BLOCK]].astype(np.float32, copy=False) @ query
+        for start in range(0, len(index), _BLOCK)
+    ]) if len(index) else np.zeros(0, dtype=np.float32)
+
+
+def _matches(payload: dict, match: Optional[dict], exclude: Optional[dict]) -> bool:
+    if match and any(payload.get(k) != v for k, v in match.items()):
+        return False
+    if exclude and any(payload.get(k) == v for k, v in exclude.items()):
+        return False
+    return True
+
+
+class _Collection:
+    """
+    One collection: a row-major float32 matrix of unit vectors plus a row
+    table of ids and payloads.
+
+    On disk, vectors live in `vectors.f32` (memory-mapped, grown by doubling)
+    and row assignments in `points.jsonl`, an append-only log replayed on
+    open and rewritten once it is mostly superseded records. Vectors are
+    flushed before their log records, so a crash can leave an unreferenced
+    row but never a record pointing at a half-written vector. Rows freed by
+    deletes are reused by later appends.
+
+    Fields in PAYLOAD_INDEXES are kept in an in-memory inverted index, so a
+    filtered search scores only the matching rows.
+
+    With a quantized profile, an int8 copy of every vector is kept in RAM and
+    scanned instead; only the shortlisted rows of the memory-mapped originals
+    are read, for rescoring.
+    """
+
+    def __init__(self, vector_size: int, directory: Optional[Path] = None,
+                 profile: Optional[CollectionProfile] = None):
+        self.vector_size = vector_size
+        self.directory = directory
+        self.profile = profile or get_profile()
+        self.codes: Optional[np.ndarray] = None
+        self.lock = threading.RLock()
+        self.size = 0  # high-water mark of used rows
+        self.ids: List[Optional[str]] = []
+        self.payloads: List[Optional[dict]] = []
+        self.rows: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.index: Dict[str, Dict[object, Set[int]]] = {name: defaultdict(set) for name in PAYLOAD_INDEXES}
+        self.log_records = 0
+        self.vectors = np.zeros((0, vector_size), dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            meta = directory / "meta.json"
+            if not meta.exists():
+                meta.write_text(json.dumps({"vector_size": vector_size}))
+            self._load()
+        self.set_profile(self.profile)
+
+    # ---- storage ----
+    def _map(self, capacity: int):
+        if self.directory is None:
+            vectors = np.zeros((capacity, self.vector_size), dtype=np.float32)
+            vectors[:len(self.vectors)] = self.vectors
+        else:
+            path = self.directory / "vectors.f32"
+            with open(path, "ab") as f:
+                f.truncate(capacity * self.vector_size * 4)
+            vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.vector_size))
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self.live)] = self.live
+        if self.codes is not None:
+            codes = np.zeros((capacity, self.vector_size), dtype=np.int8)
+            codes[:len(self.codes)] = self.codes
+            self.codes = codes
+        self.vectors, self.live = vectors, live
+
+    def set_profile(self, profile: CollectionProfile):
+        """Switch quantization on or off; codes are derived from the stored vectors."""
+        with self.lock:
+            self.profile = profile
+            if not profile.quantization:
+                self.codes = None
+                return
+            if profile.quantization != "scalar":
+                logging.info(f"Local store uses scalar int8 codes for {profile.quantization} quantization")
+            codes = np.zeros((len(self.vectors), self.vector_size), dtype=np.int8)
+            for start in range(0, self.size, _BLOCK):
+                stop = min(start + _BLOCK, self.size)
+                codes[start:stop] = _quantize(self.vectors[start:stop])
+            self.codes = codes
+
+    def _load(self):
+        path = self.directory / "vectors.f32"
+        capacity = path.stat().st_size // (self.vector_size * 4) if path.exists() else 0
+        self._map(max(capacity, _MIN_CAPACITY))
+        log = self.directory / "points.jsonl"
+        if log.exists():
+            with open(log, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn final write
+                    self._apply(record)
+                    self.log_records += 1
+        self.free = [row for row in range(self.size) if not self.live[row]]
+
+    def _reindex(self, row: int, old: Optional[dict], new: Optional[dict]):
+        for name, values in self.index.items():
+            before = old.get(name) if old else None
+            after = new.get(name) if new else None
+            if before == after:
+                continue
+            if before is not None:
+                values[before].discard(row)
+                if not values[before]:
+                    del values[before]
+            if after is not None:
+                values[after].add(row)
+
+    def _apply(self, record: dict):
+        pid = record["id"]
+        if record.get("deleted"):
+            row = self.rows.pop(pid, None)
+            if row is not None:
+                self._reindex(row, self.payloads[row], None)
+                self.ids[row] = self.payloads[row] = None
+                self.live[row] = False
+            return
+        row = record["row"]
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.payloads.append(None)
+        self._reindex(row, self.payloads[row], record["payload"])
+        self.ids[row], self.payloads[row] = pid, record["payload"]
+        self.rows[pid] = row
+        self.live[row] = True
+        self.size = max(self.size, row + 1)
+
+    def _log(self, records: List[dict]):
+        for record in records:
+            self._apply(record)
+        if self.directory is None:
+            return
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        self.log_records += len(records)
+        if self.log_records > 2 * len(self.rows) + _MIN_CAPACITY:
+            self._compact()
+            return
+        with open(self.directory / "points.jsonl", "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _compact(self):
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for pid, row in self.rows.items():
+                f.write(json.dumps({"id": pid, "row": row, "payload": self.payloads[row]}) + "\n")
+        os.replace(tmp_name, self.directory / "points.jsonl")
+        self.log_records = len(self.rows)
+
+    def _allocate(self) -> int:
+        if self.free:
+            return self.free.pop()
+        if self.size >= len(self.vectors):
+            self._map(max(_MIN_CAPACITY, 2 * len(self.vectors)))
+        self.size += 1
+        self.ids.append(None)
+        self.payloads.append(None)
+        return self.size - 1
+
+    # ---- operations ----
+    def upsert(self, ids, vectors, payloads):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.vector_size)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self.lock:
+            rows = []
+            for pid in ids:
+                row = self.rows.get(pid)
+                if row is None:
+                    row = self._allocate()
+                    self.rows[pid] = row
+                rows.append(row)
+            self.vectors[rows] = vectors
+            if self.codes is not None:
+                self.codes[rows] = _quantize(vectors)
+            self._log([
+                {"id": pid, "row": row, "payload": dict(payload)}
+                for pid, row, payload in zip(ids, rows, payloads)
+            ])
+
+    def matching_rows(self, match=None, exclude=None) -> List[int]:
+        candidates = None
+        for name, value in (match or {}).items():
+            if name in self.index:
+                rows = self.index[name].get(value, set())
+                candidates = rows if candidates is None or len(rows) < len(candidates) else candidates
+        rows = self.rows.values() if candidates is None else candidates
+        return [row for row in rows if _matches(self.payloads[row], match, exclude)]
+
+    def set_payload(self, payload: dict, rows: List[int]):
+        with self.lock:
+            self._log([
+                {"id": self.ids[row], "row": row, "payload": {**self.payloads[row], **payload}}
+                for row in rows
+            ])
+
+    def overwrite_payloads(self, payloads: Dict[int, dict]):
+        with self.lock:
+            self._log([{"id": self.ids[row], "row": row, "payload": payload} for row, payload in payloads.items()])
+
+    def delete(self, rows: List[int]):
+        with self.lock:
+            ids = [self.ids[row] for row in rows]
+            self._log([{"id": pid, "deleted": True} for pid in ids])
+            self.free.extend(rows)
+
+    def search(self, vector, top_k: int, match=None, with_vectors: bool = False) -> List[Hit]:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        with self.lock:
+            n = self.size
+            vectors, codes = self.vectors, self.codes
+            if match:
+                # Score only the filtered subset
+                rows = np.array(self.matching_rows(match), dtype=np.int64)
+            else:
+                rows = None
+                live = self.live[:n].copy()
+        index = slice(0, n) if rows is None else rows
+        if codes is None:
+            scores = _dot(vectors, index, query)
+        else:
+            scores = _dot(codes, index, query / _SCALE)
+        if rows is None:
+            scores[~live] = -np.inf
+            candidates = int(live.sum())
+        else:
+            candidates = len(rows)
+        k = min(top_k, candidates)
+        if k <= 0:
+            return []
+
+        if codes is None:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            # Shortlist on the int8 codes, then re-rank with the float32 originals
+            shortlist = min(candidates, max(k, math.ceil(k * self.profile.oversampling)))
+            top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            if self.profile.rescore:
+                scores[top] = vectors[top if rows is None else rows[top]] @ query
+            top = top[np.argsort(-scores[top])[:k]]
+        hits = []
+        for position in top:
+            row = position if rows is None else rows[position]
+            pid, payload = self.ids[row], self.payloads[row]
+            if pid is not None:  # deleted after the scores were taken
+                hits.append(Hit(pid, float(scores[position]), payload,
+                                np.array(vectors[row]) if with_vectors else None))
+        return hits
+
+
+class LocalStore(VectorStore):
+    """
+    In-process vector store: exact cosine top-k over memory-mapped float32
+    vectors with numpy (`argpartition`, no network hop). Collections persist
+    under `directory`; with `directory=None` everything stays in memory.
+
+    Of a CollectionProfile only quantization, rescoring and oversampling
+    apply; there is no graph to tune. Any quantization means int8 codes here.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: Optional[str] = LOCAL_INDEX_DIR, profile: Optional[CollectionProfile] = None):
+        self.directory = Path(directory) if directory else None
+        self.profile = profile or get_profile()
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, collection: str) -> Optional[Path]:
+        if not _NAME_RE.match(collection):
+            raise ValueError(f"Invalid collection name: {collection}")
+        return self.directory / collection if self.directory else None
+
+    def _get(self, collection: str) -> _Collection:
+        found = self._collections.get(collection)
+        if found is not None:
+            return found
+        with self._lock:
+            if collection not in self._collections:
+                path = self._path(collection)
+                if path is None or not (path / "meta.json").exists():
+                    raise ValueError(f"Collection {collection} not found")
+                meta = json.loads((path / "meta.json").read_text())
+                profile = PROFILES.get(meta.get("profile"), self.profile)
+                self._collections[collection] = _Collection(meta["vector_size"], path, profile)
+            return self._collections[collection]
+
+    def ensure_collection(self, collection, vector_size):
+        try:
+            existing = self._get(collection)
+        except ValueError:
+            with self._lock:
+                if collection not in self._collections:
+                    self._collections[collection] = _Collection(vector_size, self._path(collection), self.profile)
+                existing = self._collections[collection]
+        if existing.vector_size != vector_size:
+            raise ValueError(
+                f"Collection {collection} has vector size {existing.vector_size}, not {vector_size}"
+            )
+
+    def upsert(self, collection, ids, vectors, payloads):
+        if len(ids):
+            self._get(collection).upsert(list(ids), vectors, list(payloads))
+
+    def existing_ids(self, collection, ids):
+        rows = self._get(collection).rows
+        return {pid for pid in ids if pid in rows}
+
+    def set_payload(self, collection, payload, ids=None, match=None):
+        coll = self._get(collection)
+        with coll.lock:
+            if ids is not None:
+                rows = [coll.rows[pid] for pid in ids if pid in coll.rows]
+            else:
+                rows = coll.matching_rows(match)
+            coll.set_payload(payload, rows)
+
+    def overwrite_payloads(self, collection, payloads):
+        coll = self._get(collection)
+        with coll.lock:
+            coll.overwrite_payloads({coll.rows[pid]: payload for pid, payload in payloads.items() if pid in coll.rows})
+
+    def count(self, collection, match=None, exclude=None):
+        coll = self._get(collection)
+        with coll.lock:
+            return len(coll.matching_rows(match, exclude))
+
+    def delete(self, collection, match=None, exclude=None):
+        coll = self._get(collection)
+        with coll.lock:
+            coll.delete(coll.matching_rows(match, exclude))
+
+    def payloads(self, collection, match=None, limit=100):
+        coll = self._get(collection)
+        with coll.lock:
+            return [dict(coll.payloads[row]) for row in coll.matching_rows(match)[:limit]]
+
+    def search(self, collection, vector, top_k, match=None, with_vectors=False):
+        return self._get(collection).search(vector, top_k, match, with_vectors)
+
+    def migrate(self, collection, profile):
+        """
+        Codes are derived from the stored vectors, so a profile switch is an
+        in-place rebuild of this collection; the others keep theirs.
+        """
+        started = time.perf_counter()
+        coll = self._get(collection)
+        coll.set_profile(profile)
+        if coll.directory is not None:
+            # Recorded so that the collection reopens with it
+            (coll.directory / "meta.json").write_text(
+                json.dumps({"vector_size": coll.vector_size, "profile": profile.name})
+            )
+        return {
+            "collection": collection,
+            "profile": profile.name,
+            "points": len(coll.rows),
+            "seconds": time.perf_counter() - started,
+        }
@@ -0,0 +1,22 @@
+"""
+PDF text extraction for worker processes.
+
+Kept free of model and client imports so spawned workers start quickly.
+"""
+import time
+from typing import List, Tuple
+
+from pypdf import PdfReader
+
+
+def count_pages(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def extract_page_range(path: str, start: int, end: int) -> Tuple[List[str], float]:
+    """Extract text for pages [start, end). Returns the texts and the seconds spent."""
+    started = time.perf_counter()
+    reader = PdfReader(path)
+    end = min(end, len(reader.pages))
+    texts = [reader.pages[i].extract_text() or "" for i in range(start, end)]
+    return texts, time.perf_counter() - started
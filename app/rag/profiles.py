@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.config import COLLECTION_PROFILE
+
+if TYPE_CHECKING:
+    from qdrant_client import models
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    """
+    How a collection trades memory for recall.
+
+    `quantization` keeps a compressed copy of every vector in RAM ("scalar":
+    int8, 4x smaller; "product": `compression` x smaller) and searches it
+    first. With `rescore`, the best `oversampling * limit` candidates are then
+    re-ranked with the original vectors, which can live on disk (`on_disk`).
+    `hnsw_m` / `hnsw_ef_construct` shape the graph at index time and
+    `search_ef` the beam width at query time (None: server default).
+    """
+    name: str
+    quantization: Optional[str] = None
+    compression: str = "x16"
+    on_disk: bool = False
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_on_disk: bool = False
+    search_ef: Optional[int] = None
+    rescore: bool = True
+    oversampling: float = 2.0
+
+    def hnsw_config(self) -> "models.HnswConfigDiff":
+        from qdrant_client import models
+
+        return models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct, on_disk=self.hnsw_on_disk)
+
+    def quantization_config(self):
+        from qdrant_client import models
+
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "product":
+            return models.ProductQuantization(
+                product=models.ProductQuantizationConfig(
+                    compression=models.CompressionRatio(self.compression), always_ram=True
+                )
+            )
+        return None
+
+    def search_params(self) -> Optional["models.SearchParams"]:
+        from qdrant_client import models
+
+        quantization = None
+        if self.quantization:
+            quantization = models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        if quantization is None and self.search_ef is None:
+            return None
+        return models.SearchParams(hnsw_ef=self.search_ef, quantization=quantization)
+
+    def estimate_ram(self, points: int, dim: int) -> int:
+        """Approximate resident bytes for `points` vectors under this profile (payloads excluded)."""
+        original = 0 if self.on_disk else points * dim * 4
+        if self.quantization == "scalar":
+            compressed = points * dim
+        elif self.quantization == "product":
+            compressed = points * dim * 4 // int(self.compression.lstrip("x"))
+        else:
+            compressed = 0
+        # Level 0 of the HNSW graph holds 2*m links of 4 bytes per point
+        graph = 0 if self.hnsw_on_disk else points * self.hnsw_m * 2 * 4
+        return original + compressed + graph
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    # float32 vectors and graph in RAM: fastest, most memory
+    "default": CollectionProfile("default"),
+    # int8 copy in RAM, originals on disk for rescoring: ~4x less vector RAM
+    "balanced": CollectionProfile("balanced", quantization="scalar", on_disk=True, search_ef=128),
+    # product-quantized copy in RAM, originals and graph on disk: for millions of chunks per node
+    "compact": CollectionProfile(
+        "compact", quantization="product", compression="x16", on_disk=True, hnsw_on_disk=True,
+        hnsw_m=16, hnsw_ef_construct=128, search_ef=128, oversampling=3.0,
+    ),
+    # denser graph and wider search beam when recall matters more than memory
+    "high_recall": CollectionProfile("high_recall", hnsw_m=32, hnsw_ef_construct=256, search_ef=256),
+}
+
+
+def get_profile(name: Optional[str] = None) -> CollectionProfile:
+    name = name or COLLECTION_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown collection profile: {name}")
+    return PROFILES[name]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.rag.vectorstore import COLLECTION, get_store
+
+    parser = argparse.ArgumentParser(description="Move a collection to another profile without downtime.")
+    parser.add_argument("profile", choices=sorted(PROFILES))
+    parser.add_argument("--collection", default=COLLECTION)
+    args = parser.parse_args()
+    print(get_store().migrate(args.collection, get_profile(args.profile)))
@@ -1,4 +1,10 @@
+from app.rag.context import Passage, compact
+
+
 def build_conversation_prompt(context_chunks, user_question):
+    # Retrieved passages are compacted first; plain strings are used as given
+    if context_chunks and isinstance(context_chunks[0], Passage):
+        context_chunks = [passage.text for passage in compact(context_chunks)]
     context = "\n\n".join(context_chunks)
 
     return f"""You are simulating a thoughtful, podcast-style conversation.
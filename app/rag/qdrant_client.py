@@ -1,3 +1,5 @@
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from app.config import QDRANT_URL, QDRANT_API_KEY
 
-client = QdrantClient(url="http://localhost:6333")
+client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+async_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
@@ -1,19 +1,12 @@
 
 import logging
-from app.rag.qdrant_client import client
-from sentence_transformers import SentenceTransformer
-from typing import List, Tuple
-
-# ======================
-# Config
-# ======================
-COLLECTION = "docs"
-
-# ======================
-# Clients
-# ======================
-
-model = SentenceTransformer("all-MiniLM-L6-v2")
+import numpy as np
+from app.rag.vectorstore import COLLECTION, Hit, Scope, get_store
+from app.rag.context import Passage
+from app.rag.embeddings import embed_query, aembed_query, aembed_queries
+from app.rag.cache import query_vector_cache, retrieval_cache, collection_generation
+from app.services.metrics import span
+from typing import List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,29 +14,136 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # ======================
 # Retrieve function
 # ======================
-def retrieve(query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+def get_query_vector(query: str) -> List[float]:
+    """Embed a query, reusing the cached vector for repeated queries."""
+    query_vector = query_vector_cache.get(query)
+    if query_vector is None:
+        # Embed query (micro-batched with concurrent callers)
+        with span("embed_query"):
+            query_vector = embed_query(query)
+        query_vector_cache.set(query, query_vector)
+    return query_vector
+
+
+async def aget_query_vector(query: str) -> List[float]:
+    query_vector = query_vector_cache.get(query)
+    if query_vector is None:
+        with span("embed_query"):
+            query_vector = await aembed_query(query)
+        query_vector_cache.set(query, query_vector)
+    return query_vector
+
+
+async def aget_query_vectors(queries: List[str]) -> List[List[float]]:
+    """Vectors for many queries; cache misses are embedded together in one forward pass."""
+    vectors = [query_vector_cache.get(query) for query in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        with span("embed_query"):
+            embedded = dict(zip(missing, await aembed_queries(missing)))
+        for query, vector in embedded.items():
+            query_vector_cache.set(query, vector)
+        vectors = [embedded[q] if v is None else v for q, v in zip(queries, vectors)]
+    return vectors
+
+
+def _to_passages(hits: List[Hit]) -> List[Passage]:
+    return [
+        Passage(hit.payload["text"], hit.score, hit.payload,
+                None if hit.vector is None else np.asarray(hit.vector, dtype=np.float32))
+        for hit in hits if "text" in hit.payload
+    ]
+
+
+def _pairs(passages: List[Passage]) -> List[Tuple[str, float]]:
+    return [(passage.text, passage.score) for passage in passages]
+
+
+def _cache_key(query: str, top_k: int, scope: Scope) -> tuple:
+    collection = scope.collection
+    return (query, top_k, collection, collection_generation(collection), scope)
+
+
+def retrieve_passages(query: str, top_k: int = 5, scope: Optional[Scope] = None) -> List[Passage]:
     """
     Semantic search over indexed PDF chunks.
-    Returns a list of tuples containing the text and score of each retrieved chunk.
+    Returns the retrieved chunks with their score, payload and stored vector
+    (the vectors let app.rag.context drop near-duplicates without re-embedding).
+    `scope` restricts the search to one tenant and/or document (default: everything
+    in the shared collection).
+    Results are cached per (query, top_k, scope) until the collection changes.
     """
+    scope = scope or Scope()
+    cache_key = _cache_key(query, top_k, scope)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
     try:
-        # Embed query
-        query_vector = model.encode(query).tolist()
-
-        # Qdrant >= 1.16 API
-        result = client.query_points(
-            collection_name=COLLECTION,
-            query=query_vector,
-            limit=top_k,
-            with_payload=True,
-            with_vectors=False # We don't need the vectors in the result
-        )
-
-        return [
-            (point.payload["text"], point.score)
-            for point in result.points
-            if point.payload and "text" in point.payload
-        ]
+        query_vector = get_query_vector(query)
+        with span("vector_search"):
+            hits = get_store().search(scope.collection, query_vector, top_k, scope.match(), with_vectors=True)
+        passages = _to_passages(hits)
+        retrieval_cache.set(cache_key, tuple(passages))
+        return passages
     except Exception as e:
         logging.error(f"Error during retrieval: {e}")
         return []
+
+
+def retrieve(query: str, top_k: int = 5, scope: Optional[Scope] = None) -> List[Tuple[str, float]]:
+    """Like retrieve_passages(), as (text, score) tuples."""
+    return _pairs(retrieve_passages(query, top_k, scope))
+
+
+async def aretrieve_passages(query: str, top_k: int = 5, scope: Optional[Scope] = None) -> List[Passage]:
+    """Async variant of retrieve_passages() using the store's async search."""
+    scope = scope or Scope()
+    cache_key = _cache_key(query, top_k, scope)
+    cached = retrieval_cache.get(cache_key)
+    if cached is not None:
+        return list(cached)
+
+    try:
+        query_vector = await aget_query_vector(query)
+        with span("vector_search"):
+            hits = await get_store().asearch(scope.collection, query_vector, top_k, scope.match(), with_vectors=True)
+        passages = _to_passages(hits)
+        retrieval_cache.set(cache_key, tuple(passages))
+        return passages
+    except Exception as e:
+        logging.error(f"Error during retrieval: {e}")
+        return []
+
+
+async def aretrieve(query: str, top_k: int = 5, scope: Optional[Scope] = None) -> List[Tuple[str, float]]:
+    """Async variant of retrieve()."""
+    return _pairs(await aretrieve_passages(query, top_k, scope))
+
+
+async def aretrieve_passages_batch(queries: List[str], top_k: int = 5,
+                                   scope: Optional[Scope] = None) -> List[List[Passage]]:
+    """
+    aretrieve_passages() for many queries against the same scope: uncached
+    queries are embedded in one forward pass and searched in one multi-search
+    request. Results follow the order of `queries`.
+    """
+    scope = scope or Scope()
+    keys = [_cache_key(query, top_k, scope) for query in queries]
+    results = [retrieval_cache.get(key) for key in keys]
+    missing = list(dict.fromkeys(q for q, r in zip(queries, results) if r is None))
+    if missing:
+        try:
+            vectors = await aget_query_vectors(missing)
+            with span("vector_search"):
+                batches = await get_store().asearch_batch(
+                    scope.collection, vectors, top_k, scope.match(), with_vectors=True
+                )
+            found = {query: _to_passages(hits) for query, hits in zip(missing, batches)}
+            for query, passages in found.items():
+                retrieval_cache.set(_cache_key(query, top_k, scope), tuple(passages))
+        except Exception as e:
+            logging.error(f"Error during batch retrieval: {e}")
+            found = {}
+        results = [found.get(q, ()) if r is None else r for q, r in zip(queries, results)]
+    return [list(r) for r in results]
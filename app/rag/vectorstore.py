@@ -1,33 +1,534 @@
-
-from qdrant_client.models import VectorParams, Distance, PointStruct
-from app.rag.qdrant_client import client
+import asyncio
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
 import uuid
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from app.config import VECTOR_STORE, TENANT_COLLECTIONS
+from app.rag.cache import invalidate_collection
+from app.rag.profiles import PROFILES, CollectionProfile, get_profile
+
+if TYPE_CHECKING:
+    from qdrant_client import models
 
 COLLECTION = "docs"
 
-def init_collection(vector_size: int):
-    collections = [c.name for c in client.get_collections().collections]
-    if COLLECTION not in collections:
-        client.create_collection(
-            collection_name=COLLECTION,
-            vectors_config=VectorParams(
-                size=vector_size,
-                distance=Distance.COSINE
+# Payload fields that searches and ingestion filter on; both backends index them.
+PAYLOAD_INDEXES = {
+    "tenant_id": "keyword",
+    "doc_id": "keyword",
+    "doc_version": "keyword",
+    "page": "integer",
+}
+
+# Namespace for deterministic point IDs; changing it re-keys every point.
+POINT_NAMESPACE = uuid.UUID("6f1c1f2e-5a4b-4f0e-9a59-2b7a3c0d8e41")
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id(doc_id: str, text_hash: str) -> str:
+    """Stable point ID for a chunk of a document, so re-ingesting it is an overwrite."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{doc_id}:{text_hash}"))
+
+
+def _as_list(vector) -> List[float]:
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+def collection_for(tenant_id: Optional[str] = None) -> str:
+    """Tenants listed in TENANT_COLLECTIONS get their own collection; the rest share COLLECTION."""
+    if tenant_id and tenant_id in TENANT_COLLECTIONS:
+        return f"{COLLECTION}_{tenant_id}"
+    return COLLECTION
+
+
+@dataclass(frozen=True)
+class Scope:
+    """
+    The part of the corpus a search may see: one tenant's documents, optionally
+    narrowed to one document. The default scope is the whole shared collection.
+    """
+    tenant_id: Optional[str] = None
+    doc_id: Optional[str] = None
+
+    @property
+    def collection(self) -> str:
+        return collection_for(self.tenant_id)
+
+    def match(self) -> Optional[dict]:
+        match = {key: value for key, value in (("tenant_id", self.tenant_id), ("doc_id", self.doc_id)) if value}
+        return match or None
+
+    @property
+    def key(self) -> str:
+        """Cache namespace for results computed within this scope."""
+        return f"{self.collection}/{self.tenant_id or '*'}/{self.doc_id or '*'}"
+
+
+@dataclass
+class Hit:
+    id: str
+    score: float
+    payload: dict = field(default_factory=dict)
+    vector: Optional[Sequence[float]] = None  # only when searched with_vectors
+
+
+# ======================
+# Backends
+# ======================
+class VectorStore(ABC):
+    """
+    Cosine-similarity point store keyed by string IDs.
+
+    Filters are payload equality matches: `match` keeps points whose payload
+    has every given key/value, `exclude` drops points matching any of them.
+    A backend must implement every abstract method to be instantiated.
+    """
+
+    name = "base"
+
+    def ping(self):
+        """Raise if the backend cannot be reached. Cheap; used by warm-up and readiness."""
+
+    @abstractmethod
+    def ensure_collection(self, collection: str, vector_size: int):
+        """Create the collection and its PAYLOAD_INDEXES if missing."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert(self, collection: str, ids: Sequence[str], vectors: Sequence[Sequence[float]],
+               payloads: Sequence[dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def existing_ids(self, collection: str, ids: Sequence[str]) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_payload(self, collection: str, payload: dict, ids: Optional[Sequence[str]] = None,
+                    match: Optional[dict] = None):
+        """Merge `payload` into the given points, or into every point matching `match`."""
+        raise NotImplementedError
+
+    def overwrite_payloads(self, collection: str, payloads: Dict[str, dict]):
+        """Replace each point's whole payload ({id: payload}); vectors are kept."""
+        for pid, payload in payloads.items():
+            self.set_payload(collection, payload, ids=[pid])
+
+    @abstractmethod
+    def count(self, collection: str, match: Optional[dict] = None, exclude: Optional[dict] = None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, collection: str, match: Optional[dict] = None, exclude: Optional[dict] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def payloads(self, collection: str, match: Optional[dict] = None, limit: int = 100) -> List[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, collection: str, vector: Sequence[float], top_k: int,
+               match: Optional[dict] = None, with_vectors: bool = False) -> List[Hit]:
+        raise NotImplementedError
+
+    async def asearch(self, collection: str, vector: Sequence[float], top_k: int,
+                      match: Optional[dict] = None, with_vectors: bool = False) -> List[Hit]:
+        return await asyncio.to_thread(self.search, collection, vector, top_k, match, with_vectors)
+
+    def search_batch(self, collection: str, vectors: Sequence[Sequence[float]], top_k: int,
+                     match: Optional[dict] = None, with_vectors: bool = False) -> List[List[Hit]]:
+        """One top-k search per vector, in order. Backends with a multi-search call override this."""
+        return [self.search(collection, vector, top_k, match, with_vectors) for vector in vectors]
+
+    async def asearch_batch(self, collection: str, vectors: Sequence[Sequence[float]], top_k: int,
+                            match: Optional[dict] = None, with_vectors: bool = False) -> List[List[Hit]]:
+        return await asyncio.to_thread(self.search_batch, collection, vectors, top_k, match, with_vectors)
+
+    @abstractmethod
+    def migrate(self, collection: str, profile: CollectionProfile) -> dict:
+        """Rebuild `collection` under another profile while it keeps serving."""
+        raise NotImplementedError
+
+
+class QdrantStore(VectorStore):
+    """
+    Qdrant server (or any QdrantClient, e.g. ":memory:" in tests).
+
+    qdrant_client takes most of a second to import, so its models are imported
+    in the methods that build them rather than with this module.
+
+    New collections are built with the configured CollectionProfile, and every
+    search carries the `ef` and rescoring parameters of its collection's profile.
+    """
+
+    name = "qdrant"
+
+    def __init__(self, client=None, async_client=None, profile: Optional[CollectionProfile] = None):
+        if client is None:
+            from app.rag.qdrant_client import client, async_client
+        self.client = client
+        self.async_client = async_client
+        self.profile = profile or get_profile()
+        self._collections: Set[str] = set()
+        self._profiles: Dict[str, CollectionProfile] = {}
+
+    @staticmethod
+    def _filter(match: Optional[dict] = None, exclude: Optional[dict] = None):
+        from qdrant_client import models
+
+        if not match and not exclude:
+            return None
+
+        def conditions(items: Optional[dict]):
+            return [
+                models.FieldCondition(key=k, match=models.MatchValue(value=v)) for k, v in (items or {}).items()
+            ] or None
+
+        return models.Filter(must=conditions(match), must_not=conditions(exclude))
+
+    def ping(self):
+        self.client.get_collections()
+
+    def _aliases(self) -> Dict[str, str]:
+        return {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+
+    def _create(self, collection: str, vector_size: int, profile: CollectionProfile):
+        from qdrant_client import models
+
+        self.client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(
+                size=vector_size, distance=models.Distance.COSINE, on_disk=profile.on_disk
+            ),
+            hnsw_config=profile.hnsw_config(),
+            quantization_config=profile.quantization_config(),
+        )
+        self._index_payload(collection)
+
+    @staticmethod
+    def _physical(collection: str, profile: CollectionProfile) -> str:
+        return f"{collection}__{profile.name}_{int(time.time() * 1000)}"
+
+    def _profile(self, collection: str) -> CollectionProfile:
+        """The profile `collection` was built with, named in its alias target `<collection>__<profile>_<ts>`."""
+        profile = self._profiles.get(collection)
+        if profile is None:
+            target = self._aliases().get(collection, "")
+            name = target.rpartition("__")[2].rpartition("_")[0]
+            profile = self._profiles[collection] = PROFILES.get(name, self.profile)
+        return profile
+
+    def _alias(self, target: str, collection: str):
+        from qdrant_client import models
+
+        return models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=collection))
+
+    def ensure_collection(self, collection: str, vector_size: int):
+        """
+        New collections are physical collections behind an alias named
+        `collection`, so that every later migrate() is one atomic alias swap.
+        """
+        if collection in self._collections:
+            return
+        if collection in self._aliases():
+            pass  # the alias target was set up here or by migrate()
+        elif not self.client.collection_exists(collection):
+            target = self._physical(collection, self.profile)
+            self._create(target, vector_size, self.profile)
+            self.client.update_collection_aliases(change_aliases_operations=[self._alias(target, collection)])
+            self._profiles[collection] = self.profile
+        else:
+            self._index_payload(collection)  # plain collection from before aliases
+        self._collections.add(collection)
+
+    def _index_payload(self, collection: str):
+        from qdrant_client import models
+
+        indexed = self.client.get_collection(collection).payload_schema or {}
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name in indexed:
+                continue
+            if field_name == "tenant_id":
+                # Co-locates each tenant's points so tenant-filtered search stays fast
+                schema = models.KeywordIndexParams(type="keyword", is_tenant=True)
+            else:
+                schema = models.PayloadSchemaType(schema)
+            self.client.create_payload_index(collection_name=collection, field_name=field_name, field_schema=schema)
+
+    def upsert(self, collection, ids, vectors, payloads):
+        from qdrant_client import models
+
+        if ids:
+            self.client.upsert(
+                collection_name=collection,
+                points=[
+                    models.PointStruct(id=pid, vector=_as_list(vector), payload=payload)
+                    for pid, vector, payload in zip(ids, vectors, payloads)
+                ],
             )
+
+    def existing_ids(self, collection, ids):
+        if not ids:
+            return set()
+        points = self.client.retrieve(
+            collection_name=collection, ids=list(ids), with_payload=False, with_vectors=False
         )
+        return {str(point.id) for point in points}
+
+    def set_payload(self, collection, payload, ids=None, match=None):
+        from qdrant_client import models
 
-def store_embeddings(chunks, vectors):
-    points = [
-        PointStruct(
-            id=str(uuid.uuid4()),
-            vector=vectors[i],
-            payload={"text": chunks[i]}
+        if ids is not None:
+            if not ids:
+                return
+            points = list(ids)
+        else:
+            points = models.FilterSelector(filter=self._filter(match))
+        self.client.set_payload(collection_name=collection, payload=payload, points=points)
+
+    def overwrite_payloads(self, collection, payloads):
+        from qdrant_client import models
+
+        if payloads:
+            self.client.batch_update_points(
+                collection_name=collection,
+                update_operations=[
+                    models.OverwritePayloadOperation(overwrite_payload=models.SetPayload(payload=payload, points=[pid]))
+                    for pid, payload in payloads.items()
+                ],
+            )
+
+    def count(self, collection, match=None, exclude=None):
+        return self.client.count(
+            collection_name=collection, count_filter=self._filter(match, exclude), exact=True
+        ).count
+
+    def delete(self, collection, match=None, exclude=None):
+        from qdrant_client import models
+
+        self.client.delete(
+            collection_name=collection,
+            points_selector=models.FilterSelector(filter=self._filter(match, exclude)),
         )
-        for i in range(len(chunks))
-    ]
 
-    client.upsert(
-        collection_name=COLLECTION,
-        points=points
-    )
+    def payloads(self, collection, match=None, limit=100):
+        points, _ = self.client.scroll(
+            collection_name=collection, scroll_filter=self._filter(match), limit=limit, with_vectors=False
+        )
+        return [point.payload or {} for point in points]
+
+    @staticmethod
+    def _hits(result) -> List[Hit]:
+        return [Hit(str(point.id), point.score, point.payload or {}, point.vector) for point in result.points]
 
+    def search(self, collection, vector, top_k, match=None, with_vectors=False):
+        result = self.client.query_points(
+            collection_name=collection,
+            query=_as_list(vector),
+            query_filter=self._filter(match),
+            search_params=self._profile(collection).search_params(),
+            limit=top_k,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        return self._hits(result)
+
+    def _requests(self, collection, vectors, top_k, match, with_vectors) -> List["models.QueryRequest"]:
+        from qdrant_client import models
+
+        query_filter, params = self._filter(match), self._profile(collection).search_params()
+        return [
+            models.QueryRequest(query=_as_list(vector), filter=query_filter, params=params, limit=top_k,
+                                with_payload=True, with_vector=with_vectors)
+            for vector in vectors
+        ]
+
+    def search_batch(self, collection, vectors, top_k, match=None, with_vectors=False):
+        results = self.client.query_batch_points(
+            collection_name=collection, requests=self._requests(collection, vectors, top_k, match, with_vectors)
+        )
+        return [self._hits(result) for result in results]
+
+    async def asearch_batch(self, collection, vectors, top_k, match=None, with_vectors=False):
+        if self.async_client is None:
+            return await super().asearch_batch(collection, vectors, top_k, match, with_vectors)
+        results = await self.async_client.query_batch_points(
+            collection_name=collection, requests=self._requests(collection, vectors, top_k, match, with_vectors)
+        )
+        return [self._hits(result) for result in results]
+
+    async def asearch(self, collection, vector, top_k, match=None, with_vectors=False):
+        if self.async_client is None:
+            return await super().asearch(collection, vector, top_k, match, with_vectors)
+        result = await self.async_client.query_points(
+            collection_name=collection,
+            query=_as_list(vector),
+            query_filter=self._filter(match),
+            search_params=self._profile(collection).search_params(),
+            limit=top_k,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        return self._hits(result)
+
+    # ---- profile migration ----
+    @staticmethod
+    def _digest(point) -> bytes:
+        # Payload only: a point's vector is fixed by its ID (point_id hashes the chunk text)
+        return hashlib.blake2b(json.dumps(point.payload, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+
+    def _digests(self, collection: str, ids: Optional[Sequence[str]] = None) -> Dict[str, bytes]:
+        return {str(p.id): self._digest(p) for points in self._points(collection, ids) for p in points}
+
+    def _points(self, collection: str, ids: Optional[Sequence[str]] = None, batch_size: int = 256):
+        """Yield batches of points with vectors and payloads: all of them, or just `ids`."""
+        if ids is not None:
+            for start in range(0, len(ids), batch_size):
+                yield self.client.retrieve(
+                    collection_name=collection, ids=list(ids[start:start + batch_size]),
+                    with_payload=True, with_vectors=True,
+                )
+            return
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+            )
+            yield points
+            if offset is None:
+                return
+
+    def _copy(self, source: str, target: str, ids: Optional[Sequence[str]] = None) -> Dict[str, bytes]:
+        """Copy points (all, or just `ids`) and return the digests of what was written."""
+        from qdrant_client import models
+
+        written = {}
+        for points in self._points(source, ids):
+            if points:
+                self.client.upsert(
+                    collection_name=target,
+                    points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                )
+                written.update((str(p.id), self._digest(p)) for p in points)
+        return written
+
+    def _catch_up(self, source: str, target: str, copied: Dict[str, bytes]) -> int:
+        """
+        Apply writes that reached `source` after its points were copied (`copied`
+        holds their digests and is kept current). A point that changed in
+        `target` too was written there later and is kept as it is.
+        """
+        current = self._digests(source)
+        changed = sorted(pid for pid in current.keys() | copied.keys() if current.get(pid) != copied.get(pid))
+        in_target = self._digests(target, changed)
+        stale = [pid for pid in changed if in_target.get(pid) == copied.get(pid)]
+        written = self._copy(source, target, stale)
+        removed = [pid for pid in stale if pid not in written]
+        if removed:
+            self.client.delete(collection_name=target, points_selector=removed)
+        for pid in removed:
+            copied.pop(pid, None)
+        copied.update(written)
+        return len(stale)
+
+    def migrate(self, collection: str, profile: CollectionProfile) -> dict:
+        """
+        Copy `collection` into a new physical collection `<collection>__<profile>_<ts>`
+        built with `profile` and point the alias `collection` at it, so readers
+        and writers keep using the same name throughout.
+
+        Writes keep reaching the old collection while it is copied; points
+        added, overwritten or deleted meanwhile are found by comparing payload
+        digests and applied to the copy before the switch. Collections created
+        by ensure_collection() are always behind an alias, so the switch is a
+        single atomic alias update, after which writes that were in flight
+        against the old collection are applied once more, unless the point has
+        been written through the alias since. Only a plain collection created
+        before aliases were used has to be deleted before the alias can take
+        its name: writes between the catch-up and the delete are lost, and
+        requests in the gap until the alias exists fail.
+
+        The new profile's search parameters apply to this collection only; a
+        server in another process picks them up when it restarts.
+        """
+        from qdrant_client import models
+
+        started = time.perf_counter()
+        source = self._aliases().get(collection, collection)
+        vector_size = self.client.get_collection(source).config.params.vectors.size
+        target = self._physical(collection, profile)
+        self._create(target, vector_size, profile)
+        copied = self._copy(source, target)
+        points = len(copied)
+        points += self._catch_up(source, target, copied)
+        create = self._alias(target, collection)
+        if source == collection:
+            self.client.delete_collection(collection)
+            self.client.update_collection_aliases(change_aliases_operations=[create])
+        else:
+            self.client.update_collection_aliases(change_aliases_operations=[
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=collection)),
+                create,
+            ])
+            points += self._catch_up(source, target, copied)
+            self.client.delete_collection(source)
+        self._profiles[collection] = profile
+        invalidate_collection(collection)
+        return {
+            "collection": collection,
+            "from": source,
+            "to": target,
+            "profile": profile.name,
+            "points": points,
+            "seconds": time.perf_counter() - started,
+        }
+
+
+def _local_store() -> VectorStore:
+    from app.rag.local_store import LocalStore
+    return LocalStore()
+
+
+BACKENDS: Dict[str, Callable[[], VectorStore]] = {
+    "qdrant": QdrantStore,
+    "local": _local_store,
+}
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> VectorStore:
+    """The process-wide vector store selected by VECTOR_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if VECTOR_STORE not in BACKENDS:
+                    raise ValueError(f"Unknown vector store: {VECTOR_STORE}")
+                _store = BACKENDS[VECTOR_STORE]()
+    return _store
+
+
+def init_collection(vector_size: int):
+    get_store().ensure_collection(COLLECTION, vector_size)
+
+
+def store_embeddings(chunks: Iterable[str], vectors, doc_id: str = "default"):
+    chunks = list(chunks)
+    hashes = [chunk_hash(chunk) for chunk in chunks]
+    get_store().upsert(
+        COLLECTION,
+        [point_id(doc_id, h) for h in hashes],
+        vectors,
+        [{"text": chunk, "doc_id": doc_id, "chunk_hash": h} for chunk, h in zip(chunks, hashes)],
+    )
+    invalidate_collection(COLLECTION)
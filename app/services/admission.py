@@ -0,0 +1,195 @@
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+
+class Overloaded(Exception):
+    """Raised when a backend is saturated and a call cannot be admitted quickly."""
+
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False  # set under the lock when a released slot is handed over
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Admission:
+    """
+    Admission control for one backend.
+
+    At most `max_concurrency` calls run at once and at most `max_queue` wait
+    for a slot. A call arriving when the queue is full, or one that has waited
+    `max_wait` seconds, fails fast with Overloaded instead of piling up behind
+    a saturated backend and dragging every other request's latency with it.
+
+    The slots are shared by threads and event loops alike: sync callers
+    (acquire, sync_slot) and async ones (aacquire, slot) draw on the same
+    `max_concurrency`, and a slot may be released from any thread.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        _registry[name] = self
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _enter(self, wake: Callable[[], None]) -> Optional[_Waiter]:
+        # Takes a free slot (returns None) or queues the caller
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"{self.name} is saturated ({self.active} running, {self.waiting} queued)")
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _give_up(self, waiter: _Waiter, timed_out: bool) -> bool:
+        # Leaves the queue; True if a slot was handed over first, which the caller then owns
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            if timed_out:
+                self.rejected += 1
+            return False
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                # Hand the slot straight to the longest waiter; `active` is unchanged
+                waiter = self._waiters.popleft()
+                try:
+                    waiter.wake()
+                except RuntimeError:
+                    continue  # its event loop is closed
+                waiter.granted = True
+                self.admitted += 1
+                return
+            self.active -= 1
+
+    def acquire(self):
+        """Block until a slot is free; pair with release()."""
+        woken = threading.Event()
+        waiter = self._enter(woken.set)
+        if waiter is not None and not woken.wait(self.max_wait) and not self._give_up(waiter, True):
+            raise Overloaded(f"{self.name}: no free slot within {self.max_wait}s")
+
+    async def aacquire(self):
+        """Async variant of acquire()."""
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+        waiter = self._enter(lambda: loop.call_soon_threadsafe(_wake, woken))
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(woken, self.max_wait)
+        except asyncio.TimeoutError:
+            if not self._give_up(waiter, True):
+                raise Overloaded(f"{self.name}: no free slot within {self.max_wait}s")
+        except BaseException:
+            # Cancelled while queued: pass on a slot that was already handed over
+            if self._give_up(waiter, False):
+                self.release()
+            raise
+
+    @contextmanager
+    def sync_slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+_registry: Dict[str, Admission] = {}
+
+
+def admission_stats() -> dict:
+    return {name: admission.stats() for name, admission in _registry.items()}
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls: while a computation for `key` is in flight,
+    further callers with the same key await it instead of starting their own.
+    The shared result object is returned to every caller, so treat it as
+    read-only. A caller giving up does not cancel the computation for the
+    others; it is cancelled only once nobody is waiting for it.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable]):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(factory()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started, "shared": self.shared}
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Iterator, Optional
+
+from app.config import AUDIO_CACHE_ENABLED, AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def audio_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    """Content address of a synthesized clip."""
+    material = "\x1f".join((text, voice_id, model_id, output_format))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(_KEY_RE.match(key))
+
+
+class AudioCache:
+    """
+    Content-addressed MP3 store on local disk.
+
+    Files are written to a temp file and renamed into place, so readers never
+    see a partial clip. The cache is bounded by `max_bytes`; when it grows past
+    that, least recently used files (by mtime, refreshed on every hit) are
+    removed first.
+    """
+
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES,
+                 enabled: bool = AUDIO_CACHE_ENABLED):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.mp3"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the path of a cached clip and mark it recently used."""
+        if not self.enabled or not is_valid_key(key):
+            return None
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """
+        Open a cached clip for reading and mark it recently used. The handle
+        keeps reading the whole clip even if it is evicted in the meantime.
+        """
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            # Evicted between get() and open()
+            return None
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            # Evicted between get() and read()
+            return None
+
+    @contextmanager
+    def writer(self, key: str):
+        """
+        Yield a file to stream a clip into. It becomes visible under `key`
+        only if the block completes; on error the partial file is discarded.
+        """
+        if not self.enabled:
+            raise RuntimeError("audio cache is disabled")
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+                size = f.tell()
+            existed = path.exists()
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            if self._total_bytes is not None and not existed:
+                self._total_bytes += size
+        self._evict()
+
+    async def awrite(self, key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Stream `chunks` into the clip `key` through writer(), yielding each one
+        once it is written; file calls run off the event loop. The clip is
+        stored only if `chunks` is read to the end.
+        """
+        writer = self.writer(key)
+        f = await asyncio.to_thread(writer.__enter__)
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+                yield chunk
+        except BaseException as e:
+            await asyncio.to_thread(writer.__exit__, type(e), e, e.__traceback__)
+            raise
+        await asyncio.to_thread(writer.__exit__, None, None, None)
+
+    def put(self, key: str, data: bytes) -> Optional[Path]:
+        if not self.enabled or not data:
+            return None
+        with self.writer(key) as f:
+            f.write(data)
+        return self.path(key)
+
+    def _scan(self) -> int:
+        return sum(p.stat().st_size for p in self.directory.glob("*/*.mp3"))
+
+    def _evict(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan() if self.directory.exists() else 0
+            if self._total_bytes <= self.max_bytes:
+                return
+            files = []
+            for p in self.directory.glob("*/*.mp3"):
+                try:
+                    stat = p.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, p))
+            files.sort()
+            total = sum(size for _, size, _ in files)
+            for _, size, p in files:
+                if total <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                self.evictions += 1
+            self._total_bytes = total
+            logging.info(f"Audio cache evicted down to {total} bytes")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def iter_handle(f: BinaryIO, start: int = 0, end: Optional[int] = None,
+                chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield bytes [start, end] (inclusive) of an open file, closing it when done."""
+    with f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            data = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+
+
+async def aiter_handle(f: BinaryIO, chunk_size: int = 64 * 1024):
+    """Async variant of iter_handle() for a whole file; reads run off the event loop."""
+    try:
+        while True:
+            data = await asyncio.to_thread(f.read, chunk_size)
+            if not data:
+                break
+            yield data
+    finally:
+        f.close()
+
+
+audio_cache = AudioCache()
@@ -1,44 +1,315 @@
 
+import asyncio
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
-import google.generativeai as genai
-from app.rag.retriever import retrieve
 import logging
+from typing import Callable, Dict, Optional
 
-load_dotenv()
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from app.config import (
+    LLM_BACKEND,
+    GEMINI_MODEL,
+    LLM_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BACKOFF,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT,
+)
+from app.services import metrics
+from app.services.admission import Admission, Overloaded
 
-model = genai.GenerativeModel("gemini-flash-latest")
+load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
-def call_gemini(question: str):
-    try:
-        contexts = retrieve(question, top_k=3)
+# Returned by call_gemini() when the backend fails; never worth caching.
+FALLBACK_ANSWER = "I don't know"
+
+
+class LLMError(Exception):
+    """Raised when the backend fails after all retries."""
+
+
+# ======================
+# Backends
+# ======================
+class LLMBackend:
+    """Sends an already-built prompt to a model and returns the text."""
+
+    name = "base"
+    # Errors worth retrying; anything else fails immediately.
+    retryable_exceptions: tuple = (TimeoutError, ConnectionError)
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        # Backends without a native async client run on the default executor.
+        # generate() must honour `timeout` itself: a thread cannot be cancelled,
+        # so the gateway keeps its slot until the thread returns.
+        return await asyncio.to_thread(self.generate, prompt, timeout)
 
-        if not contexts:
-            context_text = "No relevant context found."
-        else:
-            context_text = "\n\n".join(contexts)
+    async def astream(self, prompt: str, timeout: float):
+        """Yield text as it is generated. Defaults to one chunk with the full answer."""
+        yield await self.agenerate(prompt, timeout)
 
-        # Improved prompt with clear instructions and formatting
-        prompt = f"""You are a helpful and informative podcast assistant.
-        Your goal is to answer the user's question based on the context provided.
-        If the context does not contain the answer, respond with "I don't know".
-        Please provide a concise and accurate answer.
 
-        Context:\n{context_text}
+class GeminiBackend(LLMBackend):
+    name = "gemini"
 
-        Question:\n{question}
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        # Imported here so that importing the app does not load the Gemini SDK;
+        # the backend is built by get_gateway() on the first call.
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
 
-        Answer:"""
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.model = genai.GenerativeModel(model_name)
+        self.retryable_exceptions = (
+            TimeoutError,
+            ConnectionError,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.InternalServerError,
+        )
 
-        response = model.generate_content(prompt)
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self.model.generate_content(prompt, request_options={"timeout": timeout})
         return response.text
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        response = await self.model.generate_content_async(prompt, request_options={"timeout": timeout})
+        return response.text
+
+    async def astream(self, prompt: str, timeout: float):
+        response = await self.model.generate_content_async(
+            prompt, stream=True, request_options={"timeout": timeout}
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+def _vertex_backend() -> LLMBackend:
+    # Imported lazily so the Vertex SDK is only needed when it is selected.
+    from app.services.vertex_llm import VertexBackend
+    return VertexBackend()
+
+
+BACKENDS: Dict[str, Callable[[], LLMBackend]] = {
+    "gemini": GeminiBackend,
+    "vertex": _vertex_backend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], LLMBackend]):
+    BACKENDS[name] = factory
+    _gateways.pop(name, None)
+
+
+# ======================
+# Gateway
+# ======================
+class LLMGateway:
+    """
+    Raw-prompt entry point to an LLM backend with a per-call timeout,
+    retries with exponential backoff and a cap on concurrent requests.
+    Callers beyond the cap wait in a bounded queue (`max_queue`, at most
+    `queue_timeout` seconds) and get Overloaded once it is full.
+
+    Sync and async calls share the one cap. A call counts against it until
+    the backend call actually returns, even after the caller stopped waiting
+    for it (timeout, retry, cancellation). The timeout is enforced here, so
+    backends whose client takes no deadline are bounded too: sync calls run on
+    a pool of `max_concurrency` threads and are waited for at most `timeout`.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.max_concurrency = max(1, max_concurrency)
+        self.admission = Admission(f"llm:{backend.name}", self.max_concurrency, max_queue, queue_timeout)
+        # Never more threads than slots: an abandoned call keeps its slot until it returns
+        self._calls = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"llm-{backend.name}")
+
+    def _delay(self, attempt: int) -> float:
+        # Full jitter keeps retries from a burst of failures from lining up.
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        timeout = timeout or self.timeout
+        retryable = self.backend.retryable_exceptions + (FutureTimeoutError,)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.admission.acquire()
+                call = self._calls.submit(self.backend.generate, prompt, timeout)
+                call.add_done_callback(self._finished)
+                return call.result(timeout)
+            except Overloaded:
+                raise
+            except retryable as e:
+                if attempt == self.max_retries:
+                    raise LLMError(f"{self.backend.name} failed after {attempt + 1} attempts: {e}") from e
+                delay = self._delay(attempt)
+                logging.warning(f"{self.backend.name} call failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+            except Exception as e:
+                raise LLMError(f"{self.backend.name} call failed: {e}") from e
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        timeout = timeout or self.timeout
+        retryable = self.backend.retryable_exceptions + (asyncio.TimeoutError,)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._attempt(prompt, timeout)
+            except Overloaded:
+                raise
+            except retryable as e:
+                if attempt == self.max_retries:
+                    raise LLMError(f"{self.backend.name} failed after {attempt + 1} attempts: {e!r}") from e
+                delay = self._delay(attempt)
+                logging.warning(f"{self.backend.name} call failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                raise LLMError(f"{self.backend.name} call failed: {e}") from e
+
+    async def _attempt(self, prompt: str, timeout: float) -> str:
+        await self.admission.aacquire()
+        call = asyncio.ensure_future(self.backend.agenerate(prompt, timeout))
+        call.add_done_callback(self._finished)
+        # Shielded: giving up on the call must not free its slot while it still runs
+        return await asyncio.wait_for(asyncio.shield(call), timeout)
+
+    def _finished(self, call):
+        self.admission.release()
+        if not call.cancelled():
+            call.exception()  # a call nobody waits for any more fails quietly
+
+    async def astream(self, prompt: str, timeout: Optional[float] = None):
+        """
+        Stream text chunks from the backend. A failure before the first chunk is
+        retried like agenerate(); once text has been yielded it is raised as is.
+        """
+        timeout = timeout or self.timeout
+        retryable = self.backend.retryable_exceptions + (asyncio.TimeoutError,)
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self.admission.slot():
+                    async for chunk in self.backend.astream(prompt, timeout):
+                        started = True
+                        yield chunk
+                return
+            except Overloaded:
+                raise
+            except retryable as e:
+                if started or attempt == self.max_retries:
+                    raise LLMError(f"{self.backend.name} stream failed: {e!r}") from e
+                delay = self._delay(attempt)
+                logging.warning(f"{self.backend.name} stream failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                raise LLMError(f"{self.backend.name} stream failed: {e}") from e
+
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(backend: Optional[str] = None) -> LLMGateway:
+    name = backend or LLM_BACKEND
+    gateway = _gateways.get(name)
+    if gateway is None:
+        with _gateways_lock:
+            gateway = _gateways.get(name)
+            if gateway is None:
+                if name not in BACKENDS:
+                    raise ValueError(f"Unknown LLM backend: {name}")
+                gateway = _gateways[name] = LLMGateway(BACKENDS[name]())
+    return gateway
+
+
+def call_gemini(prompt: str, stage: str = "llm") -> str:
+    """
+    Send a fully built prompt to the configured LLM backend.
+    The caller is responsible for retrieval and prompt construction.
+    The call is timed as metrics stage `stage`.
+    """
+    gateway = get_gateway()
+    try:
+        with metrics.span(stage):
+            answer = gateway.generate(prompt)
+    except Overloaded as e:
+        logging.error(f"Gemini call not admitted: {e}")
+        metrics.record_llm(gateway.backend.name, prompt, None, "overloaded")
+        return FALLBACK_ANSWER
+    except Exception as e:
+        logging.error(f"Error during Gemini call: {e}")
+        metrics.record_llm(gateway.backend.name, prompt, None, "error")
+        return FALLBACK_ANSWER
+    metrics.record_llm(gateway.backend.name, prompt, answer)
+    return answer
+
+
+async def acall_gemini(prompt: str, stage: str = "llm") -> str:
+    """
+    Async variant of call_gemini().
+    Overloaded is raised rather than answered with the fallback, so callers
+    can shed the request instead of serving a non-answer.
+    """
+    gateway = get_gateway()
+    try:
+        with metrics.span(stage):
+            answer = await gateway.agenerate(prompt)
+    except Overloaded:
+        metrics.record_llm(gateway.backend.name, prompt, None, "overloaded")
+        raise
     except Exception as e:
         logging.error(f"Error during Gemini call: {e}")
-        return "I don't know"
+        metrics.record_llm(gateway.backend.name, prompt, None, "error")
+        return FALLBACK_ANSWER
+    metrics.record_llm(gateway.backend.name, prompt, answer)
+    return answer
+
 
+async def astream_gemini(prompt: str, stage: str = "llm"):
+    """Stream a fully built prompt's answer as text chunks, timed as metrics stage `stage`."""
+    gateway = get_gateway()
+    started = False
+    output = []
+    # Spans the whole stream, i.e. until the last chunk has been consumed
+    with metrics.span(stage):
+        try:
+            async for chunk in gateway.astream(prompt):
+                started = True
+                output.append(chunk)
+                yield chunk
+        except Overloaded:
+            metrics.record_llm(gateway.backend.name, prompt, None, "overloaded")
+            raise
+        except Exception as e:
+            logging.error(f"Error during Gemini stream: {e}")
+            metrics.record_llm(gateway.backend.name, prompt, "".join(output), "error")
+            if not started:
+                yield FALLBACK_ANSWER
+            return
+    metrics.record_llm(gateway.backend.name, prompt, "".join(output))
@@ -0,0 +1,230 @@
+"""
+Per-stage latency spans and Prometheus metrics, without a client library.
+
+`span(stage)` times a block into the `voice_rag_stage_seconds` histogram and
+into the current request's span list (reported as a Server-Timing header
+and, with METRICS_LOG_SPANS, one log line per span tagged with the request
+ID). Counters cover what is sent to the LLM and TTS backends and ingestion
+throughput; cache statistics are read from the caches at scrape time, so
+hits and misses cost nothing extra on the hot path.
+
+With METRICS_ENABLED=false, `span()` returns a shared no-op context manager
+and the counters return immediately.
+"""
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import METRICS_ENABLED, METRICS_LOG_SPANS
+
+PREFIX = "voice_rag"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        if not enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        if not enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        names = self.labels + ("le",)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+enabled = METRICS_ENABLED
+
+stage_seconds = Histogram("stage_seconds", "Latency of each pipeline stage.", ["stage"])
+llm_requests = Counter("llm_requests_total", "LLM calls by backend and outcome.", ["backend", "outcome"])
+llm_prompt_chars = Counter("llm_prompt_characters_total", "Prompt characters sent to the LLM.", ["backend"])
+llm_prompt_tokens = Counter("llm_prompt_tokens_total", "Estimated prompt tokens sent to the LLM.", ["backend"])
+llm_output_chars = Counter("llm_output_characters_total", "Characters generated by the LLM.", ["backend"])
+tts_requests = Counter("tts_requests_total", "Synthesis calls sent to ElevenLabs.", ["voice"])
+tts_chars = Counter("tts_characters_total", "Characters sent to ElevenLabs.", ["voice"])
+ingest_chunks = Counter("ingest_chunks_total", "Chunks produced by ingestion.")
+ingest_seconds = Counter("ingest_seconds_total", "Wall time spent ingesting documents.")
+ingest_rate = Histogram(
+    "ingest_chunks_per_second", "Chunks per second of each ingested document.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000),
+)
+
+METRICS = [stage_seconds, llm_requests, llm_prompt_chars, llm_prompt_tokens, llm_output_chars,
+           tts_requests, tts_chars, ingest_chunks, ingest_seconds, ingest_rate]
+
+# Read at scrape time: name -> () -> {(cache, result): value}
+_collectors: Dict[str, Callable[[], Dict[Tuple[str, str], float]]] = {}
+
+
+def register_collector(name: str, collect: Callable[[], Dict[Tuple[str, str], float]]):
+    """`collect()` returns {(cache, result): count} for the cache_requests_total counter."""
+    _collectors[name] = collect
+
+
+# ======================
+# Request correlation
+# ======================
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("spans", default=None)
+
+
+def request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request(incoming_id: Optional[str] = None):
+    """Scope spans to one request; yields (request_id, spans list)."""
+    rid = incoming_id or uuid.uuid4().hex[:16]
+    spans: List[Tuple[str, float]] = []
+    rid_token, spans_token = _request_id.set(rid), _spans.set(spans)
+    try:
+        yield rid, spans
+    finally:
+        _request_id.reset(rid_token)
+        _spans.reset(spans_token)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans)
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stage_seconds.observe(elapsed, self.stage)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((self.stage, elapsed))
+        if METRICS_LOG_SPANS:
+            logging.info(f"[{_request_id.get() or '-'}] {self.stage} {elapsed * 1000:.1f}ms")
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def span(stage: str):
+    """Time a block as `stage`; works in sync and async code alike."""
+    return _Span(stage) if enabled else _NOOP
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text.split()) * 1.3) + 1
+
+
+def record_llm(backend: str, prompt: str, output: Optional[str], outcome: str = "ok"):
+    if not enabled:
+        return
+    llm_requests.inc(1, backend, outcome)
+    llm_prompt_chars.inc(len(prompt), backend)
+    llm_prompt_tokens.inc(estimate_tokens(prompt), backend)
+    if output:
+        llm_output_chars.inc(len(output), backend)
+
+
+def record_tts(text: str, voice: str):
+    if not enabled:
+        return
+    tts_requests.inc(1, voice)
+    tts_chars.inc(len(text), voice)
+
+
+def record_ingest(chunks: int, seconds: float, timings: Optional[dict] = None):
+    if not enabled:
+        return
+    ingest_chunks.inc(chunks)
+    ingest_seconds.inc(seconds)
+    if seconds > 0:
+        ingest_rate.observe(chunks / seconds)
+    for stage, value in (timings or {}).items():
+        if stage != "total":
+            stage_seconds.observe(value, f"ingest_{stage}")
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    name = f"{PREFIX}_cache_requests_total"
+    lines.append(f"# HELP {name} Cache lookups by cache and result.")
+    lines.append(f"# TYPE {name} counter")
+    for collector, collect in list(_collectors.items()):
+        try:
+            values = collect()
+        except Exception as e:
+            logging.error(f"Metrics collector {collector} failed: {e}")
+            continue
+        for (cache, result), value in values.items():
+            lines.append(f'{name}{{cache="{cache}",result="{result}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,127 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_TTL,
+)
+
+
+def context_fingerprint(context: str) -> str:
+    return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    LLM answer cache keyed on question embeddings.
+
+    Entries are bucketed by (scope, context fingerprint), so an answer is only
+    reused for the same document scope and the same retrieved context. Within a
+    bucket a lookup hits when the cosine similarity between the new question
+    and a cached one is at least `threshold`.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        maxsize: int = SEMANTIC_CACHE_SIZE,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # bucket -> {entry_id: (unit vector, answer, expires_at)}
+        self._buckets: Dict[Tuple[str, str], Dict[int, tuple]] = {}
+        # entry_id -> bucket, in LRU order
+        self._lru: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, scope: str, context_key: str, vector) -> Optional[str]:
+        if not self.enabled:
+            return None
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((scope, context_key))
+            if bucket:
+                for entry_id in [i for i, (_, _, expires_at) in bucket.items() if expires_at <= now]:
+                    self._drop(entry_id)
+            if not bucket:
+                self.misses += 1
+                return None
+            entry_ids = list(bucket)
+            matrix = np.stack([bucket[i][0] for i in entry_ids])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entry_id = entry_ids[best]
+            self._lru.move_to_end(entry_id)
+            self.hits += 1
+            return bucket[entry_id][1]
+
+    def store(self, scope: str, context_key: str, vector, answer: str):
+        if not self.enabled or self.maxsize <= 0:
+            return
+        key = (scope, context_key)
+        entry = (self._normalize(vector), answer, time.monotonic() + self.ttl)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._buckets.setdefault(key, {})[entry_id] = entry
+            self._lru[entry_id] = key
+            while len(self._lru) > self.maxsize:
+                self._drop(next(iter(self._lru)))
+                self.evictions += 1
+
+    def invalidate(self, scope: Optional[str] = None):
+        with self._lock:
+            for entry_id, (entry_scope, _) in list(self._lru.items()):
+                if scope is None or entry_scope == scope:
+                    self._drop(entry_id)
+
+    def _drop(self, entry_id: int):
+        key = self._lru.pop(entry_id)
+        bucket = self._buckets[key]
+        del bucket[entry_id]
+        if not bucket:
+            del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+semantic_cache = SemanticCache()
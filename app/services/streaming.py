@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+import re
+from typing import AsyncIterator, List, Optional
+
+from app.config import EPISODE_HEARTBEAT_SECONDS, STREAM_MIN_SENTENCE_CHARS, TTS_STREAM_CONCURRENCY
+from app.services.admission import Overloaded
+from app.services.tts import atext_to_speech_stream
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, whitespace.
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+
+
+def _split_complete(buffer: str, min_chars: int):
+    """Split `buffer` into complete sentences and the unfinished remainder."""
+    sentences: List[str] = []
+    start = 0
+    for match in _SENTENCE_END.finditer(buffer):
+        # Merge very short sentences with the next one so TTS calls stay worthwhile.
+        if match.end() - start < min_chars:
+            continue
+        sentences.append(buffer[start:match.end()].strip())
+        start = match.end()
+    return sentences, buffer[start:]
+
+
+async def split_sentences(
+    chunks: AsyncIterator[str], min_chars: int = STREAM_MIN_SENTENCE_CHARS
+) -> AsyncIterator[str]:
+    """Re-chunk a stream of LLM text into sentences as soon as each one is complete."""
+    buffer = ""
+    async for chunk in chunks:
+        buffer += chunk
+        sentences, buffer = _split_complete(buffer, min_chars)
+        for sentence in sentences:
+            yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class OrderedSpeech:
+    """
+    Synthesizes sentences concurrently while replaying their audio in the order
+    they were added.
+
+    Each sentence gets its own chunk queue, so audio for the sentence at the head
+    is streamed to the client as it arrives while later sentences are already
+    being synthesized (at most `max_concurrency` at a time).
+    """
+
+    def __init__(self, max_concurrency: int = TTS_STREAM_CONCURRENCY):
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        self._segments: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    def add(self, text: str, voice: str):
+        segment: asyncio.Queue = asyncio.Queue()
+        self._segments.put_nowait(segment)
+        self._tasks.append(asyncio.create_task(self._synthesize(text, voice, segment)))
+
+    def close(self):
+        """Mark that no more sentences will be added."""
+        self._segments.put_nowait(None)
+
+    async def _synthesize(self, text: str, voice: str, segment: asyncio.Queue):
+        try:
+            async with self._slots:
+                async for chunk in atext_to_speech_stream(text, voice):
+                    segment.put_nowait(chunk)
+        except Exception as e:
+            # Drop the sentence rather than the whole stream.
+            logging.error(f"Error during sentence synthesis: {e}")
+        finally:
+            segment.put_nowait(None)
+
+    async def audio(self) -> AsyncIterator[bytes]:
+        while True:
+            segment: Optional[asyncio.Queue] = await self._segments.get()
+            if segment is None:
+                return
+            while True:
+                chunk = await segment.get()
+                if chunk is None:
+                    break
+                yield chunk
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def sse_event(event: dict) -> str:
+    """Format one Server-Sent Event, named after the event's `type`."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def sse_stream(
+    events: AsyncIterator[dict], heartbeat: float = EPISODE_HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Serialize `events` as Server-Sent Events.
+
+    The next event is only requested once the previous one has been handed to
+    the client, so a slow reader holds the producer back instead of events
+    piling up in memory. While the producer is busy, a comment line is sent
+    every `heartbeat` seconds: writing to a closed connection fails, which
+    closes this generator and cancels the producer - and the LLM/TTS work it
+    has in flight - with it.
+    """
+    async def next_event():
+        return await events.__anext__()
+
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            pending = asyncio.create_task(next_event())
+            while not (await asyncio.wait({pending}, timeout=heartbeat))[0]:
+                yield ": keep-alive\n\n"
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            except Overloaded as e:
+                # Headers are already sent, so shed load with an event rather than a 503
+                yield sse_event({"type": "error", "detail": str(e)})
+                return
+            yield sse_event(event)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
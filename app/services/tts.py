@@ -1,8 +1,19 @@
 import os
+import asyncio
 import base64
-from elevenlabs import ElevenLabs
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-client = ElevenLabs(api_key=os.environ["ELEVENLABS_API_KEY"])
+from app.config import TTS_MAX_WORKERS, TTS_MAX_QUEUE, TTS_QUEUE_TIMEOUT, TTS_STREAM_BUFFER
+from app.services.admission import Admission
+from app.services.metrics import record_tts, span
+from app.services.audio_cache import aiter_handle, audio_cache, audio_key
+
+# ElevenLabs clients, built on first use by get_client() / get_async_client().
+# Assigning either one (tests, benchmarks) replaces the real client.
+client = None
+async_client = None
+_clients_lock = threading.Lock()
 
 # Map agent roles to ElevenLabs voice IDs
 # Replace with your preferred voices from https://elevenlabs.io/voice-library
@@ -12,24 +23,75 @@ VOICES = {
     "moderator": "pNInz6obpgDQGcFmaJgB",  # Adam - warm, authoritative
 }
 
+OUTPUT_FORMAT = "mp3_44100_128"
+
+# Order in which speakers are heard within a turn
+SPEAKER_ORDER = ("curious", "explainer", "moderator")
+
+# Bounded pool shared by all multi-speaker synthesis
+_executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+# Async synthesis calls to ElevenLabs; cache hits don't take a slot
+_admission = Admission("tts", TTS_MAX_WORKERS, TTS_MAX_QUEUE, TTS_QUEUE_TIMEOUT)
+
+def _api_key() -> str:
+    api_key = os.getenv("ELEVENLABS_API_KEY")
+    if not api_key:
+        raise RuntimeError("ELEVENLABS_API_KEY is not set; text-to-speech is unavailable")
+    return api_key
+
+
+def get_client():
+    global client
+    if client is None:
+        with _clients_lock:
+            if client is None:
+                from elevenlabs import ElevenLabs
+                client = ElevenLabs(api_key=_api_key())
+    return client
+
+
+def get_async_client():
+    global async_client
+    if async_client is None:
+        with _clients_lock:
+            if async_client is None:
+                from elevenlabs import AsyncElevenLabs
+                async_client = AsyncElevenLabs(api_key=_api_key())
+    return async_client
+
+
+def synthesize(text: str, voice: str = "explainer", model_id: str = "eleven_multilingual_v2") -> bytes:
+    """
+    Convert text to speech using ElevenLabs and return the raw MP3 bytes.
+    Clips are served from the on-disk audio cache when the same text was
+    already spoken with the same voice and model.
+    """
+    voice_id = VOICES.get(voice, VOICES["explainer"])
+    key = audio_key(text, voice_id, model_id, OUTPUT_FORMAT)
+    cached = audio_cache.read(key)
+    if cached is not None:
+        return cached
+
+    record_tts(text, voice)
+    with span("tts"):
+        audio_generator = get_client().text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=model_id,  # multilingual_v2: best quality
+            output_format=OUTPUT_FORMAT,
+        )
+
+        # Collect audio bytes from generator
+        audio_bytes = b"".join(audio_generator)
+    audio_cache.put(key, audio_bytes)
+    return audio_bytes
+
 def text_to_speech(text: str, voice: str = "explainer") -> str:
     """
     Convert text to speech using ElevenLabs.
     Returns base64-encoded MP3 audio.
     """
-    voice_id = VOICES.get(voice, VOICES["explainer"])
-    
-    audio_generator = client.text_to_speech.convert(
-        voice_id=voice_id,
-        text=text,
-        model_id="eleven_multilingual_v2",  # Best quality
-        output_format="mp3_44100_128",
-    )
-    
-    # Collect audio bytes from generator
-    audio_bytes = b"".join(audio_generator)
-    
-    return base64.b64encode(audio_bytes).decode()
+    return base64.b64encode(synthesize(text, voice)).decode()
 
 def text_to_speech_stream(text: str, voice: str = "explainer"):
     """
@@ -37,20 +99,46 @@ def text_to_speech_stream(text: str, voice: str = "explainer"):
     Yields audio chunks.
     """
     voice_id = VOICES.get(voice, VOICES["explainer"])
-    
-    return client.text_to_speech.convert(
-        voice_id=voice_id,
-        text=text,
-        model_id="eleven_turbo_v2_5",  # Faster for streaming
-        output_format="mp3_44100_128",
-    )
+    model_id = "eleven_turbo_v2_5"  # Faster for streaming
+    key = audio_key(text, voice_id, model_id, OUTPUT_FORMAT)
+    cached = audio_cache.read(key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    record_tts(text, voice)
+    with span("tts"):
+        for chunk in get_client().text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=model_id,
+            output_format=OUTPUT_FORMAT,
+        ):
+            chunks.append(chunk)
+            yield chunk
+    # Only complete clips are cached
+    audio_cache.put(key, b"".join(chunks))
+
+def _speakers(conversation: dict) -> list:
+    """Roles present in the conversation, in speaking order."""
+    return [role for role in SPEAKER_ORDER if conversation.get(role)]
+
+def synthesize_segments(conversation: dict) -> dict:
+    """
+    Synthesize every speaker's segment concurrently on the shared pool.
+    Returns {role: mp3 bytes} in speaking order; missing roles are skipped.
+    """
+    roles = _speakers(conversation)
+    futures = [_executor.submit(synthesize, conversation[role], role) for role in roles]
+    return {role: future.result() for role, future in zip(roles, futures)}
 
 def generate_podcast_audio(conversation: dict) -> dict:
     """Generate audio for full podcast turn."""
+    segments = synthesize_segments(conversation)
     return {
-        "curious_audio": text_to_speech(conversation["curious"], "curious"),
-        "explainer_audio": text_to_speech(conversation["explainer"], "explainer"),
-        "moderator_audio": text_to_speech(conversation["moderator"], "moderator"),
+        f"{role}_audio": base64.b64encode(audio).decode()
+        for role, audio in segments.items()
     }
 
 def generate_combined_podcast(conversation: dict) -> str:
@@ -58,29 +146,165 @@ def generate_combined_podcast(conversation: dict) -> str:
     Generate a single combined audio file for the full podcast turn.
     Returns base64-encoded MP3.
     """
-    # Generate individual segments
-    curious_audio = b"".join(client.text_to_speech.convert(
-        voice_id=VOICES["curious"],
-        text=conversation["curious"],
-        model_id="eleven_multilingual_v2",
-        output_format="mp3_44100_128",
-    ))
-    
-    explainer_audio = b"".join(client.text_to_speech.convert(
-        voice_id=VOICES["explainer"],
-        text=conversation["explainer"],
-        model_id="eleven_multilingual_v2",
-        output_format="mp3_44100_128",
-    ))
-    
-    moderator_audio = b"".join(client.text_to_speech.convert(
-        voice_id=VOICES["moderator"],
-        text=conversation["moderator"],
-        model_id="eleven_multilingual_v2",
-        output_format="mp3_44100_128",
-    ))
-    
+    segments = synthesize_segments(conversation)
+
     # Combine (simple concatenation - works for MP3)
-    combined = curious_audio + explainer_audio + moderator_audio
-    
+    combined = b"".join(segments.values())
+
     return base64.b64encode(combined).decode()
+
+
+# ======================
+# Async variants
+# ======================
+async def _aconvert(text: str, voice_id: str, model_id: str):
+    """
+    Stream one clip from ElevenLabs. The request runs in its own task, which
+    holds a TTS slot only while ElevenLabs is sending. Up to TTS_STREAM_BUFFER
+    chunks are read ahead of the consumer, so a slow client keeps the slot
+    from other requests only for clips longer than that.
+    """
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=TTS_STREAM_BUFFER)
+
+    async def produce():
+        try:
+            async with _admission.slot():
+                with span("tts"):
+                    async for chunk in get_async_client().text_to_speech.convert(
+                        voice_id=voice_id,
+                        text=text,
+                        model_id=model_id,
+                        output_format=OUTPUT_FORMAT,
+                    ):
+                        await chunks.put(chunk)
+        except Exception as e:
+            await chunks.put(e)  # raised by the consumer
+        else:
+            await chunks.put(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while (chunk := await chunks.get()) is not None:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        producer.cancel()
+
+
+def _acaching(key: str, chunks):
+    """Pass `chunks` through, writing them to the audio cache on the way when it is enabled."""
+    return audio_cache.awrite(key, chunks) if audio_cache.enabled else chunks
+
+
+async def _astream_clip(text: str, voice: str, model_id: str):
+    """Yield one clip from the audio cache, or from ElevenLabs while caching it."""
+    voice_id = VOICES.get(voice, VOICES["explainer"])
+    key = audio_key(text, voice_id, model_id, OUTPUT_FORMAT)
+    # An open handle keeps reading the whole clip even if it is evicted meanwhile
+    f = await asyncio.to_thread(audio_cache.open, key)
+    if f is not None:
+        async for chunk in aiter_handle(f):
+            yield chunk
+        return
+
+    record_tts(text, voice)
+    async for chunk in _acaching(key, _aconvert(text, voice_id, model_id)):
+        yield chunk
+
+
+async def asynthesize(text: str, voice: str = "explainer", model_id: str = "eleven_multilingual_v2") -> bytes:
+    """Async variant of synthesize()."""
+    voice_id = VOICES.get(voice, VOICES["explainer"])
+    key = audio_key(text, voice_id, model_id, OUTPUT_FORMAT)
+    cached = await asyncio.to_thread(audio_cache.read, key)
+    if cached is not None:
+        return cached
+
+    record_tts(text, voice)
+    return b"".join([chunk async for chunk in _acaching(key, _aconvert(text, voice_id, model_id))])
+
+
+async def atext_to_speech(text: str, voice: str = "explainer") -> str:
+    """Async variant of text_to_speech(). Returns base64-encoded MP3 audio."""
+    return base64.b64encode(await asynthesize(text, voice)).decode()
+
+
+async def atext_to_speech_stream(text: str, voice: str = "explainer"):
+    """Async variant of text_to_speech_stream(). Yields audio chunks."""
+    async for chunk in _astream_clip(text, voice, "eleven_turbo_v2_5"):
+        yield chunk
+
+
+async def _agather_roles(conversation: dict, synthesize_fn) -> dict:
+    """Run `synthesize_fn(text, role)` for each present role; ElevenLabs calls are bounded by TTS_MAX_WORKERS."""
+    roles = _speakers(conversation)
+    results = await asyncio.gather(*(synthesize_fn(conversation[role], role) for role in roles))
+    return dict(zip(roles, results))
+
+
+async def asynthesize_segments(conversation: dict) -> dict:
+    """Async variant of synthesize_segments(), bounded by TTS_MAX_WORKERS."""
+    return await _agather_roles(conversation, asynthesize)
+
+
+async def asynthesize_to_cache(text: str, voice: str = "explainer", model_id: str = "eleven_multilingual_v2") -> str:
+    """
+    Synthesize into the audio cache and return the clip's key. The clip is
+    written chunk by chunk as it arrives, never held in memory whole.
+    """
+    voice_id = VOICES.get(voice, VOICES["explainer"])
+    key = audio_key(text, voice_id, model_id, OUTPUT_FORMAT)
+    if await asyncio.to_thread(audio_cache.get, key) is not None:
+        return key
+
+    record_tts(text, voice)
+    async for _ in audio_cache.awrite(key, _aconvert(text, voice_id, model_id)):
+        pass
+    return key
+
+
+async def asynthesize_segments_to_cache(conversation: dict) -> dict:
+    """Like asynthesize_segments() but returns {role: cache key} instead of bytes."""
+    return await _agather_roles(conversation, asynthesize_to_cache)
+
+
+async def astream_segments(conversation: dict):
+    """
+    Yield the turn as one MP3 stream in speaking order.
+    The first segment is streamed as it is synthesized. With the audio cache
+    enabled, the later ones are synthesized to disk meanwhile and replayed
+    from there; otherwise each is streamed from ElevenLabs in turn.
+    """
+    roles = _speakers(conversation)
+    later = {}
+    if audio_cache.enabled:
+        later = {
+            role: asyncio.ensure_future(asynthesize_to_cache(conversation[role], role)) for role in roles[1:]
+        }
+    try:
+        for role in roles:
+            if role in later:
+                await later[role]
+            # Evicted again before it could be opened (tiny cache, heavy traffic): synthesized once more
+            async for chunk in _astream_clip(conversation[role], role, "eleven_multilingual_v2"):
+                yield chunk
+    finally:
+        for task in later.values():
+            task.cancel()
+        await asyncio.gather(*later.values(), return_exceptions=True)
+
+
+async def agenerate_podcast_audio(conversation: dict) -> dict:
+    """Async variant of generate_podcast_audio()."""
+    segments = await asynthesize_segments(conversation)
+    return {
+        f"{role}_audio": base64.b64encode(audio).decode()
+        for role, audio in segments.items()
+    }
+
+
+async def agenerate_combined_podcast(conversation: dict) -> str:
+    """Async variant of generate_combined_podcast(). Returns base64-encoded MP3."""
+    segments = await asynthesize_segments(conversation)
+    return base64.b64encode(b"".join(segments.values())).decode()
@@ -1,6 +1,43 @@
+import asyncio
+
+import vertexai
 from vertexai.preview.generative_models import GenerativeModel
 
-model = GenerativeModel("gemini-1.5-pro")
+from app.config import VERTEX_LOCATION, VERTEX_MODEL, VERTEX_PROJECT
+from app.services.llm import LLMBackend, get_gateway
+
+
+class VertexBackend(LLMBackend):
+    """
+    Gemini on Vertex AI. generate_content() takes no per-call deadline: the
+    gateway bounds sync calls, and async calls are cancelled at `timeout`.
+    """
+
+    name = "vertex"
+
+    def __init__(self, model_name: str = VERTEX_MODEL):
+        from google.api_core import exceptions as google_exceptions
+
+        vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
+        self.model = GenerativeModel(model_name)
+        self.retryable_exceptions = (
+            TimeoutError,
+            ConnectionError,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.InternalServerError,
+        )
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        return self.model.generate_content(prompt).text
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        # A native coroutine, unlike a thread, really stops when cancelled
+        response = await asyncio.wait_for(self.model.generate_content_async(prompt), timeout)
+        return response.text
+
 
 def ask_gemini(prompt: str):
-    return model.generate_content(prompt).text
+    return get_gateway("vertex").generate(prompt)
@@ -0,0 +1,85 @@
+"""
+Compare the character chunker with the sentence chunker on a PDF.
+
+For each strategy reports chunk count, token statistics, chunking and
+embedding time, and a retrieval-quality proxy: a sample of the document's own
+sentences is used as queries, and a hit means one of the top-k chunks
+(cosine similarity) fully contains that sentence.
+
+    python -m benchmarks.chunking [sample.pdf] [--queries 200] [--top-k 3]
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+from pypdf import PdfReader
+
+from app.rag.chunking import SentenceChunker, chunk_pages
+from app.rag.embeddings import get_engine
+
+
+def run(pages, engine, mode, queries, top_k):
+    started = time.perf_counter()
+    chunks = list(chunk_pages(iter(pages), engine.count_tokens, mode=mode))
+    chunk_seconds = time.perf_counter() - started
+
+    texts = [c.text for c in chunks]
+    tokens = engine.count_tokens(texts)
+    started = time.perf_counter()
+    vectors = np.asarray(engine.embed_texts(texts), dtype=np.float32)
+    embed_seconds = time.perf_counter() - started
+
+    query_vectors = np.asarray(engine.embed_texts([q.text for q in queries]), dtype=np.float32)
+    scores = query_vectors @ vectors.T
+    top = np.argsort(-scores, axis=1)[:, :top_k]
+    starts = np.array([c.start for c in chunks])
+    ends = np.array([c.end for c in chunks])
+    hits_at_1 = hits_at_k = 0
+    for q, ranked in zip(queries, top):
+        covering = (starts[ranked] <= q.start) & (ends[ranked] >= q.end)
+        hits_at_1 += bool(covering[0])
+        hits_at_k += bool(covering.any())
+
+    return {
+        "chunks": len(chunks),
+        "tokens_total": int(sum(tokens)),
+        "tokens_mean": float(np.mean(tokens)) if tokens else 0.0,
+        "tokens_max": int(max(tokens, default=0)),
+        "chunk_seconds": chunk_seconds,
+        "embed_seconds": embed_seconds,
+        "hit_at_1": hits_at_1 / len(queries) if queries else 0.0,
+        f"hit_at_{top_k}": hits_at_k / len(queries) if queries else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", default="sample.pdf")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = [page.extract_text() or "" for page in PdfReader(args.pdf).pages]
+    engine = get_engine()
+
+    # Query sentences are taken from the document itself, with their offsets.
+    sentences = [
+        s for s in SentenceChunker(engine.count_tokens)._sentences(iter(pages), [])
+        if len(s.text.split()) >= 6
+    ]
+    queries = random.Random(args.seed).sample(sentences, min(args.queries, len(sentences)))
+
+    report = {
+        "pdf": args.pdf,
+        "pages": len(pages),
+        "queries": len(queries),
+        "strategies": {mode: run(pages, engine, mode, queries, args.top_k) for mode in ("chars", "sentence")},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Offline end-to-end benchmark: no network, no API keys, no Qdrant.
+
+Gemini, ElevenLabs and Qdrant are replaced by the deterministic fakes in
+benchmarks.fakes (configurable latency), and embeddings by a hashing
+embedder unless --embedder model is given. Sections:
+
+- ingestion:  extract + chunk + embed + upsert throughput (index_pdf) on
+              sample.pdf and on generated PDFs of --synthetic-pages pages
+- retrieval:  retrieve_passages() latency against collection size
+- podcast:    run_podcast_turn() and run_multi_turn_podcast() latency
+- streaming:  time to first audio byte on /conversation/podcast/stream,
+              incremental and not
+
+The report is JSON (stdout, and --output if given), tagged with the git
+commit, so runs can be compared between commits.
+
+    python -m benchmarks.e2e [--output bench.json] [--sections ingestion podcast]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks import fakes
+from benchmarks.fakes import sentences
+
+from app.agents import controller
+from app.api.conversation import QuestionRequest, podcast_stream
+from app.rag.embeddings import get_engine
+from app.rag.ingest import index_pdf
+from app.rag.local_store import LocalStore
+from app.rag.retriever import retrieve_passages
+from app.rag.vectorstore import COLLECTION, get_store
+
+SECTIONS = ("ingestion", "retrieval", "podcast", "streaming")
+
+
+def summarize(samples: List[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(samples),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+    }
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 50, seed: int = 0):
+    """A plain text PDF (Helvetica, one content stream per page) that pypdf can extract."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        lines = sentences(seed * 100003 + page, lines_per_page, words=10)
+        text = "".join(f"({_escape(line)}) Tj T* " for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 40 760 Td {text}ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode()
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def bench_ingestion(pdf: str, synthetic_pages: List[int], directory: str) -> dict:
+    sources = {}
+    if os.path.exists(pdf):
+        sources[os.path.basename(pdf)] = pdf
+    for pages in synthetic_pages:
+        path = os.path.join(directory, f"synthetic_{pages}.pdf")
+        write_pdf(path, pages, seed=pages)
+        sources[f"synthetic_{pages}_pages"] = path
+
+    results = {}
+    for name, path in sources.items():
+        started = time.perf_counter()
+        stats = index_pdf(path, doc_id=name)
+        seconds = time.perf_counter() - started
+        results[name] = {
+            "pages": stats.pages,
+            "chunks": stats.chunks,
+            "seconds": seconds,
+            "pages_per_second": stats.pages / seconds if seconds else 0.0,
+            "chunks_per_second": stats.chunks / seconds if seconds else 0.0,
+            "embed_chunks_per_second": stats.embedded / stats.timings["embed"] if stats.timings["embed"] else 0.0,
+            "stages": stats.timings,
+        }
+    return results
+
+
+def bench_retrieval(sizes: List[int], queries: int, top_k: int) -> list:
+    engine = get_engine()
+    dim = engine.dimension
+    rng = np.random.default_rng(0)
+    previous = get_store()
+    results = []
+    try:
+        store = LocalStore(None)
+        fakes.use_store(store)
+        store.ensure_collection(COLLECTION, dim)
+        size = 0
+        for target in sorted(sizes):
+            while size < target:
+                n = min(5000, target - size)
+                vectors = rng.normal(size=(n, dim)).astype(np.float32)
+                ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(size, size + n)]
+                store.upsert(COLLECTION, ids, vectors, [{"text": f"chunk {i}"} for i in range(size, size + n)])
+                size += n
+            samples = []
+            for i in range(queries):
+                # Distinct text per query: measures embedding + search, not the caches
+                started = time.perf_counter()
+                retrieve_passages(f"{size} {i} " + sentences(i, 1)[0], top_k=top_k)
+                samples.append(time.perf_counter() - started)
+            results.append({"size": size, **summarize(samples)})
+    finally:
+        fakes.use_store(previous)
+    return results
+
+
+def bench_podcast(iterations: int, num_turns: int) -> dict:
+    turn, episode = [], []
+    for i in range(iterations):
+        started = time.perf_counter()
+        controller.run_podcast_turn(f"reactor energy {i}")
+        turn.append(time.perf_counter() - started)
+    for i in range(iterations):
+        started = time.perf_counter()
+        controller.run_multi_turn_podcast(f"signal network {i}", num_turns=num_turns)
+        episode.append(time.perf_counter() - started)
+    return {
+        "run_podcast_turn": summarize(turn),
+        "run_multi_turn_podcast": {"num_turns": num_turns, **summarize(episode)},
+    }
+
+
+async def _first_audio(incremental: bool, topic: str):
+    # Timed from the handler call: the non-incremental route writes the turn before responding
+    started = time.perf_counter()
+    response = await podcast_stream(QuestionRequest(topic=topic, incremental=incremental))
+    first, size = None, 0
+    async for chunk in response.body_iterator:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    return first, time.perf_counter() - started, size
+
+
+async def bench_streaming(iterations: int) -> dict:
+    results = {}
+    for incremental in (False, True):
+        firsts, totals = [], []
+        for i in range(iterations):
+            first, total, _ = await _first_audio(incremental, f"pattern volume {i} {incremental}")
+            firsts.append(first)
+            totals.append(total)
+        results["incremental" if incremental else "full_turn"] = {
+            "time_to_first_audio": summarize(firsts),
+            "total": summarize(totals),
+        }
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--pdf", default="sample.pdf")
+    parser.add_argument("--synthetic-pages", type=int, nargs="*", default=[50, 500])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--num-turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="seconds per fake LLM call")
+    parser.add_argument("--llm-ttft", type=float, default=0.15, help="seconds to first streamed chunk")
+    parser.add_argument("--tts-latency", type=float, default=0.25, help="seconds to first audio byte")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- fraction of each fake latency")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "sections")},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        fakes.install(args.llm_latency, args.llm_ttft, args.tts_latency, args.jitter, args.embedder,
+                      store_dir=os.path.join(directory, "index"))
+        # Podcast and streaming retrieve from whatever was ingested, so ingest first
+        if "ingestion" in args.sections:
+            report["ingestion"] = bench_ingestion(args.pdf, args.synthetic_pages, directory)
+        elif {"podcast", "streaming"} & set(args.sections):
+            bench_ingestion(args.pdf, [] if os.path.exists(args.pdf) else [20], directory)
+        if "podcast" in args.sections:
+            report["podcast"] = bench_podcast(args.iterations, args.num_turns)
+        if "streaming" in args.sections:
+            report["streaming"] = asyncio.run(bench_streaming(args.iterations))
+        if "retrieval" in args.sections:
+            report["retrieval"] = bench_retrieval(args.sizes, args.queries, args.top_k)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
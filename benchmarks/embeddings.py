@@ -0,0 +1,88 @@
+"""
+Encode throughput and parity of the embedding backends (app.rag.embeddings.BACKENDS).
+
+Each backend is loaded once (load time reported), checked against the
+reference "torch" backend on PARITY_TEXTS (min/mean cosine), then timed
+encoding the same corpus at each batch size. Texts are sentences of the PDF
+when it exists, otherwise generated ones, so the token lengths look like
+real chunks and queries. Backends that cannot load here (e.g. ONNX without
+onnxruntime) are reported with their error and skipped.
+
+    python -m benchmarks.embeddings [--backends torch torch-int8 onnx onnx-int8]
+                                    [--batch-sizes 1 8 32 128] [--texts 512]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from pypdf import PdfReader
+
+from benchmarks.fakes import sentences
+
+from app.config import EMBEDDING_MODEL
+from app.rag.embeddings import BACKENDS, REFERENCE_BACKEND, load_model, parity
+
+
+def corpus(pdf: str, count: int) -> list:
+    texts = []
+    if os.path.exists(pdf):
+        for page in PdfReader(pdf).pages:
+            texts.extend(s.strip() for s in (page.extract_text() or "").split(". ") if len(s.split()) >= 5)
+            if len(texts) >= count:
+                break
+    if len(texts) < count:
+        texts.extend(sentences(0, count - len(texts), words=20))
+    return texts[:count]
+
+
+def throughput(model, texts: list, batch_size: int, repeat: int) -> dict:
+    model.encode(texts[:batch_size], batch_size=batch_size, convert_to_numpy=True)  # warm-up
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for start in range(0, len(texts), batch_size):
+            model.encode(texts[start:start + batch_size], batch_size=batch_size, convert_to_numpy=True)
+        runs.append(time.perf_counter() - started)
+    seconds = float(np.median(runs))
+    return {
+        "texts_per_second": len(texts) / seconds if seconds else 0.0,
+        "ms_per_batch": seconds / -(-len(texts) // batch_size) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pdf", default="sample.pdf")
+    args = parser.parse_args()
+
+    texts = corpus(args.pdf, args.texts)
+    started = time.perf_counter()
+    reference = load_model(args.model, REFERENCE_BACKEND)
+    reference_seconds = time.perf_counter() - started
+    report = {"model": args.model, "texts": len(texts), "backends": {}}
+    for backend in args.backends:
+        started = time.perf_counter()
+        try:
+            model = reference if backend == REFERENCE_BACKEND else load_model(args.model, backend)
+        except Exception as e:
+            report["backends"][backend] = {"error": str(e)}
+            continue
+        load_seconds = reference_seconds if backend == REFERENCE_BACKEND else time.perf_counter() - started
+        result = {"load_seconds": load_seconds, "parity": parity(model, reference)}
+        result["batch_sizes"] = {
+            str(size): throughput(model, texts, size, args.repeat) for size in args.batch_sizes
+        }
+        report["backends"][backend] = result
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Deterministic, network-free stand-ins for the external services.
+
+- FakeLLMBackend: an LLMBackend that sleeps for a configurable latency
+  (with time-to-first-chunk for streaming) and returns seeded text.
+- FakeTTSClient: the `text_to_speech.convert` surface of the ElevenLabs
+  sync and async clients, yielding bytes after a configurable delay.
+- HashEmbedder: a SentenceTransformer-shaped model that hashes words into a
+  fixed-size vector, so retrieval still favours chunks sharing words.
+- LocalStore (app.rag.local_store) stands in for Qdrant.
+
+install() wires them into the app in place of the real clients.
+"""
+import asyncio
+import random
+import time
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+from app.rag import embeddings, vectorstore
+from app.rag.cache import retrieval_cache
+from app.rag.local_store import LocalStore
+from app.services import llm, tts
+from app.services.audio_cache import audio_cache
+
+WORDS = (
+    "reactor energy model system data signal layer network memory process value result "
+    "structure method theory change pressure field measure control sample effect source "
+    "protein market policy language channel surface pattern volume current order cycle"
+).split()
+
+
+def sentences(seed: int, count: int, words: int = 12) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+class Latency:
+    """A fixed delay plus optional seeded jitter (fraction of the delay)."""
+
+    def __init__(self, seconds: float, jitter: float = 0.0, seed: int = 0):
+        self.seconds = seconds
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def sample(self, fraction: float = 1.0) -> float:
+        base = self.seconds * fraction
+        return max(0.0, base * (1 + self._rng.uniform(-self.jitter, self.jitter)))
+
+
+class FakeLLMBackend(llm.LLMBackend):
+    name = "fake"
+
+    def __init__(self, latency: float = 0.4, ttft: float = 0.15, jitter: float = 0.0,
+                 sentences_per_answer: int = 4):
+        self.latency = Latency(latency, jitter, seed=1)
+        self.ttft = min(ttft, latency)
+        self.sentences_per_answer = sentences_per_answer
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def _text(self, prompt: str) -> List[str]:
+        # Unique per call, so no downstream cache turns a benchmark run into lookups
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        return sentences(zlib.crc32(prompt.encode()) + self.calls, self.sentences_per_answer)
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        time.sleep(self.latency.sample())
+        return " ".join(self._text(prompt))
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        await asyncio.sleep(self.latency.sample())
+        return " ".join(self._text(prompt))
+
+    async def astream(self, prompt: str, timeout: float):
+        parts = self._text(prompt)
+        total = self.latency.sample()
+        first = total * self.ttft / (self.latency.seconds or 1.0)
+        await asyncio.sleep(first)
+        for i, part in enumerate(parts):
+            if i:
+                await asyncio.sleep((total - first) / max(1, len(parts) - 1))
+            yield part + " "
+
+
+class _FakeSpeech:
+    def __init__(self, first_byte: float, bytes_per_char: int, chunks: int, jitter: float):
+        self.first_byte = Latency(first_byte, jitter, seed=2)
+        self.bytes_per_char = bytes_per_char
+        self.chunks = max(1, chunks)
+        self.calls = 0
+        self.characters = 0
+
+    def _audio(self, text: str) -> List[bytes]:
+        self.calls += 1
+        self.characters += len(text)
+        size = max(self.chunks, len(text) * self.bytes_per_char)
+        step = -(-size // self.chunks)
+        return [b"\xff" * min(step, size - start) for start in range(0, size, step)]
+
+
+class _SyncSpeech(_FakeSpeech):
+    def convert(self, voice_id, text, model_id=None, output_format=None):
+        time.sleep(self.first_byte.sample())
+        yield from self._audio(text)
+
+
+class _AsyncSpeech(_FakeSpeech):
+    async def convert(self, voice_id, text, model_id=None, output_format=None):
+        await asyncio.sleep(self.first_byte.sample())
+        for chunk in self._audio(text):
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeTTSClient:
+    """Either ElevenLabs client, reduced to `text_to_speech.convert`."""
+
+    def __init__(self, first_byte: float = 0.25, bytes_per_char: int = 16, chunks: int = 4,
+                 jitter: float = 0.0, asynchronous: bool = True):
+        speech = _AsyncSpeech if asynchronous else _SyncSpeech
+        self.text_to_speech = speech(first_byte, bytes_per_char, chunks, jitter)
+
+
+class HashEmbedder:
+    """Bag-of-words feature hashing into `dim` signed buckets, L2-normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                h = zlib.crc32(word.encode())
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def install(
+    llm_latency: float = 0.4,
+    llm_ttft: float = 0.15,
+    tts_latency: float = 0.25,
+    jitter: float = 0.0,
+    embedder: str = "hash",
+    store_dir: Optional[str] = None,
+) -> dict:
+    """
+    Point the app at the fakes: LLM gateway, both TTS clients, the embedding
+    engine ("hash", or "model" for the real SentenceTransformer if it is
+    available locally) and a LocalStore in `store_dir` (in memory if None).
+    The audio cache is disabled so every clip pays synthesis latency.
+    Returns the fakes, for their call counters.
+    """
+    backend = FakeLLMBackend(llm_latency, llm_ttft, jitter)
+    llm.register_backend(llm.LLM_BACKEND, lambda: backend)
+    tts.client = FakeTTSClient(tts_latency, jitter=jitter, asynchronous=False)
+    tts.async_client = FakeTTSClient(tts_latency, jitter=jitter)
+    audio_cache.enabled = False
+    if embedder == "hash":
+        embeddings._engine = embeddings.EmbeddingEngine(model_name="hash", model=HashEmbedder())
+    elif embedder != "model":
+        raise ValueError(f"Unknown embedder: {embedder}")
+    use_store(LocalStore(store_dir))
+    return {"llm": backend, "tts": tts.async_client, "tts_sync": tts.client}
+
+
+def use_store(store):
+    vectorstore._store = store
+    # Results cached against the previous store must not leak into the next
+    retrieval_cache.clear()
@@ -0,0 +1,94 @@
+"""
+RAM and recall@k of each collection profile.
+
+Random unit vectors are indexed once per profile, and a batch of queries is
+compared against exact brute-force top-k. The local backend always runs;
+Qdrant profiles are included with --qdrant-url (collections `bench_<profile>`
+are dropped afterwards).
+
+RAM for the local backend is what the store keeps resident: int8 codes when
+quantized, otherwise the float32 matrix, which a full scan pages in entirely.
+For Qdrant it is CollectionProfile.estimate_ram() (vectors, codes and HNSW
+links; payloads excluded).
+
+    python -m benchmarks.profiles [--points 100000] [--dim 384] [--top-k 10]
+"""
+import argparse
+import json
+import time
+import uuid
+
+import numpy as np
+
+from app.rag.local_store import LocalStore
+from app.rag.profiles import PROFILES
+from app.rag.vectorstore import QdrantStore
+
+
+def evaluate(store, collection, vectors, queries, truth, top_k):
+    ids = [str(uuid.UUID(int=i)) for i in range(len(vectors))]
+    store.ensure_collection(collection, vectors.shape[1])
+    started = time.perf_counter()
+    for start in range(0, len(vectors), 1000):
+        store.upsert(collection, ids[start:start + 1000], vectors[start:start + 1000],
+                     [{} for _ in range(min(1000, len(vectors) - start))])
+    index_seconds = time.perf_counter() - started
+
+    position = {pid: i for i, pid in enumerate(ids)}
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        hits = store.search(collection, query, top_k)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len({position[h.id] for h in hits} & set(expected)) / top_k)
+    return {
+        "index_seconds": index_seconds,
+        f"recall_at_{top_k}": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--qdrant-url")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.points, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+
+    report = {"points": args.points, "dim": args.dim, "top_k": args.top_k, "local": {}, "qdrant": {}}
+    for name, profile in PROFILES.items():
+        store = LocalStore(None, profile)
+        result = evaluate(store, "bench", vectors, queries, truth, args.top_k)
+        coll = store._get("bench")
+        rows = coll.size
+        result["ram_bytes"] = int(coll.codes[:rows].nbytes if coll.codes is not None else coll.vectors[:rows].nbytes)
+        report["local"][name] = result
+
+    if args.qdrant_url:
+        from qdrant_client import QdrantClient
+
+        client = QdrantClient(url=args.qdrant_url)
+        for name, profile in PROFILES.items():
+            collection = f"bench_{name}"
+            client.delete_collection(collection)
+            try:
+                result = evaluate(QdrantStore(client, profile=profile), collection, vectors, queries, truth, args.top_k)
+            finally:
+                client.delete_collection(collection)
+            result["ram_bytes_estimate"] = profile.estimate_ram(args.points, args.dim)
+            report["qdrant"][name] = result
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Query latency of the vector-store backends against collection size.
+
+Random unit vectors are appended to a fresh collection in steps; after each
+step a batch of single-vector top-k queries is timed. The local backend runs
+against a temporary directory (memory-mapped, as in production); Qdrant is
+included with --qdrant-url.
+
+    python -m benchmarks.vectorstore [--sizes 1000 10000 100000] [--dim 384]
+"""
+import argparse
+import json
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from app.rag.local_store import LocalStore
+from app.rag.vectorstore import QdrantStore
+
+COLLECTION = "bench"
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q) * 1000) if samples else 0.0
+
+
+def measure(store, sizes, dim, queries, top_k, batch=1000):
+    rng = np.random.default_rng(0)
+    store.ensure_collection(COLLECTION, dim)
+    results = []
+    size = 0
+    for target in sizes:
+        started = time.perf_counter()
+        while size < target:
+            n = min(batch, target - size)
+            store.upsert(
+                COLLECTION,
+                [str(uuid.UUID(int=i)) for i in range(size, size + n)],
+                rng.normal(size=(n, dim)).astype(np.float32),
+                [{"text": f"chunk {i}"} for i in range(size, size + n)],
+            )
+            size += n
+        append_seconds = time.perf_counter() - started
+
+        samples = []
+        for query in rng.normal(size=(queries, dim)).astype(np.float32):
+            started = time.perf_counter()
+            store.search(COLLECTION, query, top_k)
+            samples.append(time.perf_counter() - started)
+        results.append({
+            "size": size,
+            "append_seconds": append_seconds,
+            "p50_ms": percentile(samples, 50),
+            "p99_ms": percentile(samples, 99),
+            "qps": queries / sum(samples),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--qdrant-url", help="also benchmark a Qdrant server (collection 'bench' is dropped)")
+    args = parser.parse_args()
+    sizes = sorted(args.sizes)
+
+    report = {"dim": args.dim, "top_k": args.top_k, "backends": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        report["backends"]["local"] = measure(LocalStore(directory), sizes, args.dim, args.queries, args.top_k)
+
+    if args.qdrant_url:
+        from qdrant_client import QdrantClient
+
+        client = QdrantClient(url=args.qdrant_url)
+        client.delete_collection(COLLECTION)
+        try:
+            report["backends"]["qdrant"] = measure(QdrantStore(client), sizes, args.dim, args.queries, args.top_k)
+        finally:
+            client.delete_collection(COLLECTION)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
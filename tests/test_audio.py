@@ -0,0 +1,106 @@
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import audio
+from app.services.audio_cache import AudioCache, audio_key
+
+
+def make_client(tmp_path, monkeypatch):
+    cache = AudioCache(str(tmp_path), max_bytes=1024)
+    monkeypatch.setattr(audio, "audio_cache", cache)
+    app = FastAPI()
+    app.include_router(audio.router, prefix="/audio")
+    return TestClient(app), cache
+
+
+def test_serves_cached_audio_with_ranges(tmp_path, monkeypatch):
+    client, cache = make_client(tmp_path, monkeypatch)
+    key = audio_key("hello", "voice", "model", "mp3_44100_128")
+    cache.put(key, bytes(range(100)))
+
+    full = client.get(f"/audio/{key}")
+    assert full.status_code == 200
+    assert full.content == bytes(range(100))
+
+    partial = client.get(f"/audio/{key}", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(10, 20))
+    assert partial.headers["content-range"] == "bytes 10-19/100"
+
+    suffix = client.get(f"/audio/{key}", headers={"Range": "bytes=-5"})
+    assert suffix.content == bytes(range(95, 100))
+
+    assert client.get(f"/audio/{key}", headers={"Range": "bytes=200-"}).status_code == 416
+    assert client.get("/audio/" + "0" * 64).status_code == 404
+
+
+def test_clip_evicted_while_serving_is_still_served_whole(tmp_path, monkeypatch):
+    client, cache = make_client(tmp_path, monkeypatch)
+    key = audio_key("hello", "voice", "model", "mp3_44100_128")
+    cache.put(key, bytes(range(100)))
+    opened = cache.open
+
+    def open_then_evict(key):
+        f = opened(key)
+        cache.path(key).unlink()
+        return f
+
+    monkeypatch.setattr(cache, "open", open_then_evict)
+    assert client.get(f"/audio/{key}").content == bytes(range(100))
+    cache.put(key, bytes(range(100)))
+    assert client.get(f"/audio/{key}", headers={"Range": "bytes=90-"}).content == bytes(range(90, 100))
+
+    # Evicted between the lookup and the open: a miss, not a 500
+    monkeypatch.setattr(cache, "get", cache.path)
+    monkeypatch.setattr(cache, "open", opened)
+    assert client.get(f"/audio/{key}").status_code == 404
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    keys = [audio_key(str(i), "v", "m", "f") for i in range(3)]
+    cache.put(keys[0], b"a" * 100)
+    cache.put(keys[1], b"b" * 100)
+    os.utime(cache.path(keys[1]), (time.time() - 10, time.time() - 10))
+    cache.put(keys[2], b"c" * 100)
+
+    assert cache.get(keys[1]) is None
+    assert cache.read(keys[0]) == b"a" * 100
+    assert cache.read(keys[2]) == b"c" * 100
+
+
+def test_combined_podcast_binary_and_url_modes(tmp_path, monkeypatch):
+    from types import SimpleNamespace
+
+    from app.api import conversation
+    from app.services import tts
+
+    async def fake_turn(topic, scope=None):
+        return {"curious": "q", "explainer": "a", "answer": "a"}
+
+    async def convert(voice_id, text, model_id, output_format):
+        for _ in range(3):
+            yield text.encode() * 10
+
+    cache = AudioCache(str(tmp_path), max_bytes=10_000)
+    monkeypatch.setattr(tts, "audio_cache", cache)
+    monkeypatch.setattr(conversation, "audio_cache", cache)
+    monkeypatch.setattr(audio, "audio_cache", cache)
+    monkeypatch.setattr(tts, "async_client", SimpleNamespace(text_to_speech=SimpleNamespace(convert=convert)))
+    monkeypatch.setattr(conversation, "arun_podcast_turn", fake_turn)
+
+    app = FastAPI()
+    app.include_router(conversation.router, prefix="/conversation")
+    app.include_router(audio.router, prefix="/audio")
+    client = TestClient(app)
+
+    binary = client.post("/conversation/podcast/audio/combined", json={"audio_format": "binary"})
+    assert binary.headers["content-type"] == "audio/mpeg"
+    assert binary.content == b"q" * 30 + b"a" * 30
+
+    urls = client.post("/conversation/podcast/audio", json={"audio_format": "url"}).json()
+    assert client.get(urls["curious_audio_url"]).content == b"q" * 30
+    assert client.get(urls["explainer_audio_url"]).content == b"a" * 30
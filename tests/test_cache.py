@@ -0,0 +1,85 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.rag import retriever
+from app.rag.cache import TTLCache, invalidate_collection, retrieval_cache
+from app.rag.vectorstore import Hit
+from app.services.semantic_cache import SemanticCache
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.evictions == 1
+
+
+def test_ttl_cache_expiry():
+    cache = TTLCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_retrieve_cached_until_collection_changes(monkeypatch):
+    calls = []
+
+    def search(collection, vector, top_k, match=None, with_vectors=False):
+        calls.append((collection, vector, top_k))
+        return [Hit(str(len(calls)), 0.9, {"text": f"chunk {len(calls)}"})]
+
+    retrieval_cache.clear()
+    store = SimpleNamespace(search=search)
+    monkeypatch.setattr(retriever, "get_store", lambda: store)
+    monkeypatch.setattr(retriever, "embed_query", lambda text: [0.1, 0.2])
+
+    assert retriever.retrieve("overview") == [("chunk 1", 0.9)]
+    assert retriever.retrieve("overview") == [("chunk 1", 0.9)]
+    assert len(calls) == 1
+
+    invalidate_collection(retriever.COLLECTION)
+    assert retriever.retrieve("overview") == [("chunk 2", 0.9)]
+    assert len(calls) == 2
+
+
+def test_semantic_cache_scoped_by_document_and_context():
+    cache = SemanticCache(threshold=0.9, maxsize=10, ttl=60, enabled=True)
+    cache.store("doc-a", "ctx", [1.0, 0.0], "answer a")
+
+    assert cache.lookup("doc-a", "ctx", [0.99, 0.05]) == "answer a"
+    assert cache.lookup("doc-a", "ctx", [0.0, 1.0]) is None
+    assert cache.lookup("doc-b", "ctx", [1.0, 0.0]) is None
+    assert cache.lookup("doc-a", "other", [1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_retrieval_embeds_and_searches_once(monkeypatch):
+    encodes, searches = [], []
+
+    async def aembed_queries(texts):
+        encodes.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    async def asearch_batch(collection, vectors, top_k, match=None, with_vectors=False):
+        searches.append(len(vectors))
+        return [[Hit(str(v[0]), 0.9, {"text": f"chunk {v[0]:.0f}"})] for v in vectors]
+
+    retrieval_cache.clear()
+    monkeypatch.setattr(retriever, "aembed_queries", aembed_queries)
+    monkeypatch.setattr(retriever, "get_store", lambda: SimpleNamespace(asearch_batch=asearch_batch))
+
+    results = await retriever.aretrieve_passages_batch(["a", "bbb", "a", "cc"])
+    assert [[p.text for p in r] for r in results] == [["chunk 1"], ["chunk 3"], ["chunk 1"], ["chunk 2"]]
+    assert encodes == [["a", "bbb", "cc"]] and searches == [3]
+
+    # Cached queries are not embedded or searched again
+    await retriever.aretrieve_passages_batch(["bbb", "dddd"])
+    assert encodes[-1] == ["dddd"] and searches[-1] == 1
@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.rag.context import Passage, build_context, compact, merge_overlapping, mmr, pack
+from app.rag.local_store import LocalStore
+
+
+def test_overlapping_chunks_are_merged_once():
+    text = "".join(f"Sentence number {i} of the document. " for i in range(30))
+    a = Passage(text[0:400], 0.8, {"doc_id": "d", "start": 0, "end": 400})
+    b = Passage(text[300:700], 0.9, {"doc_id": "d", "start": 300, "end": 700})
+    far = Passage(text[900:1000], 0.5, {"doc_id": "d", "start": 900, "end": 1000})
+    other_doc = Passage(text[350:450], 0.7, {"doc_id": "e", "start": 350, "end": 450})
+
+    merged = merge_overlapping([a, far, b, other_doc])
+    assert [p.score for p in merged] == [0.9, 0.7, 0.5]
+    assert merged[0].text == text[0:700]
+    assert merged[0].payload["end"] == 700
+
+    # Without offsets, visible text overlap is enough
+    loose = merge_overlapping([Passage(text[0:400], 0.8), Passage(text[300:700], 0.6)])
+    assert [p.text for p in loose] == [text[0:700]]
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [0.999, 0.01], [0.6, 0.8]], dtype=np.float32)
+    order = mmr(np.array([0.9, 0.89, 0.7]), vectors, k=3, diversity=0.7, duplicate=0.95)
+    assert order == [0, 2]
+
+
+def test_pack_respects_token_budget():
+    passages = [Passage("a " * 50, 0.9), Passage("b " * 50, 0.8), Passage("c " * 5, 0.7)]
+    packed = pack(passages, max_tokens=80)
+    assert [p.text[0] for p in packed] == ["a", "c"]
+    # The best passage is kept even when it alone exceeds the budget
+    assert len(pack(passages, max_tokens=10)) == 1
+
+
+def test_compacted_context_uses_fewer_tokens():
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=8).astype(np.float32)
+    duplicate = base + rng.normal(scale=0.01, size=8).astype(np.float32)
+    distinct = rng.normal(size=8).astype(np.float32)
+    passages = [
+        Passage("The reactor core is cooled by water. " * 5, 0.9, vector=base),
+        Passage("The reactor core is cooled by water! " * 5, 0.88, vector=duplicate),
+        Passage("Control rods absorb neutrons. " * 5, 0.7, vector=distinct),
+    ]
+    context = build_context(passages, max_tokens=1000)
+    assert "water!" not in context and "Control rods" in context
+    assert [p.score for p in compact(passages)] == [0.9, 0.7]
+
+
+def test_local_store_returns_vectors_on_request():
+    store = LocalStore(None)
+    store.ensure_collection("docs", 2)
+    store.upsert("docs", ["00000000-0000-0000-0000-000000000001"], np.array([[3.0, 4.0]]), [{"text": "x"}])
+    assert store.search("docs", [1.0, 0.0], 1)[0].vector is None
+    assert np.allclose(store.search("docs", [1.0, 0.0], 1, with_vectors=True)[0].vector, [0.6, 0.8])
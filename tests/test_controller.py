@@ -0,0 +1,256 @@
+import asyncio
+
+import pytest
+
+from app.agents import controller
+from app.rag.context import Passage
+
+
+@pytest.mark.asyncio
+async def test_async_podcast_turns_run_concurrently(monkeypatch):
+    running, peak = [0], [0]
+    all_in = asyncio.Event()
+
+    async def fake_retrieve(query, top_k=5, scope=None):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        if peak[0] == 100:
+            all_in.set()
+        await asyncio.wait_for(all_in.wait(), 5)
+        running[0] -= 1
+        return [Passage("chunk", 0.9)]
+
+    async def fake_llm(prompt, stage="llm"):
+        await asyncio.sleep(0)
+        return "text"
+
+    monkeypatch.setattr(controller, "aretrieve_passages", fake_retrieve)
+    monkeypatch.setattr(controller, "acall_gemini", fake_llm)
+
+    # Distinct topics, so single-flight does not fold the turns into one
+    turns = await asyncio.gather(*(controller.arun_podcast_turn(f"topic {i}") for i in range(100)))
+
+    assert all(turn["curious"] == "text" for turn in turns)
+    assert peak[0] == 100
+
+
+@pytest.mark.asyncio
+async def test_streamed_turn_speaks_sentences_in_order(monkeypatch):
+    from app.services import streaming
+
+    async def fake_retrieve(query, top_k=5, scope=None):
+        return [Passage("chunk", 0.9)]
+
+    async def fake_stream(prompt, stage="llm"):
+        role = "Q" if "CURIOUS" in prompt else "A"
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield f"{role}{i} is a sentence that is long enough to speak. "
+
+    async def fake_tts(text, voice):
+        # Later sentences finish first; output must still follow speaking order.
+        await asyncio.sleep(0.05 if text.endswith("0 is a sentence that is long enough to speak.") else 0.01)
+        yield text[:2].encode()
+
+    monkeypatch.setattr(controller, "aretrieve_passages", fake_retrieve)
+    monkeypatch.setattr(controller, "astream_gemini", fake_stream)
+    monkeypatch.setattr(streaming, "atext_to_speech_stream", fake_tts)
+
+    audio = [chunk async for chunk in controller.astream_podcast_turn("overview")]
+    assert audio == [b"Q0", b"Q1", b"Q2", b"A0", b"A1", b"A2"]
+
+
+@pytest.mark.asyncio
+async def test_episode_retrieves_once_and_overlaps_tts(monkeypatch):
+    from app.agents import episode
+
+    retrieved, prompts = [], []
+
+    async def fake_retrieve(query, top_k=5, scope=None):
+        retrieved.append(query)
+        return [Passage(f"{query} chunk", 0.9)]
+
+    async def fake_llm(prompt, stage="llm"):
+        prompts.append(prompt)
+        await asyncio.sleep(0.02)
+        return f"line {len(prompts)}"
+
+    async def fake_tts(text, voice):
+        await asyncio.sleep(0.05)
+        return f"audio:{text}"
+
+    monkeypatch.setattr(episode, "aretrieve_passages", fake_retrieve)
+    monkeypatch.setattr(episode, "acall_gemini", fake_llm)
+    monkeypatch.setattr(episode, "atext_to_speech", fake_tts)
+
+    engine = episode.EpisodeEngine("overview", num_turns=4, subtopics=["a", "b"], audio="base64")
+    result = await engine.run()
+
+    assert sorted(retrieved) == ["a", "b"]
+    turns = result["turns"]
+    assert [t["turn"] for t in turns] == [1, 2, 3, 4]
+    assert [t["topic"] for t in turns] == ["a", "a", "b", "b"]
+    assert all(t["curious_audio"] == f"audio:{t['curious']}" for t in turns)
+    assert all(t["explainer_audio"] == f"audio:{t['explainer']}" for t in turns)
+    # Later turns see what was already said
+    assert "line 1" in prompts[2] and "line 2" in prompts[3]
+    # TTS ran alongside text generation instead of after it
+    timings = result["timings"]
+    assert timings["overlap"] > 0.1
+    assert timings["wall"] < sum(timings["stages"].values())
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_heartbeats_and_cancels_producer_on_close():
+    from app.services.streaming import sse_stream
+
+    cleaned_up = asyncio.Event()
+
+    async def producer():
+        try:
+            yield {"type": "turn", "turn": 1}
+            await asyncio.sleep(0.05)
+            yield {"type": "turn", "turn": 2}
+            await asyncio.sleep(10)
+            yield {"type": "done"}
+        finally:
+            cleaned_up.set()
+
+    stream = sse_stream(producer(), heartbeat=0.01)
+    received = [await stream.__anext__() for _ in range(3)]
+    assert received[0].startswith("event: turn\ndata: ")
+    assert ": keep-alive\n\n" in received
+
+    # Client goes away while the producer is still working on the next event
+    await stream.aclose()
+    assert cleaned_up.is_set()
+
+
+def test_episode_streams_over_sse_and_websocket(monkeypatch):
+    import json
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.agents import episode
+    from app.api import conversation
+
+    async def fake_retrieve(query, top_k=5, scope=None):
+        return [Passage("chunk", 0.9)]
+
+    async def fake_llm(prompt, stage="llm"):
+        return "CURIOUS line" if "CURIOUS" in prompt else "EXPLAINER line"
+
+    async def fake_tts(text, voice):
+        return "clip"
+
+    monkeypatch.setattr(episode, "aretrieve_passages", fake_retrieve)
+    monkeypatch.setattr(episode, "acall_gemini", fake_llm)
+    monkeypatch.setattr(episode, "atext_to_speech", fake_tts)
+
+    app = FastAPI()
+    app.include_router(conversation.router, prefix="/conversation")
+    client = TestClient(app)
+
+    response = client.post("/conversation/episode/stream", json={"num_turns": 2})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events].count("audio") == 4
+    assert [e["turn"] for e in events if e["type"] == "turn"] == [1, 2]
+    assert events[-1]["type"] == "done"
+
+    with client.websocket_connect("/conversation/episode/ws") as ws:
+        ws.send_json({"num_turns": 1})
+        types = []
+        while not types or types[-1] != "done":
+            types.append(ws.receive_json()["type"])
+    assert types[0] == "turn" and types.count("audio") == 2
+
+    assert client.post("/conversation/episode/stream", json={"audio_format": "binary"}).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_identical_turns_share_one_computation(monkeypatch):
+    calls = []
+
+    async def fake_retrieve(query, top_k=5, scope=None):
+        calls.append(query)
+        await asyncio.sleep(0.05)
+        return [Passage("chunk", 0.9)]
+
+    async def fake_llm(prompt, stage="llm"):
+        await asyncio.sleep(0.01)
+        return "text"
+
+    monkeypatch.setattr(controller, "aretrieve_passages", fake_retrieve)
+    monkeypatch.setattr(controller, "acall_gemini", fake_llm)
+
+    turns = await asyncio.gather(
+        *(controller.arun_podcast_turn("popular") for _ in range(20)),
+        controller.arun_podcast_turn("other"),
+    )
+    assert sorted(calls) == ["other", "popular"]
+    assert all(turn["explainer"] == "text" for turn in turns)
+
+    # Once finished, the next request computes afresh
+    await controller.arun_podcast_turn("popular")
+    assert calls.count("popular") == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_one_caller_cancelling():
+    from app.services.admission import SingleFlight
+
+    flights = SingleFlight()
+    started = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flights.do("k", work))
+    second = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
+    assert started == [1]
+
+    # With every caller gone the computation itself is cancelled
+    lone = asyncio.create_task(flights.do("k", work))
+    await asyncio.sleep(0.01)
+    lone.cancel()
+    await asyncio.sleep(0)
+    assert flights.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_questions_keep_order_and_isolate_failures(monkeypatch):
+    from app.services.admission import Overloaded
+
+    batches, running, peak = [], [0], [0]
+
+    async def fake_batch(queries, top_k=5, scope=None):
+        batches.append(list(queries))
+        return [[Passage(f"about {q}", 0.9)] for q in queries]
+
+    async def fake_llm(prompt, stage="llm"):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01 if "q3" not in prompt else 0.03)
+        running[0] -= 1
+        if "q5" in prompt:
+            raise Overloaded("llm is saturated")
+        return prompt.split("about ")[1].split()[0]
+
+    monkeypatch.setattr(controller, "aretrieve_passages_batch", fake_batch)
+    monkeypatch.setattr(controller, "acall_gemini", fake_llm)
+
+    questions = [f"q{i}" for i in range(8)] + [""]
+    answers = await controller.arun_user_questions(questions, max_concurrency=3)
+
+    assert batches == [questions[:-1]]
+    assert [a["user_question"] for a in answers] == questions
+    assert answers[3]["answer"] == "q3"
+    assert "saturated" in answers[5]["error"] and "error" in answers[8]
+    assert peak[0] == 3
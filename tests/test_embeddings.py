@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.rag import embeddings
+from app.rag.embeddings import EmbeddingEngine
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.calls.append(len(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+
+def test_embed_query_returns_vector():
+    engine = EmbeddingEngine(model=FakeModel())
+    assert engine.embed_query("abc") == [3.0, 1.0]
+
+
+def test_concurrent_queries_share_batches():
+    model = FakeModel()
+    engine = EmbeddingEngine(model=model, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(i):
+        results[i] = engine.embed_query("x" * i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(1, 17)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(results[i] == [float(i), 1.0] for i in range(1, 17))
+    assert max(model.calls) <= 8
+    stats = engine.stats()
+    assert stats["requests"] == 16
+    assert stats["batches"] < 16
+
+
+class ScaledModel(FakeModel):
+    """FakeModel with its second component scaled: same direction as FakeModel iff scale == 1."""
+
+    def __init__(self, scale):
+        super().__init__()
+        self.scale = scale
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        return super().encode(texts, batch_size, convert_to_numpy) * np.array([1.0, self.scale], dtype=np.float32)
+
+
+def test_parity_is_row_wise_cosine():
+    result = embeddings.parity(ScaledModel(1.0), FakeModel(), ["ab", "abcd"])
+    assert result["min_cosine"] == pytest.approx(1.0)
+    assert embeddings.parity(ScaledModel(-1.0), FakeModel(), ["a"])["min_cosine"] == pytest.approx(0.0)
+
+
+def test_check_parity_rejects_drifted_backend():
+    with pytest.raises(embeddings.EmbeddingParityError):
+        embeddings.check_parity(ScaledModel(3.0), FakeModel(), min_cosine=0.99)
+
+
+def test_non_reference_backend_is_checked_on_load(monkeypatch):
+    monkeypatch.setitem(embeddings.BACKENDS, "torch", lambda name: FakeModel())
+    monkeypatch.setitem(embeddings.BACKENDS, "fast", lambda name: ScaledModel(1.01))
+    monkeypatch.setitem(embeddings.BACKENDS, "broken", lambda name: ScaledModel(5.0))
+
+    engine = EmbeddingEngine(model_name="m", backend="fast")
+    assert engine.embed_texts(["abc"])[0][0] == 3.0
+    assert engine.stats()["parity"]["min_cosine"] > 0.99
+
+    with pytest.raises(embeddings.EmbeddingParityError):
+        EmbeddingEngine(model_name="m", backend="broken").embed_texts(["abc"])
+
+    with pytest.raises(ValueError):
+        EmbeddingEngine(model_name="m", backend="unknown").embed_texts(["abc"])
+
+
+def test_torch_int8_backend_matches_reference(tmp_path):
+    # A tiny random BERT saved locally stands in for all-MiniLM-L6-v2 (no network here)
+    transformers = pytest.importorskip("transformers")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + [chr(c) for c in range(ord("a"), ord("z") + 1)]
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab))
+    transformers.BertTokenizerFast(str(tmp_path / "vocab.txt")).save_pretrained(tmp_path)
+    config = transformers.BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64, max_position_embeddings=512)
+    transformers.BertModel(config).save_pretrained(tmp_path)
+
+    import torch
+
+    quantized = embeddings.load_model(str(tmp_path), "torch-int8")
+    assert not any(type(m) is torch.nn.Linear for m in quantized.modules())
+    embeddings.check_parity(quantized, embeddings.load_model(str(tmp_path), "torch"))
+
+
+def test_cancelled_query_does_not_stop_the_batcher():
+    class SlowModel(FakeModel):
+        def encode(self, texts, batch_size=32, convert_to_numpy=True):
+            time.sleep(0.05)
+            return super().encode(texts, batch_size, convert_to_numpy)
+
+    engine = EmbeddingEngine(model=SlowModel(), max_wait_ms=1)
+
+    async def main():
+        first = asyncio.ensure_future(engine.aembed_query("abc"))
+        await asyncio.sleep(0)
+        first.cancel()
+        queued = asyncio.ensure_future(engine.aembed_query("queued"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        return await asyncio.wait_for(engine.aembed_query("abcd"), 2)
+
+    assert asyncio.run(main()) == [4.0, 1.0]
+    assert engine._worker.is_alive()
+    assert engine.embed_query("ab", timeout=2) == [2.0, 1.0]
@@ -0,0 +1,262 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+
+from app.rag import ingest
+from app.rag.chunking import SentenceChunker, chunk_pages, chunk_text
+from app.rag.embeddings import EmbeddingEngine
+from app.rag.local_store import LocalStore
+from app.rag.vectorstore import QdrantStore
+
+SAMPLE_PDF = Path(__file__).parent.parent / "sample.pdf"
+
+
+class FakeModel:
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        return np.array([[len(t) % 7 + 1.0, 1.0, 0.5] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+
+class CountingModel(FakeModel):
+    encoded = 0
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        self.encoded += len(texts)
+        return super().encode(texts, batch_size, convert_to_numpy)
+
+
+@pytest.fixture(params=["qdrant", "local"])
+def store(request, monkeypatch):
+    store = QdrantStore(QdrantClient(":memory:")) if request.param == "qdrant" else LocalStore(None)
+    monkeypatch.setattr(ingest, "get_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def job_manager():
+    from app.rag.jobs import JobManager
+
+    manager = JobManager(max_jobs=1, process_workers=2, pages_per_task=1)
+    yield manager
+    # Join the job thread and the spawned extraction processes so none outlive the test
+    manager.shutdown(wait=True)
+
+
+def test_char_chunks_match_chunk_text_across_pages():
+    pages = ["a" * 730, "b" * 20, "c" * 910]
+    expected = chunk_text("\n".join(pages))
+    chunks = list(chunk_pages(iter(pages), _count_words, mode="chars"))
+    streamed = [c.text for c in chunks]
+    # chunk_text also emits a final chunk made only of overlap; the stream skips it
+    assert streamed == expected[:len(streamed)]
+    assert expected[-1] in streamed[-1]
+    assert [(c.page, c.page_end) for c in chunks] == [(1, 1), (1, 3), (3, 3), (3, 3)]
+
+
+def _paragraph(word, sentences=40):
+    return " ".join(f"The {word} sentence number {i} is here." for i in range(sentences)) + "\n"
+
+
+def _count_words(texts):
+    return [len(t.split()) for t in texts]
+
+
+def test_sentence_chunker_respects_budget_and_boundaries():
+    pages = [_paragraph("alpha"), _paragraph("beta", 5), "One. Two three four. Five six " + "word " * 30]
+    joined = "\n".join(pages)
+    chunks = list(SentenceChunker(_count_words, max_tokens=20, overlap_sentences=1).chunks(iter(pages)))
+
+    assert all(c.tokens <= 20 for c in chunks)
+    for c in chunks:
+        # Offsets and page numbers point back into the source document
+        assert joined[c.start:c.end].split() == c.text.split()
+        assert 1 <= c.page <= c.page_end <= len(pages)
+        if c.page == c.page_end == 1:
+            assert c.text.startswith("The alpha") and c.text.endswith(".")
+    # Consecutive chunks within a paragraph share one sentence...
+    assert chunks[1].text.split(". ")[0] in chunks[0].text
+    # ...but none straddles the paragraph break between pages 1 and 2
+    assert not any(c.page == 1 and c.page_end == 2 for c in chunks)
+    assert any("beta" in c.text and c.page == 2 for c in chunks)
+    # An over-budget sentence is split at word boundaries
+    assert chunks[-1].page == 3 and "word" in chunks[-1].text
+
+
+def test_sentence_chunker_bounds_text_without_boundaries():
+    text = _paragraph("alpha", 12) + "\n" + "word " * 500 + "done. " + _paragraph("beta", 12)
+    whole = list(SentenceChunker(_count_words, max_tokens=30, max_sentence_chars=60).chunks([text]))
+    # Cut at page-sized pieces, even inside boundaries, the scan finds the same sentences
+    pages = [text[i:i + 7] for i in range(0, len(text), 7)]
+    paged = list(SentenceChunker(_count_words, max_tokens=30, max_sentence_chars=60,
+                                 separator="").chunks(iter(pages)))
+    assert [c.text for c in paged] == [c.text for c in whole]
+    assert all(text[c.start:c.end].split() == c.text.split() for c in paged)
+    # The boundary-free run is broken at whitespace, never mid-word
+    run = [c for c in whole if c.text.startswith("word") and "beta" not in c.text]
+    assert len(run) > 1 and all(set(c.text.split()) <= {"word", "done."} for c in run)
+    assert any(c.text.startswith("The beta") for c in whole)
+
+
+def test_index_pdf_streams_batches(monkeypatch, store):
+    engine = EmbeddingEngine(model=FakeModel())
+    monkeypatch.setattr(ingest, "get_engine", lambda: engine)
+    progress = []
+
+    with open(SAMPLE_PDF, "rb") as f:
+        stats = ingest.index_pdf(f, batch_size=4, on_progress=lambda s: progress.append(s.chunks))
+
+    assert stats.pages > 0
+    assert stats.chunks == store.count(ingest.COLLECTION)
+    assert stats.batches == len(progress)
+    assert progress == sorted(progress)
+
+
+def test_background_job_extracts_in_processes(monkeypatch, tmp_path, job_manager):
+    import shutil
+    import time
+
+    store = LocalStore(None)
+    engine = EmbeddingEngine(model=FakeModel())
+    monkeypatch.setattr(ingest, "get_store", lambda: store)
+    monkeypatch.setattr(ingest, "get_engine", lambda: engine)
+
+    path = tmp_path / "upload.pdf"
+    shutil.copy(SAMPLE_PDF, path)
+    job = job_manager.submit(str(path), "sample.pdf")
+    deadline = time.time() + 60
+    while job.state not in ("done", "failed") and time.time() < deadline:
+        time.sleep(0.1)
+
+    status = job.as_dict()
+    assert status["state"] == "done", status["error"]
+    assert status["pages_processed"] == status["total_pages"]
+    assert status["chunks_indexed"] == store.count(ingest.COLLECTION)
+    assert not path.exists()
+
+
+def test_shut_down_manager_starts_no_new_pools(job_manager, tmp_path):
+    job_manager.shutdown()
+    with pytest.raises(RuntimeError):
+        job_manager.submit(str(tmp_path / "late.pdf"), "late.pdf")
+    # A job still running would fail here instead of leaking fresh pools
+    with pytest.raises(RuntimeError):
+        job_manager._pools()
+
+
+def test_upload_spools_to_disk_and_cleans_up_on_failure(monkeypatch):
+    import os
+    from types import SimpleNamespace
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api import upload
+
+    submitted = []
+
+    class Manager:
+        def submit(self, path, filename, tenant_id=None, doc_id=None):
+            submitted.append(path)
+            with open(path, "rb") as f:
+                assert f.read() == b"%PDF-" + b"x" * 3000
+            if doc_id == "bad":
+                raise RuntimeError("job manager is shut down")
+            return SimpleNamespace(as_dict=lambda: {"job_id": "j1", "filename": filename})
+
+    monkeypatch.setattr(upload, "job_manager", Manager())
+    monkeypatch.setattr(upload, "UPLOAD_CHUNK_SIZE", 1024)
+    app = FastAPI()
+    app.include_router(upload.router)
+    client = TestClient(app, raise_server_exceptions=False)
+
+    body = {"file": ("doc.pdf", b"%PDF-" + b"x" * 3000, "application/pdf")}
+    response = client.post("/upload", files=body)
+    assert response.status_code == 202
+    assert response.json() == {"job_id": "j1", "filename": "doc.pdf"}
+    os.unlink(submitted[0])
+
+    assert client.post("/upload", files=body, data={"doc_id": "bad"}).status_code == 500
+    assert not os.path.exists(submitted[1])
+
+
+def test_reingest_is_idempotent_and_incremental(monkeypatch, store):
+    model = CountingModel()
+    engine = EmbeddingEngine(model=model)
+    monkeypatch.setattr(ingest, "get_engine", lambda: engine)
+
+    first = ingest.index_pdf(str(SAMPLE_PDF))
+    encoded = model.encoded
+    again = ingest.index_pdf(str(SAMPLE_PDF))
+    assert again.unchanged
+    assert model.encoded == encoded
+    assert store.count(ingest.COLLECTION) == first.embedded
+
+    v1 = [_paragraph("alpha"), _paragraph("beta"), _paragraph("gamma")]
+    v2 = [_paragraph("alpha"), _paragraph("beta"), _paragraph("delta")]
+    ingest.index_pages(iter(v1), "doc", "v1")
+    before = model.encoded
+    stats = ingest.index_pages(iter(v2), "doc", "v2")
+    assert stats.reused > 0
+    assert model.encoded - before == stats.embedded < stats.chunks
+    assert stats.deleted > 0
+    texts = {p["text"] for p in store.payloads(ingest.COLLECTION, {"doc_id": "doc"})}
+    assert not any("gamma" in t for t in texts)
+    assert ingest.is_indexed("doc", "v2")
+
+
+def test_retrieval_is_scoped_by_document_and_tenant(monkeypatch):
+    from app.rag import retriever, vectorstore
+    from app.rag.cache import retrieval_cache
+    from app.rag.vectorstore import Scope
+
+    store = LocalStore(None)
+    engine = EmbeddingEngine(model=FakeModel())
+    monkeypatch.setattr(ingest, "get_store", lambda: store)
+    monkeypatch.setattr(ingest, "get_engine", lambda: engine)
+    monkeypatch.setattr(retriever, "get_store", lambda: store)
+    monkeypatch.setattr(retriever, "embed_query", lambda text: engine.embed_texts([text])[0])
+    monkeypatch.setattr(vectorstore, "TENANT_COLLECTIONS", {"big"})
+    retrieval_cache.clear()
+
+    ingest.index_pages(iter([_paragraph("alpha")]), "a", "v1", tenant_id="acme")
+    ingest.index_pages(iter([_paragraph("beta")]), "b", "v1", tenant_id="acme")
+    ingest.index_pages(iter([_paragraph("gamma")]), "c", "v1", tenant_id="big")
+
+    def texts(scope):
+        return " ".join(text for text, _ in retriever.retrieve("sentence", top_k=50, scope=scope))
+
+    assert "alpha" in texts(Scope("acme", "a")) and "beta" not in texts(Scope("acme", "a"))
+    assert "beta" in texts(Scope("acme")) and "gamma" not in texts(Scope("acme"))
+    assert "gamma" in texts(Scope("big")) and "alpha" not in texts(Scope("big"))
+    # Large tenants are routed to their own collection
+    assert store.count("docs", {"tenant_id": "big"}) == 0
+    assert store.count("docs_big") > 0
+
+    payload = store.payloads("docs", {"doc_id": "a"})[0]
+    assert payload["tenant_id"] == "acme" and payload["page"] == 1 and payload["end"] > payload["start"]
+    assert ingest.document_id("v1", "f.pdf", "acme") != ingest.document_id("v1", "f.pdf", "big")
+
+
+def test_same_name_different_files_are_different_documents():
+    assert ingest.document_id("v1" * 20) != ingest.document_id("v2" * 20)
+    assert ingest.document_id("v1" * 20, "report") == ingest.document_id("v2" * 20, "report") == "report"
+
+
+def test_reused_chunks_get_the_new_versions_payload(monkeypatch, store):
+    engine = EmbeddingEngine(model=CountingModel())
+    monkeypatch.setattr(ingest, "get_engine", lambda: engine)
+
+    # Short pages: one chunk each, so the alpha chunk is identical in both versions
+    ingest.index_pages(iter([_paragraph("alpha", 10)]), "doc", "v1")
+    before = {p["chunk_hash"]: p for p in store.payloads(ingest.COLLECTION, {"doc_id": "doc"}, limit=1000)}
+    stats = ingest.index_pages(iter([_paragraph("intro", 10), _paragraph("alpha", 10)]), "doc", "v2")
+    assert stats.reused > 0
+
+    after = store.payloads(ingest.COLLECTION, {"doc_id": "doc"}, limit=1000)
+    moved = [p for p in after if p["chunk_hash"] in before]
+    assert moved and all(p["page"] == 2 and p["doc_version"] == "v2" and p["doc_complete"] for p in moved)
+    assert all(p["start"] > before[p["chunk_hash"]]["start"] for p in moved)
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.admission import Overloaded
+from app.services.llm import LLMBackend, LLMError, LLMGateway
+
+
+class FlakyBackend(LLMBackend):
+    name = "flaky"
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.prompts = []
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        self.prompts.append(prompt)
+        if len(self.prompts) <= self.failures:
+            raise TimeoutError("slow")
+        return "ok"
+
+
+def test_gateway_sends_prompt_unchanged_and_retries():
+    backend = FlakyBackend(failures=2)
+    gateway = LLMGateway(backend, max_retries=2, backoff=0)
+    assert gateway.generate("built prompt") == "ok"
+    assert backend.prompts == ["built prompt"] * 3
+
+
+def test_gateway_gives_up_after_max_retries():
+    gateway = LLMGateway(FlakyBackend(failures=5), max_retries=1, backoff=0)
+    with pytest.raises(LLMError):
+        gateway.generate("prompt")
+
+
+class SlowBackend(LLMBackend):
+    name = "slow"
+
+    async def agenerate(self, prompt: str, timeout: float) -> str:
+        await asyncio.sleep(0.1)
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_gateway_rejects_when_queue_is_full():
+    gateway = LLMGateway(SlowBackend(), max_concurrency=2, max_queue=1, queue_timeout=5)
+    results = await asyncio.gather(*(gateway.agenerate("p") for _ in range(5)), return_exceptions=True)
+
+    assert results.count("ok") == 3
+    assert all(isinstance(r, Overloaded) for r in results if r != "ok")
+    assert gateway.admission.stats()["rejected"] == 2
+
+
+@pytest.mark.asyncio
+async def test_gateway_rejects_after_queue_timeout():
+    gateway = LLMGateway(SlowBackend(), max_concurrency=1, max_queue=4, queue_timeout=0.02)
+    results = await asyncio.gather(gateway.agenerate("a"), gateway.agenerate("b"), return_exceptions=True)
+    assert results[0] == "ok"
+    assert isinstance(results[1], Overloaded)
+
+
+class BlockingBackend(LLMBackend):
+    """Sync-only backend that ignores its timeout until `release` is set."""
+
+    name = "blocking"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(5)
+        with self.lock:
+            self.running -= 1
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_calls_share_one_limit():
+    backend = BlockingBackend()
+    gateway = LLMGateway(backend, max_concurrency=1, max_queue=4, queue_timeout=0.05)
+    sync_call = threading.Thread(target=gateway.generate, args=("sync",))
+    sync_call.start()
+    while gateway.admission.stats()["active"] == 0:
+        await asyncio.sleep(0.01)
+
+    with pytest.raises(Overloaded):
+        await gateway.agenerate("async")
+    backend.release.set()
+    sync_call.join()
+    assert await gateway.agenerate("async") == "ok"
+    assert backend.peak == 1
+
+
+@pytest.mark.asyncio
+async def test_timed_out_thread_keeps_its_slot():
+    backend = BlockingBackend()
+    gateway = LLMGateway(backend, timeout=0.05, max_retries=1, backoff=0,
+                         max_concurrency=1, max_queue=4, queue_timeout=0.05)
+
+    # The retry cannot start while the first, abandoned thread still runs
+    with pytest.raises(Overloaded):
+        await gateway.agenerate("prompt")
+    assert backend.running == 1 and gateway.admission.stats()["active"] == 1
+
+    backend.release.set()
+    while gateway.admission.stats()["active"]:
+        await asyncio.sleep(0.01)
+    assert await gateway.agenerate("prompt") == "ok"
+    assert backend.peak == 1
+
+
+def test_sync_call_is_bounded_by_the_gateway_timeout():
+    backend = BlockingBackend()
+    gateway = LLMGateway(backend, timeout=0.05, max_retries=0, max_concurrency=1, queue_timeout=0.05)
+
+    # The backend ignores its timeout; the caller is released anyway...
+    with pytest.raises(LLMError):
+        gateway.generate("prompt")
+    # ...while the abandoned call keeps its slot until it returns
+    with pytest.raises(Overloaded):
+        gateway.generate("prompt")
+    backend.release.set()
+    deadline = time.time() + 5
+    while gateway.admission.stats()["active"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert gateway.generate("prompt") == "ok"
+    assert backend.peak == 1
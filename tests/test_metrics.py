@@ -0,0 +1,102 @@
+import asyncio
+
+from app.services import metrics
+
+
+def test_span_records_histogram_and_request_timings():
+    with metrics.request("req-1") as (request_id, spans):
+        assert metrics.request_id() == "req-1"
+        with metrics.span("test_stage"):
+            pass
+    assert request_id == "req-1"
+    assert [stage for stage, _ in spans] == ["test_stage"]
+    assert metrics.server_timing(spans).startswith("test_stage;dur=")
+    assert metrics.request_id() is None
+
+    text = metrics.render()
+    assert 'voice_rag_stage_seconds_count{stage="test_stage"} 1' in text
+    assert 'voice_rag_stage_seconds_bucket{stage="test_stage",le="+Inf"} 1' in text
+
+
+def test_spans_follow_the_request_into_tasks():
+    async def main():
+        with metrics.request() as (_, spans):
+            async def stage(name):
+                with metrics.span(name):
+                    await asyncio.sleep(0)
+
+            await asyncio.gather(stage("task_a"), stage("task_b"))
+        return spans
+
+    spans = asyncio.run(main())
+    assert sorted(stage for stage, _ in spans) == ["task_a", "task_b"]
+
+
+def test_disabled_metrics_are_a_no_op(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    with metrics.request() as (_, spans):
+        with metrics.span("disabled_stage"):
+            pass
+    metrics.record_tts("hello", "disabled_voice")
+    assert spans == []
+    text = metrics.render()
+    assert "disabled_stage" not in text
+    assert "disabled_voice" not in text
+
+
+def test_counters_and_cache_collector_render():
+    metrics.record_llm("test_backend", "one two three", "answer")
+    metrics.record_tts("hello", "test_voice")
+    metrics.record_ingest(100, 2.0, {"embed": 1.5, "total": 2.0})
+    metrics.register_collector("test", lambda: {("test_cache", "hit"): 3, ("test_cache", "miss"): 1})
+
+    text = metrics.render()
+    assert 'voice_rag_llm_requests_total{backend="test_backend",outcome="ok"} 1.0' in text
+    assert 'voice_rag_llm_prompt_characters_total{backend="test_backend"} 13.0' in text
+    assert 'voice_rag_tts_characters_total{voice="test_voice"} 5.0' in text
+    assert 'voice_rag_ingest_chunks_per_second_bucket{le="50"}' in text
+    assert 'voice_rag_stage_seconds_count{stage="ingest_embed"}' in text
+    assert 'voice_rag_cache_requests_total{cache="test_cache",result="hit"} 3' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_rate", "Test.", buckets=(1, 10))
+    histogram.observe(5)
+    histogram.observe(50)
+    assert list(histogram.render())[2:] == [
+        'voice_rag_test_rate_bucket{le="1"} 0',
+        'voice_rag_test_rate_bucket{le="10"} 1',
+        'voice_rag_test_rate_bucket{le="+Inf"} 2',
+        "voice_rag_test_rate_sum 55.0",
+        "voice_rag_test_rate_count 2",
+    ]
+
+
+def test_streamed_response_stays_in_its_request_scope():
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+
+    from app.main import CorrelationMiddleware
+
+    seen = []
+
+    async def body():
+        # Runs after the headers are sent, still inside the request
+        with metrics.span("stream_body"):
+            seen.append(metrics.request_id())
+            yield b"data"
+
+    app = FastAPI()
+    app.add_middleware(CorrelationMiddleware)
+
+    @app.get("/stream")
+    def stream():
+        with metrics.span("stream_setup"):
+            return StreamingResponse(body())
+
+    response = TestClient(app).get("/stream", headers={"X-Request-ID": "req-stream"})
+    assert response.content == b"data"
+    assert response.headers["x-request-id"] == "req-stream"
+    assert response.headers["server-timing"].startswith("stream_setup;dur=")
+    assert seen == ["req-stream"]
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.rag import vectorstore
+from app.rag.local_store import LocalStore
+
+
+def test_import_loads_no_heavy_dependency():
+    env = {k: v for k, v in os.environ.items() if k != "ELEVENLABS_API_KEY"}
+    heavy = ("sentence_transformers", "torch", "elevenlabs", "google.generativeai", "qdrant_client")
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, app.main; print([m for m in {heavy!r} if m in sys.modules])"],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(__file__)),
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_liveness_and_readiness_without_warm_up(monkeypatch):
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", False)
+    monkeypatch.setattr(vectorstore, "_store", LocalStore(None))
+    with TestClient(main.app) as client:
+        assert client.get("/live").json() == {"status": "alive"}
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+
+def test_readiness_waits_for_warm_up(monkeypatch):
+    calls = []
+
+    def warm_up():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("vector store down")
+        time.sleep(0.1)
+
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", True)
+    monkeypatch.setattr(main, "WARMUP_RETRY_SECONDS", 0.05)
+    monkeypatch.setattr(main, "warm_up", warm_up)
+    monkeypatch.setattr(vectorstore, "_store", LocalStore(None))
+    with TestClient(main.app) as client:
+        assert client.get("/live").status_code == 200
+        assert client.get("/ready").status_code == 503
+        deadline = time.time() + 5
+        while client.get("/ready").status_code != 200:
+            assert time.time() < deadline
+            time.sleep(0.02)
+    assert len(calls) == 2
+
+
+def test_readiness_reports_unreachable_store(monkeypatch):
+    class DownStore(LocalStore):
+        def ping(self):
+            raise ConnectionError("refused")
+
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", False)
+    monkeypatch.setattr(vectorstore, "_store", DownStore(None))
+    with TestClient(main.app) as client:
+        response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "error": "refused"}
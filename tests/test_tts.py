@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import tts
+from app.services.audio_cache import AudioCache
+
+
+def test_segments_synthesized_concurrently_in_speaker_order(monkeypatch):
+    overlap = threading.Condition()
+    running, peak = [0], [0]
+
+    def fake_synthesize(text, voice="explainer", model_id=None):
+        with overlap:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            overlap.notify_all()
+            # Hold on until the other segment is in flight too (or give up if it never comes)
+            overlap.wait_for(lambda: peak[0] == 2, timeout=5)
+            running[0] -= 1
+        return voice.encode()
+
+    monkeypatch.setattr(tts, "synthesize", fake_synthesize)
+
+    segments = tts.synthesize_segments({"explainer": "a", "curious": "q", "answer": "a"})
+
+    assert list(segments) == ["curious", "explainer"]
+    assert peak[0] == 2
+
+
+def _fake_async_client(monkeypatch, chunks=3, produced=None, fail_after=None):
+    async def convert(voice_id, text, model_id, output_format):
+        for i in range(chunks):
+            if i == fail_after:
+                raise ConnectionError("dropped")
+            await asyncio.sleep(0)
+            if produced is not None:
+                produced.append(i)
+            yield f"{text}{i}".encode()
+
+    monkeypatch.setattr(tts, "async_client", SimpleNamespace(text_to_speech=SimpleNamespace(convert=convert)))
+
+
+@pytest.mark.asyncio
+async def test_stream_releases_tts_slot_before_the_client_reads(monkeypatch, tmp_path):
+    _fake_async_client(monkeypatch)
+    monkeypatch.setattr(tts, "audio_cache", AudioCache(str(tmp_path), enabled=False))
+
+    stream = tts.atext_to_speech_stream("hi")
+    assert await stream.__anext__() == b"hi0"
+    # The client stalls after one chunk; a clip within the read-ahead still finishes and frees its slot
+    for _ in range(10):
+        await asyncio.sleep(0)
+    assert tts._admission.stats()["active"] == 0
+    assert [chunk async for chunk in stream] == [b"hi1", b"hi2"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_segments_survive_eviction(monkeypatch, tmp_path):
+    _fake_async_client(monkeypatch, chunks=1)
+    cache = AudioCache(str(tmp_path))
+    monkeypatch.setattr(tts, "audio_cache", cache)
+    opened = cache.open
+
+    def open_then_evict(key):
+        f = opened(key)
+        if f is not None:
+            cache.path(key).unlink()
+        return f
+
+    monkeypatch.setattr(cache, "open", open_then_evict)
+    audio = b"".join([chunk async for chunk in tts.astream_segments({"curious": "q", "explainer": "a"})])
+    assert audio == b"q0a0"
+
+    # Gone before it could be opened: synthesized again rather than failing mid-stream
+    monkeypatch.setattr(cache, "open", lambda key: None)
+    audio = b"".join([chunk async for chunk in tts.astream_segments({"curious": "q", "explainer": "a"})])
+    assert audio == b"q0a0"
+
+
+@pytest.mark.asyncio
+async def test_stream_reads_ahead_of_a_stalled_client_only_up_to_the_buffer(monkeypatch, tmp_path):
+    produced = []
+    _fake_async_client(monkeypatch, chunks=20, produced=produced)
+    monkeypatch.setattr(tts, "audio_cache", AudioCache(str(tmp_path), enabled=False))
+    monkeypatch.setattr(tts, "TTS_STREAM_BUFFER", 4)
+
+    stream = tts.atext_to_speech_stream("hi")
+    assert await stream.__anext__() == b"hi0"
+    for _ in range(50):
+        await asyncio.sleep(0)
+    assert len(produced) <= 1 + 4 + 1
+    assert len([chunk async for chunk in stream]) == 19
+    assert tts._admission.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_synthesis_leaves_nothing_in_the_cache(monkeypatch, tmp_path):
+    _fake_async_client(monkeypatch, chunks=5, fail_after=2)
+    cache = AudioCache(str(tmp_path))
+    monkeypatch.setattr(tts, "audio_cache", cache)
+
+    with pytest.raises(ConnectionError):
+        await tts.asynthesize_to_cache("hi")
+    assert list(tmp_path.rglob("*.*")) == []
+
+    _fake_async_client(monkeypatch, chunks=5)
+    key = await tts.asynthesize_to_cache("hi")
+    assert cache.read(key) == b"hi0hi1hi2hi3hi4"
+
+
+@pytest.mark.asyncio
+async def test_first_segment_streams_while_later_ones_synthesize(monkeypatch, tmp_path):
+    release = asyncio.Event()
+
+    async def convert(voice_id, text, model_id, output_format):
+        if text == "a":
+            await release.wait()
+        yield f"{text}0".encode()
+
+    monkeypatch.setattr(tts, "async_client", SimpleNamespace(text_to_speech=SimpleNamespace(convert=convert)))
+    monkeypatch.setattr(tts, "audio_cache", AudioCache(str(tmp_path)))
+
+    stream = tts.astream_segments({"curious": "q", "explainer": "a"})
+    assert await stream.__anext__() == b"q0"
+    release.set()
+    assert [chunk async for chunk in stream] == [b"a0"]
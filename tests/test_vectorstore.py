@@ -0,0 +1,215 @@
+import numpy as np
+import pytest
+
+from app.rag.local_store import LocalStore
+
+
+def _points(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"p{i}" for i in range(n)]
+    payloads = [{"text": f"chunk {i}", "doc_id": "even" if i % 2 == 0 else "odd"} for i in range(n)]
+    return ids, vectors, payloads
+
+
+def test_local_search_matches_brute_force():
+    store = LocalStore(None)
+    store.ensure_collection("docs", 8)
+    ids, vectors, payloads = _points(200)
+    store.upsert("docs", ids, vectors, payloads)
+
+    query = np.random.default_rng(1).normal(size=8)
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    expected = [ids[i] for i in np.argsort(-scores)[:5]]
+
+    hits = store.search("docs", query, 5)
+    assert [h.id for h in hits] == expected
+    assert hits[0].score == pytest.approx(scores.max(), abs=1e-5)
+    assert hits[0].payload["text"] == f"chunk {expected[0][1:]}"
+
+    filtered = store.search("docs", query, 5, match={"doc_id": "odd"})
+    assert len(filtered) == 5 and all(h.payload["doc_id"] == "odd" for h in filtered)
+
+
+def test_local_upsert_delete_and_payload_updates():
+    store = LocalStore(None)
+    store.ensure_collection("docs", 8)
+    ids, vectors, payloads = _points(10)
+    store.upsert("docs", ids, vectors, payloads)
+
+    store.delete("docs", match={"doc_id": "odd"})
+    assert store.count("docs") == 5
+    assert store.existing_ids("docs", ["p0", "p1"]) == {"p0"}
+    assert all(h.payload["doc_id"] == "even" for h in store.search("docs", vectors[1], 10))
+
+    # Freed rows are reused and an upsert of an existing id overwrites it
+    store.upsert("docs", ["p1", "p0"], vectors[[1, 0]], [{"text": "new"}, {"text": "zero"}])
+    assert store.count("docs") == 6
+    assert store._get("docs").size == 10
+    assert store.search("docs", vectors[0], 1)[0].payload == {"text": "zero"}
+
+    store.set_payload("docs", {"tag": "x"}, match={"doc_id": "even"})
+    assert store.count("docs", {"tag": "x"}) == 4
+    assert store.count("docs", exclude={"tag": "x"}) == 2
+
+    with pytest.raises(ValueError):
+        store.ensure_collection("docs", 4)
+
+
+def test_local_store_persists_across_restarts(tmp_path):
+    store = LocalStore(str(tmp_path))
+    store.ensure_collection("docs", 8)
+    ids, vectors, payloads = _points(1500)
+    store.upsert("docs", ids, vectors, payloads)
+    store.delete("docs", match={"doc_id": "odd"})
+    store.set_payload("docs", {"doc_complete": True}, ids=["p0"])
+    expected = [(h.id, h.payload) for h in store.search("docs", vectors[4], 3)]
+
+    reopened = LocalStore(str(tmp_path))
+    assert reopened.count("docs") == 750
+    assert reopened.count("docs", {"doc_complete": True}) == 1
+    assert [(h.id, h.payload) for h in reopened.search("docs", vectors[4], 3)] == expected
+
+    # Appending after a restart reuses deleted rows instead of growing the file
+    reopened.upsert("docs", ["new"], vectors[:1], [{"text": "new"}])
+    assert reopened._get("docs").size == 1500
+    assert LocalStore(str(tmp_path)).existing_ids("docs", ["new", "p1"]) == {"new"}
+
+
+def test_quantized_profile_keeps_recall_and_migrates_in_place():
+    from app.rag.profiles import get_profile
+
+    store = LocalStore(None, get_profile("default"))
+    store.ensure_collection("docs", 8)
+    ids, vectors, payloads = _points(2000)
+    store.upsert("docs", ids, vectors, payloads)
+    queries = np.random.default_rng(2).normal(size=(20, 8))
+    exact = [[h.id for h in store.search("docs", q, 5)] for q in queries]
+
+    result = store.migrate("docs", get_profile("balanced"))
+    assert result["points"] == 2000
+    assert store._get("docs").codes.dtype == np.int8
+    assert [[h.id for h in store.search("docs", q, 5)] for q in queries] == exact
+
+    store.upsert("docs", ["late"], vectors[:1], [{"text": "late"}])
+    assert {h.id for h in store.search("docs", vectors[0], 2)} == {"p0", "late"}
+
+
+def test_local_migration_changes_one_collection_and_persists(tmp_path):
+    from app.rag.profiles import get_profile
+
+    store = LocalStore(str(tmp_path), get_profile("default"))
+    for name in ("docs", "other"):
+        store.ensure_collection(name, 8)
+    store.migrate("docs", get_profile("balanced"))
+    assert store._get("docs").profile.name == "balanced"
+    assert store._get("other").profile.name == "default"
+    assert LocalStore(str(tmp_path), get_profile("default"))._get("docs").profile.name == "balanced"
+
+
+def test_qdrant_migration_swaps_alias():
+    from qdrant_client import QdrantClient
+
+    from app.rag.profiles import get_profile
+    from app.rag.vectorstore import QdrantStore
+
+    client = QdrantClient(":memory:")
+    store = QdrantStore(client, profile=get_profile("default"))
+    store.ensure_collection("docs", 8)
+    ids, vectors, payloads = _points(300)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(300)]
+    store.upsert("docs", ids, vectors, payloads)
+
+    # Created behind an alias, so even the first migration is an alias swap
+    created = {a.alias_name: a.collection_name for a in client.get_aliases().aliases}["docs"]
+    assert created != "docs"
+
+    first = store.migrate("docs", get_profile("balanced"))
+    assert first["from"] == created
+    second = store.migrate("docs", get_profile("compact"))
+    assert second["from"] == first["to"]
+    assert {a.alias_name: a.collection_name for a in client.get_aliases().aliases} == {"docs": second["to"]}
+    assert [c.name for c in client.get_collections().collections] == [second["to"]]
+    assert store.count("docs") == 300
+    assert store.count("docs", {"doc_id": "odd"}) == 150
+    assert store.search("docs", vectors[3], 1)[0].id == ids[3]
+
+
+def test_qdrant_migration_keeps_writes_made_during_it():
+    from qdrant_client import QdrantClient
+
+    from app.rag.profiles import get_profile
+    from app.rag.vectorstore import QdrantStore
+
+    client = QdrantClient(":memory:")
+    store = QdrantStore(client, profile=get_profile("default"))
+    for name in ("docs", "other"):
+        store.ensure_collection(name, 8)
+    _, vectors, payloads = _points(20)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(20)]
+    store.upsert("docs", ids, vectors, payloads)
+    old = store._aliases()["docs"]
+
+    copy = store._copy
+
+    def copy_then_write(source, target, only=None):
+        written = copy(source, target, only)
+        if only is None:
+            # Writes that reach the old collection while it is being copied
+            store.upsert("docs", [ids[19].replace("19", "99")], vectors[:1], [{"text": "added"}])
+            store.set_payload("docs", {"doc_id": "changed"}, ids=[ids[0]])
+            client.delete(collection_name=old, points_selector=[ids[1]])
+        return written
+
+    swap = client.update_collection_aliases
+
+    def swap_then_write(change_aliases_operations):
+        swap(change_aliases_operations=change_aliases_operations)
+        # In flight against the old collection, then newer writes through the alias
+        client.set_payload(collection_name=old, payload={"doc_id": "late"}, points=[ids[2], ids[3]])
+        store.set_payload("docs", {"doc_id": "newest"}, ids=[ids[3]])
+        store.upsert("docs", [ids[19].replace("19", "98")], vectors[:1], [{"text": "after"}])
+
+    store._copy = copy_then_write
+    client.update_collection_aliases = swap_then_write
+    store.migrate("docs", get_profile("balanced"))
+
+    assert store.count("docs") == 21
+    assert store.existing_ids("docs", [ids[1]]) == set()
+    docs = {str(p.id): p.payload["doc_id"] for p in client.retrieve("docs", ids[:4])}
+    assert docs == {ids[0]: "changed", ids[2]: "late", ids[3]: "newest"}
+    assert {p["text"] for p in store.payloads("docs", limit=50)} >= {"added", "after"}
+    # Only the migrated collection searches with the new profile
+    assert store._profile("docs").name == "balanced"
+    assert store._profile("other").name == "default"
+    assert QdrantStore(client)._profile("docs").name == "balanced"
+
+
+@pytest.mark.parametrize("backend", ["local", "qdrant"])
+def test_batch_search_matches_single_searches(backend):
+    from qdrant_client import QdrantClient
+
+    from app.rag.vectorstore import QdrantStore
+
+    store = LocalStore(None) if backend == "local" else QdrantStore(QdrantClient(":memory:"))
+    store.ensure_collection("docs", 8)
+    _, vectors, payloads = _points(50)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(50)]
+    store.upsert("docs", ids, vectors, payloads)
+
+    batches = store.search_batch("docs", vectors[:4], 3, {"doc_id": "even"}, with_vectors=True)
+    for vector, hits in zip(vectors[:4], batches):
+        assert [h.id for h in hits] == [h.id for h in store.search("docs", vector, 3, {"doc_id": "even"})]
+        assert all(h.vector is not None for h in hits)
+
+
+def test_incomplete_backend_fails_at_construction():
+    from app.rag.vectorstore import VectorStore
+
+    class SearchOnly(VectorStore):
+        def search(self, collection, vector, top_k, match=None, with_vectors=False):
+            return []
+
+    with pytest.raises(TypeError, match="abstract"):
+        SearchOnly()